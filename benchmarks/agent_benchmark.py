@@ -0,0 +1,274 @@
+"""
+Offline benchmark of the agents. Maps a synthetic project (see synthetic_repo.py) with a
+deterministic fake chat model of configurable latency, so it needs no network or API keys,
+then measures mapping throughput, find_relevant_files and run_core_process latency, LLM
+calls, prompt tokens, chunk counts and peak memory (process peak RSS, and with --trace-memory
+the peak of Python allocations of every phase). Results are written as JSON; with
+--compare, the metrics are compared with an earlier result and the run fails when one
+of them regressed by more than the tolerance.
+
+Usage:
+    python benchmarks/agent_benchmark.py [--files 1000] [--latency 0.0] [--workers 8] [--queries 8]
+        [--batch-small-files] [--mapping-store sqlite] [--trace-memory] [--output result.json]
+        [--compare baseline.json] [--tolerance 0.2]
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_PATH)
+
+import codeace  # noqa: E402
+from codeace import CoreAgent, LLMManager, MappingAgent  # noqa: E402
+from codeace.managers.model_registry import ModelCapabilities, model_registry  # noqa: E402
+from codeace.testing.fake_llm import FakeChatModel  # noqa: E402
+from synthetic_repo import generate_repo, get_queries  # noqa: E402
+
+# Provider name the fake chat model is registered under
+FAKE_PROVIDER = "fake"
+
+# Version of the result layout; results of different versions are not compared
+RESULT_VERSION = 1
+
+# Metrics checked by --compare, and whether higher values are better
+COMPARED_METRICS = {
+    "mapping.files_per_second": True,
+    "mapping.llm_calls": False,
+    "mapping.prompt_tokens": False,
+    "mapping.peak_memory_mb": False,
+    "mapping.max_rss_mb": False,
+    "remap.seconds": False,
+    "core_init.seconds": False,
+    "core_init.peak_memory_mb": False,
+    "find_relevant_files.latency_median": False,
+    "find_relevant_files.latency_p95": False,
+    "find_relevant_files.llm_calls": False,
+    "find_relevant_files.prompt_tokens": False,
+    "run_core_process.latency_median": False,
+    "run_core_process.latency_p95": False,
+    "run_core_process.llm_calls": False,
+    "run_core_process.prompt_tokens": False,
+    "run_core_process.peak_memory_mb": False,
+    "run_core_process.max_rss_mb": False,
+}
+
+# Changes of timing metrics below this many seconds are measurement noise, not regressions
+MIN_TIME_DELTA = 0.005
+
+
+def get_max_rss_mb() -> Optional[float]:
+    """Peak resident memory of the process so far"""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(max_rss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 2)
+
+
+def measure(llm: FakeChatModel, action: Callable) -> Tuple[object, Dict]:
+    """Run action; returns its result and the time, LLM calls, prompt tokens and peak memory it took"""
+    llm.reset_stats()
+    if tracemalloc.is_tracing():
+        _reset_memory_peak()
+    start = time.perf_counter()
+    result = action()
+    seconds = time.perf_counter() - start
+    stats = llm.stats()
+    metrics = {
+        "seconds": round(seconds, 4),
+        "llm_calls": stats["calls"],
+        "prompt_tokens": stats["prompt_tokens"],
+        "throttled_calls": stats["throttled"],
+        "max_rss_mb": get_max_rss_mb(),
+    }
+    if tracemalloc.is_tracing():
+        metrics["peak_memory_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+    return result, metrics
+
+
+def _reset_memory_peak() -> None:
+    if hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+    else:
+        # Python 3.8 has no reset_peak; clearing the traces resets the peak too
+        tracemalloc.clear_traces()
+
+
+def measure_queries(llm: FakeChatModel, queries: List[str], action: Callable) -> Dict:
+    """Run action once per query; returns the totals of measure and latency statistics"""
+    latencies = []
+
+    def run_all():
+        for query in queries:
+            start = time.perf_counter()
+            action(query)
+            latencies.append(time.perf_counter() - start)
+
+    _, metrics = measure(llm, run_all)
+    ordered = sorted(latencies)
+    metrics.update({
+        "queries": len(queries),
+        "latency_mean": round(statistics.mean(ordered), 4),
+        "latency_median": round(statistics.median(ordered), 4),
+        "latency_p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+        "latency_max": round(ordered[-1], 4),
+        "llm_calls_per_query": round(metrics["llm_calls"] / len(queries), 2),
+    })
+    return metrics
+
+
+def run_benchmark(args: argparse.Namespace, workdir: str) -> Dict:
+    llm = FakeChatModel(latency=args.latency)
+    LLMManager.register_provider(FAKE_PROVIDER, lambda **kwargs: llm)
+    model_registry.register(llm.model_name, ModelCapabilities(args.context_window, args.output_reserve))
+
+    src_path = os.path.join(workdir, "project")
+    app_data_path = os.path.join(workdir, "app_data")
+    os.makedirs(app_data_path, exist_ok=True)
+    results = {}
+
+    start = time.perf_counter()
+    results["generate"] = generate_repo(src_path, args.files, args.seed, args.large_file_ratio)
+    results["generate"]["seconds"] = round(time.perf_counter() - start, 4)
+
+    mapping_agent = MappingAgent(
+        FAKE_PROVIDER, src_path, app_data_path, max_workers=args.workers, mapping_store=args.mapping_store,
+        batch_small_files=args.batch_small_files,
+    )
+    _, results["mapping"] = measure(llm, lambda: list(mapping_agent.run_mapping_process()))
+    results["mapping"]["files_per_second"] = round(args.files / results["mapping"]["seconds"], 2)
+    results["mapping"]["unmapped_files"] = len(mapping_agent.unmapped_files)
+    # A second run over the unchanged project only checks the manifest
+    _, results["remap"] = measure(llm, lambda: list(mapping_agent.run_mapping_process()))
+
+    core_agent, results["core_init"] = measure(llm, lambda: CoreAgent(
+        FAKE_PROVIDER, src_path, app_data_path, mapping_store=args.mapping_store, max_workers=args.workers
+    ))
+    queries = get_queries(args.files, args.queries, args.seed)
+    results["find_relevant_files"] = measure_queries(llm, queries, core_agent.find_relevant_files)
+    results["run_core_process"] = measure_queries(llm, queries, core_agent.run_core_process)
+
+    # Chunk counts, computed after the measurements so they do not add to them
+    search_chunks = [len(core_agent._build_search_inputs(query)) for query in queries
+                     if not core_agent._find_symbol_files(query)]
+    content_chunks = [len(core_agent._plan_content_chunks(query, core_agent.find_relevant_files(query)))
+                      for query in queries]
+    results["find_relevant_files"]["search_chunks"] = sum(search_chunks)
+    results["run_core_process"]["content_chunks"] = sum(content_chunks)
+    results["run_core_process"]["max_content_chunks"] = max(content_chunks, default=0)
+    return results
+
+
+def flatten(results: Dict) -> Dict[str, float]:
+    return {
+        f"{phase}.{name}": value
+        for phase, metrics in results.items()
+        for name, value in metrics.items()
+        if isinstance(value, (int, float))
+    }
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Print the change of every metric; returns the compared metrics that regressed beyond tolerance"""
+    if baseline.get("version") != current["version"]:
+        print(f"Baseline has result version {baseline.get('version')}, expected {current['version']}; not compared")
+        return []
+    if baseline.get("config") != current["config"]:
+        print("Warning: the baseline was run with a different configuration")
+
+    current_metrics = flatten(current["results"])
+    baseline_metrics = flatten(baseline["results"])
+    regressions = []
+    for name in sorted(set(current_metrics) & set(baseline_metrics)):
+        old, new = baseline_metrics[name], current_metrics[name]
+        change = (new - old) / old if old else (0.0 if new == old else float("inf"))
+        flag = ""
+        if name in COMPARED_METRICS:
+            worse = -change if COMPARED_METRICS[name] else change
+            is_time = "seconds" in name or "latency" in name
+            if worse > tolerance and not (is_time and abs(new - old) < MIN_TIME_DELTA):
+                regressions.append(name)
+                flag = "  REGRESSION"
+        print(f"{name:45} {old:>14} -> {new:>14} ({change:+.1%}){flag}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=1000, help="Number of files of the synthetic project")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic project and queries")
+    parser.add_argument("--large-file-ratio", type=float, default=0.05, help="Share of large files")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds the fake model takes per call")
+    parser.add_argument("--workers", type=int, default=8, help="max_workers of the agents")
+    parser.add_argument("--queries", type=int, default=8, help="Number of queries measured")
+    parser.add_argument("--batch-small-files", action="store_true", help="Map small files several per request")
+    parser.add_argument("--mapping-store", choices=("json", "sqlite"), default=None, help="Mapping storage")
+    parser.add_argument("--context-window", type=int, default=32768, help="Context window of the fake model")
+    parser.add_argument("--output-reserve", type=int, default=4096, help="Tokens reserved for the answer")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Record the peak Python allocations of every phase (slows the run several times)")
+    parser.add_argument("--workdir", help="Directory for the project and app data (default: a temporary one)")
+    parser.add_argument("--output", help="File to write the JSON result to (default: stdout)")
+    parser.add_argument("--compare", help="Earlier JSON result to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    config = {name: value for name, value in vars(args).items()
+              if name not in ("workdir", "output", "compare", "tolerance")}
+    workdir = args.workdir or tempfile.mkdtemp(prefix="codeace-bench-")
+    if args.trace_memory:
+        tracemalloc.start()
+    try:
+        results = run_benchmark(args, workdir)
+    finally:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "version": RESULT_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {
+            "codeace": codeace.__version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": config,
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"FAIL: {len(regressions)} metrics regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
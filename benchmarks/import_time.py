@@ -0,0 +1,81 @@
+"""
+Startup benchmark: measures `import codeace` in fresh interpreters and fails when
+the median exceeds the budget or when importing the package loads a provider SDK.
+
+Usage:
+    python benchmarks/import_time.py [--runs 7] [--budget 0.3] [--statement "import codeace"]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Median import time allowed by default, in seconds
+DEFAULT_BUDGET_SECONDS = 0.3
+
+# Modules that must not be loaded by importing the package
+PROVIDER_MODULES = (
+    "langchain_openai",
+    "langchain_anthropic",
+    "langchain_google_genai",
+    "langchain_ollama",
+    "dotenv",
+)
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+MEASURE_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+exec({statement!r})
+elapsed = time.perf_counter() - start
+loaded = [name for name in {modules!r} if name in sys.modules]
+print(elapsed)
+print(",".join(loaded))
+"""
+
+
+def measure_once(statement: str) -> tuple:
+    """Run the statement in a fresh interpreter; returns (seconds, loaded provider modules)"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = SRC_PATH + os.pathsep + env.get("PYTHONPATH", "")
+    output = subprocess.run(
+        [sys.executable, "-c", MEASURE_SCRIPT.format(statement=statement, modules=PROVIDER_MODULES)],
+        env=env, check=True, capture_output=True, text=True,
+    ).stdout.splitlines()
+    return float(output[0]), [name for name in output[1].split(",") if name]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7, help="Number of measured interpreter starts")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_SECONDS, help="Allowed median in seconds")
+    parser.add_argument("--statement", default="import codeace", help="Import statement to measure")
+    args = parser.parse_args()
+
+    # Warm-up run, so the measured runs do not pay for writing bytecode
+    measure_once(args.statement)
+    timings = []
+    loaded_modules = set()
+    for _ in range(args.runs):
+        seconds, loaded = measure_once(args.statement)
+        timings.append(seconds)
+        loaded_modules.update(loaded)
+
+    median = statistics.median(timings)
+    print(f"{args.statement}: median {median * 1000:.1f} ms, min {min(timings) * 1000:.1f} ms, "
+          f"max {max(timings) * 1000:.1f} ms over {args.runs} runs (budget {args.budget * 1000:.0f} ms)")
+
+    failed = False
+    if median > args.budget:
+        print(f"FAIL: median import time exceeds the budget of {args.budget} s")
+        failed = True
+    if loaded_modules:
+        print(f"FAIL: importing loaded provider modules: {', '.join(sorted(loaded_modules))}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Synthetic codebases for the benchmarks: deterministic Python projects of any size, with
+classes and functions named from a small business vocabulary, imports between modules
+(so the dependency graph has edges) and a share of large files that need chunking.
+The same size and seed always produce the same files.
+
+Usage:
+    python benchmarks/synthetic_repo.py PATH [--files 1000] [--seed 0] [--large-file-ratio 0.05]
+"""
+import argparse
+import os
+import random
+import sys
+from typing import Dict, List
+
+DOMAINS = (
+    "invoice", "payment", "customer", "order", "shipment", "inventory", "report", "session",
+    "account", "catalog", "discount", "audit", "ledger", "schedule", "notification", "warehouse",
+)
+ACTIONS = (
+    "load", "save", "validate", "parse", "render", "compute", "sync", "merge",
+    "export", "refresh", "resolve", "dispatch",
+)
+ROLES = ("Service", "Repository", "Validator", "Builder", "Handler", "Client")
+
+# Layout: ROOT_PACKAGE/g<group>/p<package>/<module>.py
+ROOT_PACKAGE = "app"
+FILES_PER_PACKAGE = 40
+PACKAGES_PER_GROUP = 25
+
+# Share of files with many functions (several thousand tokens), the rest hold a few
+DEFAULT_LARGE_FILE_RATIO = 0.05
+SMALL_FILE_FUNCTIONS = (2, 4)
+LARGE_FILE_FUNCTIONS = (60, 100)
+MAX_IMPORTS = 3
+
+
+def get_module_path(index: int) -> str:
+    """Relative directory of the module with the given index"""
+    package = index // FILES_PER_PACKAGE
+    return f"{ROOT_PACKAGE}/g{package // PACKAGES_PER_GROUP}/p{package % PACKAGES_PER_GROUP}"
+
+
+def get_module_name(index: int) -> str:
+    return f"{DOMAINS[index % len(DOMAINS)]}_{ACTIONS[(index // len(DOMAINS)) % len(ACTIONS)]}_{index}"
+
+
+def get_class_name(index: int) -> str:
+    domain = DOMAINS[index % len(DOMAINS)]
+    return f"{domain.capitalize()}{ROLES[index % len(ROLES)]}{index}"
+
+
+def render_module(index: int, rng: random.Random, large: bool) -> str:
+    """Source of one module; imports only modules with lower indexes"""
+    domain = DOMAINS[index % len(DOMAINS)]
+    imported = sorted(rng.sample(range(index), min(index, rng.randint(1, MAX_IMPORTS)))) if index else []
+    lines = [f'"""{domain.capitalize()} {ACTIONS[(index // len(DOMAINS)) % len(ACTIONS)]} logic of {get_module_path(index)}."""',
+             "import logging", ""]
+    for other in imported:
+        lines.append(f"from {get_module_path(other).replace('/', '.')} import {get_module_name(other)}")
+    lines += ["", "logger = logging.getLogger(__name__)", "", ""]
+
+    class_name = get_class_name(index)
+    lines += [f"class {class_name}:", f'    """{ROLES[index % len(ROLES)]} of {domain} records."""', "",
+              "    def __init__(self, store):", "        self.store = store", "        self.cache = {}", ""]
+    low, high = LARGE_FILE_FUNCTIONS if large else SMALL_FILE_FUNCTIONS
+    for number in range(rng.randint(low, high)):
+        action = ACTIONS[rng.randrange(len(ACTIONS))]
+        other_domain = DOMAINS[rng.randrange(len(DOMAINS))]
+        lines += [
+            f"    def {action}_{other_domain}_{number}(self, record, limit=10):",
+            f'        """{action.capitalize()} the {other_domain} of a {domain} record."""',
+            f'        key = (record.get("{other_domain}_id"), limit)',
+            "        if key in self.cache:",
+            "            return self.cache[key]",
+            f'        values = [item for item in self.store.get("{other_domain}", []) if item.get("{domain}_id") == record.get("id")]',
+            f'        logger.debug("{action} {other_domain}: %d values", len(values))',
+            "        self.cache[key] = values[:limit]",
+            "        return self.cache[key]",
+            "",
+        ]
+    for other in imported:
+        lines += [
+            "",
+            f"def use_{get_module_name(other)}(store, record):",
+            f'    """Delegate to {get_class_name(other)}."""',
+            f"    return {get_module_name(other)}.{get_class_name(other)}(store)",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def generate_repo(path: str, files: int, seed: int = 0, large_file_ratio: float = DEFAULT_LARGE_FILE_RATIO) -> Dict:
+    """
+    Write a synthetic project of the given number of files under path.
+    Returns its file count, total bytes and number of large files.
+    """
+    rng = random.Random(seed)
+    total_bytes = 0
+    large_files = 0
+    for index in range(files):
+        large = rng.random() < large_file_ratio
+        large_files += large
+        directory = os.path.join(path, *get_module_path(index).split("/"))
+        os.makedirs(directory, exist_ok=True)
+        content = render_module(index, rng, large)
+        with open(os.path.join(directory, f"{get_module_name(index)}.py"), "w", encoding="utf-8") as file:
+            file.write(content)
+        total_bytes += len(content.encode("utf-8"))
+    return {"files": files, "bytes": total_bytes, "large_files": large_files}
+
+
+def get_queries(files: int, count: int, seed: int = 0) -> List[str]:
+    """Deterministic questions about the synthetic project; every fourth names a class"""
+    rng = random.Random(seed + 1)
+    queries = []
+    for number in range(count):
+        index = rng.randrange(files)
+        if number % 4 == 3:
+            queries.append(get_class_name(index))
+        else:
+            domain = DOMAINS[rng.randrange(len(DOMAINS))]
+            action = ACTIONS[rng.randrange(len(ACTIONS))]
+            queries.append(f"How does the project {action} the {domain} records, and which services are involved?")
+    return queries
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="Directory to write the project to")
+    parser.add_argument("--files", type=int, default=1000, help="Number of files")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--large-file-ratio", type=float, default=DEFAULT_LARGE_FILE_RATIO,
+                        help="Share of large files")
+    args = parser.parse_args()
+    print(generate_repo(args.path, args.files, args.seed, args.large_file_ratio))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,5 @@
-from .agents.core_agent import CoreAgent
-from .agents.mapping_agent import MappingAgent
-from .managers.llm_manager import LLMManager
+import importlib
+from typing import TYPE_CHECKING
 
 __version__ = "0.1.3"
 
@@ -9,3 +8,27 @@ __all__ = [
     "MappingAgent",
     "LLMManager",
 ]
+
+# Exports are imported on first access, so `import codeace` does not load LangChain
+_LAZY_EXPORTS = {
+    "CoreAgent": ".agents.core_agent",
+    "MappingAgent": ".agents.mapping_agent",
+    "LLMManager": ".managers.llm_manager",
+}
+
+if TYPE_CHECKING:
+    from .agents.core_agent import CoreAgent
+    from .agents.mapping_agent import MappingAgent
+    from .managers.llm_manager import LLMManager
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,30 +1,89 @@
-from typing import Dict, Tuple
+import asyncio
+import os
+from typing import AsyncIterator, Dict, Iterator, Optional, Tuple
 from ..managers.llm_manager import LLMManager
 from ..managers.file_manager import FileManager
 from ..managers.token_manager import TokenManager
 from ..managers.prompt_manager import PromptManager
+from ..managers.cache_manager import ResponseCache
+from ..managers.request_scheduler import RequestScheduler
+from ..indexes.lexical_index import LexicalIndex
+from ..indexes.symbol_index import SymbolIndex
+from ..indexes.dependency_graph import DependencyGraph
 from ..utils.utils import Utils
+
+# Supported ways of combining the answers of several content chunks
+QUERY_MODES = ("refine", "map_reduce")
+
+# Rank offset of reciprocal rank fusion when merging lexical and vector search results
+RRF_RANK_OFFSET = 60
+
+# Mapping entry fields sent to the file-search prompt; the summary contribution only feeds the project summary
+SEARCH_FIELDS = ("file_name", "description", "functions")
+
 class CoreAgent:
-    def __init__(self, model_name: str, src_path: str, app_data_path = None, extra_context_doc_path = None):
+    def __init__(self, model_name: str, src_path: str, app_data_path = None, extra_context_doc_path = None, mapping_store = None, search_top_k: int = 50,
+                 embedder = None, max_workers: int = 4, response_cache = None, chunk_strategy: str = "ordered",
+                 focus_large_files: bool = True, expand_hops: int = 0, max_expanded_files: int = 20,
+                 request_scheduler = None):
         """
         Initialize the core agent with:
         - LLM model name - supported list (openai, azure, ollama, gemini, anthropic)
         - Source code path
         - Optional: app_data_path for JSON files (if None, will be created automatically)
+        - Optional: mapping_store type ("json", "sqlite") or MappingStore instance
+        - Optional: search_top_k - number of files the local indexes shortlist for the LLM
+        - Optional: embedder - the LangChain Embeddings used at mapping time, enables the vector index
+        - Optional: max_workers - maximum number of concurrent LLM calls per query
+        - Optional: response_cache - True to cache LLM responses in app_data, or a ResponseCache instance
+        - Optional: chunk_strategy - how files are packed into context windows: "ordered" keeps
+          relevance order, "ffd" (first-fit-decreasing) uses the fewest chunks
+        - Optional: focus_large_files - files too large for one chunk are split into functions and
+          classes; if True only the parts matching the query are sent
+        - Optional: expand_hops - add the files imported by the relevant files, up to this many
+          import hops away (0 = off), at most max_expanded_files of them, most central first
+        - Optional: request_scheduler - True to schedule LLM requests with the provider's shared
+          RequestScheduler (rate limits, retries with backoff, adaptive concurrency), or a RequestScheduler instance
         """
         self.src_path = src_path
         if app_data_path is None:
             app_data_path = Utils.get_app_data_path(src_path)
         
         Utils.check_file_exists(app_data_path) # if not exist raise error
-        self.file_manager = FileManager(src_path, app_data_path)
+        self.file_manager = FileManager(src_path, app_data_path, mapping_store)
+        if request_scheduler is True:
+            request_scheduler = RequestScheduler.for_provider(model_name)
+        self.request_scheduler = request_scheduler or None
         llm_manager = LLMManager()
-        self.llm_model = llm_manager.create_model_instance_by_name(model_name)
+        # With a scheduler, it retries failed requests instead of the provider client
+        self.llm_model = llm_manager.create_model_instance_by_name(
+            model_name, max_retries=0 if self.request_scheduler is not None else None
+        )
         self.mapping_data = self.file_manager.get_mapping_data()
+        self.mapping_by_name = {entry['file_name']: entry for entry in self.mapping_data}
+        self.search_top_k = search_top_k
+        self.lexical_index = self._load_lexical_index()
+        self.symbol_index = SymbolIndex.load(self.file_manager.symbol_index_path)
+        self.dependency_graph = DependencyGraph.load(self.file_manager.dependency_graph_path)
+        self.embedder = embedder
+        self.vector_index = self._load_vector_index()
         self.sammry_data = self.file_manager.read_summary()
-        self.token_manager = TokenManager(self.llm_model)
-        self.prompt_manager = PromptManager()
+        self.token_manager = TokenManager(self.llm_model, self.file_manager.token_cache_path)
+        # Count all mapping entries in one batch up front; later queries reuse the memoized counts
+        self.token_manager.calculate_tokens_batch(
+            [TokenManager.format_mapping_item(entry) for entry in self.mapping_data]
+        )
+        self.token_manager.save_token_cache_if_due()
+        if response_cache is True:
+            response_cache = ResponseCache(self.file_manager.response_cache_path)
+        self.response_cache = response_cache or None
+        self.prompt_manager = PromptManager(self.response_cache, self.request_scheduler)
         self.extra_context_doc = self.file_manager.read_extra_context_doc(extra_context_doc_path)
+        self.max_workers = max(1, max_workers)
+        self.chunk_strategy = chunk_strategy
+        self.focus_large_files = focus_large_files
+        self.expand_hops = expand_hops
+        self.max_expanded_files = max_expanded_files
         
 
     def run_core_process(self, user_query: str) -> str:
@@ -34,38 +93,150 @@ class CoreAgent:
         
         last_respond = self.process_code_query(user_query, relevant_files_list)
         return last_respond
+
+    async def arun_core_process(self, user_query: str, timeout: Optional[float] = None) -> str:
+        """
+        Async variant of run_core_process.
+        With timeout (seconds), asyncio.TimeoutError is raised and the pending LLM requests are cancelled.
+        """
+        return await asyncio.wait_for(self._arun_core_process(user_query), timeout)
+
+    async def _arun_core_process(self, user_query: str) -> str:
+        relevant_files_list = await self._afind_relevant_files(user_query)
+        if not relevant_files_list:
+            return "No relevant files found"
+        query_chain = self.prompt_manager.create_code_query_chain(self.llm_model)
+        return await self._aprocess_code_query_logic(user_query, relevant_files_list, query_chain)
     
-    def find_relevant_files(self, user_query: str) -> list:
+    def find_relevant_files(self, user_query: str, top_k: int = None, expand_hops: int = None) -> list:
         """
-        Find relevant files based on user query by processing data in chunks that fit token limits
+        Find relevant files based on user query.
+        A query that is just an identifier (e.g. 'UserService.save') is answered from the
+        symbol index without an LLM call. Otherwise the local indexes shortlist the top_k
+        candidate files (search_top_k by default), then the LLM re-ranks the shortlist in
+        chunks that fit token limits.
+        With expand_hops (self.expand_hops by default) the files they import are added
+        from the dependency graph, also without LLM calls.
         Returns a list of relevant file paths
         """
+        expand_hops = self.expand_hops if expand_hops is None else expand_hops
+        symbol_files = self._find_symbol_files(user_query)
+        if symbol_files:
+            return self._verify_and_expand(symbol_files, expand_hops)
+
+        search_chain = self.prompt_manager.create_mappint_searcher_promtp_chain(self.llm_model)
+        results = search_chain.batch(
+            self._build_search_inputs(user_query, top_k), config={"max_concurrency": self.max_workers}
+        )
+        return self._collect_relevant_files(results, expand_hops)
+
+    async def afind_relevant_files(self, user_query: str, top_k: int = None, expand_hops: int = None,
+                                   timeout: Optional[float] = None) -> list:
+        """
+        Async variant of find_relevant_files. The local index work runs in the default executor.
+        With timeout (seconds), asyncio.TimeoutError is raised and the pending LLM requests are cancelled.
+        """
+        return await asyncio.wait_for(self._afind_relevant_files(user_query, top_k, expand_hops), timeout)
+
+    async def _afind_relevant_files(self, user_query: str, top_k: int = None, expand_hops: int = None) -> list:
+        loop = asyncio.get_running_loop()
+        expand_hops = self.expand_hops if expand_hops is None else expand_hops
+        symbol_files = self._find_symbol_files(user_query)
+        if symbol_files:
+            return await loop.run_in_executor(None, self._verify_and_expand, symbol_files, expand_hops)
+
+        search_inputs = await loop.run_in_executor(None, self._build_search_inputs, user_query, top_k)
+        search_chain = self.prompt_manager.create_mappint_searcher_promtp_chain(self.llm_model)
+        results = await search_chain.abatch(search_inputs, config={"max_concurrency": self.max_workers})
+        return await loop.run_in_executor(None, self._collect_relevant_files, results, expand_hops)
+
+    def _find_symbol_files(self, user_query: str) -> list:
+        """Files defining the symbol a bare-identifier query names; empty for other queries"""
+        identifier = SymbolIndex.get_bare_identifier(user_query)
+        return self.symbol_index.find_files(identifier) if identifier else []
+
+    def _build_search_inputs(self, user_query: str, top_k: int = None) -> list:
+        """Search chain inputs: the shortlisted mapping entries in chunks that fit token limits"""
+        candidate_items = [
+            {field: entry[field] for field in SEARCH_FIELDS}
+            for entry in self._get_candidate_entries(user_query, top_k)
+        ]
+
+        # Chunks are independent, so they are sent concurrently and merged in chunk order
+        chunks = self.token_manager.plan_data_chunks(user_query, candidate_items, self.chunk_strategy)
+        return [{"user_query": user_query, "mapping_data": selected_items} for selected_items in chunks]
+
+    def _collect_relevant_files(self, results: list, expand_hops: int) -> list:
+        """Merge the search chain results into verified file paths, expanded along imports"""
         all_relevant_files = []
-        remaining_items = self.mapping_data.copy()
-        selected_items = dict()
-        
-        while remaining_items:
-            selected_items, remaining_items = self.token_manager.get_possible_data(
-                user_query, 
-                remaining_items
-            )
-            search_chain = self.prompt_manager.create_mappint_searcher_promtp_chain(self.llm_model)
-            result = search_chain.invoke(input={
-                "user_query": user_query, 
-                "mapping_data": selected_items
-            })
+        for result in results:
             list_of_files = result['files']
             if list_of_files:
                 all_relevant_files.extend(list_of_files)
-           
-            
-        
+
+        self.token_manager.save_token_cache_if_due()
         # Remove duplicates while preserving order
         if not all_relevant_files:
             return []
-        return self.file_manager.verify_files_list_paths(all_relevant_files)
+        return self._verify_and_expand(all_relevant_files, expand_hops)
+
+    def _verify_and_expand(self, file_names: list, expand_hops: int) -> list:
+        """Resolve file names to existing file paths and append their imports"""
+        return self._expand_dependencies(self.file_manager.verify_files_list_paths(file_names), expand_hops)
+
+    def _expand_dependencies(self, file_paths: list, hops: int) -> list:
+        """Append the files imported by the given files, up to hops import edges away"""
+        if hops <= 0 or not file_paths:
+            return file_paths
+        seed_files = [self.file_manager.get_relative_path(file_path) for file_path in file_paths]
+        expanded_files = self.dependency_graph.expand(seed_files, hops, max_files=self.max_expanded_files)
+        return file_paths + [os.path.join(self.src_path, file_name) for file_name in expanded_files]
+    
+    def _load_lexical_index(self):
+        """Load the lexical index built at mapping time, or None if the codebase was mapped without one"""
+        if not os.path.exists(self.file_manager.lexical_index_path):
+            return None
+        return LexicalIndex.load(self.file_manager.lexical_index_path)
+
+    def _load_vector_index(self):
+        """Load the vector index if an embedder is set and the index was built at mapping time"""
+        if self.embedder is None:
+            return None
+        # numpy is only needed when vector retrieval is enabled
+        from ..indexes.vector_index import VectorIndex
+        vector_index = VectorIndex(self.file_manager.vector_index_path)
+        return vector_index if vector_index.rows else None
+
+    def _get_candidate_entries(self, user_query: str, top_k: int = None) -> list:
+        """
+        Shortlist mapping entries for the query with the lexical and vector indexes, and the files
+        declaring the code-shaped identifiers named in the query (e.g. 'UserService.save').
+        Their rankings are merged with reciprocal rank fusion.
+        Falls back to the whole mapping when there is no index or no file matches the query.
+        """
+        top_k = top_k or self.search_top_k
+        if len(self.mapping_data) <= top_k:
+            return self.mapping_data.copy()
+
+        rankings = []
+        if self.lexical_index is not None:
+            rankings.append([name for name, _ in self.lexical_index.search(user_query, top_k)])
+        if self.vector_index is not None:
+            query_vector = self.embedder.embed_query(user_query)
+            rankings.append([name for name, _ in self.vector_index.search(query_vector, top_k)])
+        symbol_names = self.symbol_index.find_files(user_query)
+        if symbol_names:
+            rankings.append(symbol_names[:top_k])
+
+        fused_scores = {}
+        for ranking in rankings:
+            for rank, name in enumerate(ranking):
+                fused_scores[name] = fused_scores.get(name, 0.0) + 1.0 / (RRF_RANK_OFFSET + rank + 1)
+        ranked_names = sorted(fused_scores, key=lambda name: -fused_scores[name])[:top_k]
+        candidates = [self.mapping_by_name[name] for name in ranked_names if name in self.mapping_by_name]
+        return candidates or self.mapping_data.copy()
     
-    def _process_code_query_logic(self, user_query: str, file_paths: list, query_chain) -> str:
+    def _process_code_query_logic(self, user_query: str, file_paths: list, query_chain, mode: str = "refine") -> str:
         """
         Core logic for processing code queries.
         
@@ -73,62 +244,292 @@ class CoreAgent:
             user_query (str): The user's question about the code
             file_paths (list): List of relevant file paths to analyze
             query_chain: The chain to use for processing the query
+            mode (str): "refine" passes each chunk's answer on to the next chunk (serial);
+                "map_reduce" answers all chunks in parallel and merges the partial answers
             
         Returns:
             str: The response to the user's query
         """
+        if mode not in QUERY_MODES:
+            raise ValueError(f"Query mode {mode} is not supported. Use one of {QUERY_MODES}")
         if not file_paths:
             return f"No relevant files found for query, will call the llm model with the query only.\n\n{self.llm_model.invoke(user_query).content}"
 
-        remaining_files = file_paths
+        if mode == "map_reduce":
+            response = self._process_map_reduce(user_query, file_paths, query_chain)
+            self.token_manager.save_token_cache_if_due()
+            return response
+
+        content_chunks = self._plan_content_chunks(user_query, file_paths)
         previous_response = ""
         final_response = []
         
-        while remaining_files:
-            content_chunk, remaining_files = self._get_next_content_chunk(user_query, remaining_files)
-            if not content_chunk:
-                break
-            
+        for index, content_chunk in enumerate(content_chunks, start=1):
             result = self._process_content_chunk(
                 query_chain, 
                 content_chunk, 
                 user_query, 
                 previous_response, 
-                bool(remaining_files)
+                index < len(content_chunks)
             )
             
             final_response.append(result)
             previous_response = result
         
+        self.token_manager.save_token_cache_if_due()
         return self._format_final_response(final_response)
 
-    def process_code_query(self, user_query: str, file_paths: list) -> str:
+    def _process_map_reduce(self, user_query: str, file_paths: list, query_chain) -> str:
+        """
+        Map step: answer every content chunk on its own, concurrently.
+        Reduce step: merge the partial answers, in rounds when they don't fit one prompt.
+        """
+        content_chunks = self._plan_content_chunks(user_query, file_paths)
+
+        if len(content_chunks) <= 1:
+            responses = [self._process_content_chunk(query_chain, chunk, user_query, "", False) for chunk in content_chunks]
+            return self._format_final_response(responses)
+
+        partial_responses = query_chain.batch(
+            [self._build_chunk_input(chunk, user_query, "", True) for chunk in content_chunks],
+            config={"max_concurrency": self.max_workers},
+        )
+        return self._reduce_responses(user_query, partial_responses)
+
+    def _reduce_responses(self, user_query: str, responses: list) -> str:
+        """
+        Merge partial answers into one answer. Answers are grouped to fit the token limit;
+        while more than one group remains, each group is merged concurrently into one answer.
+        """
+        reduce_chain = self.prompt_manager.create_answer_reduce_chain(self.llm_model)
+        groups = self._group_responses(user_query, responses)
+        while len(groups) > 1:
+            responses = reduce_chain.batch(
+                self._build_reduce_inputs(user_query, groups), config={"max_concurrency": self.max_workers}
+            )
+            groups = self._group_responses(user_query, responses)
+        return reduce_chain.invoke(self._build_reduce_inputs(user_query, groups)[0])
+
+    async def _aprocess_code_query_logic(self, user_query: str, file_paths: list, query_chain, mode: str = "refine") -> str:
+        """
+        Async variant of _process_code_query_logic. Chunk planning and saving the token cache
+        run in the default executor.
+        """
+        if mode not in QUERY_MODES:
+            raise ValueError(f"Query mode {mode} is not supported. Use one of {QUERY_MODES}")
+        if not file_paths:
+            response = await self.llm_model.ainvoke(user_query)
+            return f"No relevant files found for query, will call the llm model with the query only.\n\n{response.content}"
+
+        loop = asyncio.get_running_loop()
+        content_chunks = await loop.run_in_executor(None, self._plan_content_chunks, user_query, file_paths)
+        if mode == "map_reduce" and len(content_chunks) > 1:
+            partial_responses = await query_chain.abatch(
+                [self._build_chunk_input(chunk, user_query, "", True) for chunk in content_chunks],
+                config={"max_concurrency": self.max_workers},
+            )
+            response = await self._areduce_responses(user_query, partial_responses)
+        else:
+            previous_response = ""
+            final_response = []
+            for index, content_chunk in enumerate(content_chunks, start=1):
+                previous_response = await query_chain.ainvoke(
+                    self._build_chunk_input(content_chunk, user_query, previous_response, index < len(content_chunks))
+                )
+                final_response.append(previous_response)
+            response = self._format_final_response(final_response)
+
+        await loop.run_in_executor(None, self.token_manager.save_token_cache_if_due)
+        return response
+
+    async def _areduce_responses(self, user_query: str, responses: list) -> str:
+        """
+        Async variant of _reduce_responses
+        """
+        reduce_chain = self.prompt_manager.create_answer_reduce_chain(self.llm_model)
+        groups = self._group_responses(user_query, responses)
+        while len(groups) > 1:
+            responses = await reduce_chain.abatch(
+                self._build_reduce_inputs(user_query, groups), config={"max_concurrency": self.max_workers}
+            )
+            groups = self._group_responses(user_query, responses)
+        return await reduce_chain.ainvoke(self._build_reduce_inputs(user_query, groups)[0])
+
+    def _plan_content_chunks(self, user_query: str, file_paths: list) -> list:
+        """Splits the contents of all files into chunks that fit within token limits"""
+        return self.token_manager.plan_files_content_chunks(
+            user_query, self.extra_context_doc, file_paths, self.chunk_strategy, self.focus_large_files
+        )
+
+    def _group_responses(self, user_query: str, responses: list) -> list:
+        """Groups partial answers so that each group fits one reduce prompt"""
+        return self.token_manager.group_texts_by_tokens(
+            responses, reserved_text=f"{user_query}\n{self.extra_context_doc}", min_group_size=2
+        )
+
+    def _build_reduce_inputs(self, user_query: str, groups: list) -> list:
+        """Builds the reduce chain input of every group of partial answers"""
+        return [
+            {"context": self.extra_context_doc, "user_query": user_query,
+             "partial_responses": self.prompt_manager.format_partial_responses(group)}
+            for group in groups
+        ]
+
+    def stream_core_process(self, user_query: str, mode: str = "refine") -> Iterator[Dict[str, str]]:
+        """
+        Streaming variant of run_core_process.
+
+        Yields:
+            Dict[str, str]: {"type": "phase", "message": ...} events while files are selected and
+            chunks are analyzed, then {"type": "token", "content": ...} events with the final answer.
+            If no file content could be read, a phase event says so and a single token event explains it.
+        """
+        if mode not in QUERY_MODES:
+            raise ValueError(f"Query mode {mode} is not supported. Use one of {QUERY_MODES}")
+        yield {"type": "phase", "message": "Selecting relevant files"}
+        relevant_files_list = self.find_relevant_files(user_query)
+        if not relevant_files_list:
+            yield {"type": "token", "content": "No relevant files found"}
+            return
+
+        yield {"type": "phase", "message": f"Reading {len(relevant_files_list)} relevant files"}
+        query_chain = self.prompt_manager.create_code_query_chain(self.llm_model)
+        content_chunks = self._plan_content_chunks(user_query, relevant_files_list)
+        total_chunks = len(content_chunks)
+        if not content_chunks:
+            # The relevant files could not be read or did not fit; end with the answer process_code_query gives
+            yield {"type": "phase", "message": "No relevant content found in the selected files"}
+            yield {"type": "token", "content": self._format_final_response([])}
+            return
+
+        if mode == "refine" or total_chunks <= 1:
+            previous_response = ""
+            for index, chunk in enumerate(content_chunks, start=1):
+                yield {"type": "phase", "message": f"Analyzing chunk {index}/{total_chunks}"}
+                chunk_input = self._build_chunk_input(chunk, user_query, previous_response, index < total_chunks)
+                if index < total_chunks:
+                    previous_response = query_chain.invoke(chunk_input)
+                else:
+                    for token in query_chain.stream(chunk_input):
+                        yield {"type": "token", "content": token}
+            return
+
+        yield {"type": "phase", "message": f"Analyzing {total_chunks} chunks"}
+        responses = query_chain.batch(
+            [self._build_chunk_input(chunk, user_query, "", True) for chunk in content_chunks],
+            config={"max_concurrency": self.max_workers},
+        )
+        reduce_chain = self.prompt_manager.create_answer_reduce_chain(self.llm_model)
+        groups = self._group_responses(user_query, responses)
+        while len(groups) > 1:
+            yield {"type": "phase", "message": f"Merging {len(responses)} partial answers"}
+            responses = reduce_chain.batch(
+                self._build_reduce_inputs(user_query, groups), config={"max_concurrency": self.max_workers}
+            )
+            groups = self._group_responses(user_query, responses)
+        yield {"type": "phase", "message": f"Merging {len(responses)} partial answers"}
+        for token in reduce_chain.stream(self._build_reduce_inputs(user_query, groups)[0]):
+            yield {"type": "token", "content": token}
+
+    async def astream_core_process(self, user_query: str, mode: str = "refine") -> AsyncIterator[Dict[str, str]]:
+        """
+        Async streaming variant of run_core_process. Yields the same events as stream_core_process.
+        """
+        if mode not in QUERY_MODES:
+            raise ValueError(f"Query mode {mode} is not supported. Use one of {QUERY_MODES}")
+        loop = asyncio.get_running_loop()
+        yield {"type": "phase", "message": "Selecting relevant files"}
+        relevant_files_list = await self._afind_relevant_files(user_query)
+        if not relevant_files_list:
+            yield {"type": "token", "content": "No relevant files found"}
+            return
+
+        yield {"type": "phase", "message": f"Reading {len(relevant_files_list)} relevant files"}
+        query_chain = self.prompt_manager.create_code_query_chain(self.llm_model)
+        content_chunks = await loop.run_in_executor(None, self._plan_content_chunks, user_query, relevant_files_list)
+        total_chunks = len(content_chunks)
+        if not content_chunks:
+            # The relevant files could not be read or did not fit; end with the answer process_code_query gives
+            yield {"type": "phase", "message": "No relevant content found in the selected files"}
+            yield {"type": "token", "content": self._format_final_response([])}
+            return
+
+        if mode == "refine" or total_chunks <= 1:
+            previous_response = ""
+            for index, chunk in enumerate(content_chunks, start=1):
+                yield {"type": "phase", "message": f"Analyzing chunk {index}/{total_chunks}"}
+                chunk_input = self._build_chunk_input(chunk, user_query, previous_response, index < total_chunks)
+                if index < total_chunks:
+                    previous_response = await query_chain.ainvoke(chunk_input)
+                else:
+                    async for token in query_chain.astream(chunk_input):
+                        yield {"type": "token", "content": token}
+            return
+
+        yield {"type": "phase", "message": f"Analyzing {total_chunks} chunks"}
+        responses = await query_chain.abatch(
+            [self._build_chunk_input(chunk, user_query, "", True) for chunk in content_chunks],
+            config={"max_concurrency": self.max_workers},
+        )
+        reduce_chain = self.prompt_manager.create_answer_reduce_chain(self.llm_model)
+        groups = self._group_responses(user_query, responses)
+        while len(groups) > 1:
+            yield {"type": "phase", "message": f"Merging {len(responses)} partial answers"}
+            responses = await reduce_chain.abatch(
+                self._build_reduce_inputs(user_query, groups), config={"max_concurrency": self.max_workers}
+            )
+            groups = self._group_responses(user_query, responses)
+        yield {"type": "phase", "message": f"Merging {len(responses)} partial answers"}
+        async for token in reduce_chain.astream(self._build_reduce_inputs(user_query, groups)[0]):
+            yield {"type": "token", "content": token}
+
+    def process_code_query(self, user_query: str, file_paths: list, mode: str = "refine") -> str:
         """
         Process a user query about specific code files.
         
         Args:
             user_query (str): The user's question about the code
             file_paths (list): List of relevant file paths to analyze
+            mode (str): "refine" (default) or "map_reduce" for queries over many files
             
         Returns:
             str: The response to the user's query
         """
         query_chain = self.prompt_manager.create_code_query_chain(self.llm_model)
-        return self._process_code_query_logic(user_query, file_paths, query_chain)
+        return self._process_code_query_logic(user_query, file_paths, query_chain, mode)
 
-    def process_dependencies_query(self, user_query: str, file_paths: list) -> str:
+    def process_dependencies_query(self, user_query: str, file_paths: list, mode: str = "refine") -> str:
         """
         Process a user query about code dependencies.
         
         Args:
             user_query (str): The user's question about the code
             file_paths (list): List of relevant file paths to analyze
+            mode (str): "refine" (default) or "map_reduce" for queries over many files
             
         Returns:
             str: The response to the user's query
         """
         query_chain = self.prompt_manager.create_dependencies_analysis_chain(self.llm_model)
-        return self._process_code_query_logic(user_query, file_paths, query_chain)
+        return self._process_code_query_logic(user_query, file_paths, query_chain, mode)
+
+    async def aprocess_code_query(self, user_query: str, file_paths: list, mode: str = "refine",
+                                  timeout: Optional[float] = None) -> str:
+        """
+        Async variant of process_code_query.
+        With timeout (seconds), asyncio.TimeoutError is raised and the pending LLM requests are cancelled.
+        """
+        query_chain = self.prompt_manager.create_code_query_chain(self.llm_model)
+        return await asyncio.wait_for(self._aprocess_code_query_logic(user_query, file_paths, query_chain, mode), timeout)
+
+    async def aprocess_dependencies_query(self, user_query: str, file_paths: list, mode: str = "refine",
+                                          timeout: Optional[float] = None) -> str:
+        """
+        Async variant of process_dependencies_query.
+        With timeout (seconds), asyncio.TimeoutError is raised and the pending LLM requests are cancelled.
+        """
+        query_chain = self.prompt_manager.create_dependencies_analysis_chain(self.llm_model)
+        return await asyncio.wait_for(self._aprocess_code_query_logic(user_query, file_paths, query_chain, mode), timeout)
     
     
     def add_extra_context(self, extra_context_doc: str, override: bool = False) -> None:
@@ -149,10 +550,6 @@ class CoreAgent:
         extra_context_doc = self.file_manager.read_extra_context_doc(extra_context_doc_path)
         self.add_extra_context(extra_context_doc, override)
 
-    
-    def _get_next_content_chunk(self, user_query: str, remaining_files: list) -> Tuple[str, list]:
-        """Gets the next chunk of file contents that fits within token limits"""
-        return self.token_manager.get_possible_files_content(user_query,self.extra_context_doc, remaining_files)
 
     def _process_content_chunk(
         self, 
@@ -163,14 +560,18 @@ class CoreAgent:
         has_remaining_files: bool
     ) -> str:
         """Processes a single chunk of content through the LLM"""
+        return chain.invoke(self._build_chunk_input(content, query, previous_response, has_remaining_files))
+
+    def _build_chunk_input(self, content: str, query: str, previous_response: str, has_remaining_files: bool) -> Dict:
+        """Builds the query chain input for a single chunk of content"""
         context = self.prompt_manager.prepare_query_context(previous_response, has_remaining_files)
         
-        return chain.invoke({
+        return {
             "context": self.extra_context_doc,
             "code_content": content,
             "user_query": query,
             **context
-        })
+        }
 
     def _format_final_response(self, responses: list) -> str:
         """Formats the final response from all chunks"""
@@ -1,116 +1,641 @@
+import asyncio
 import json
 import os
-from ..managers.llm_manager import LLMManager
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from ..managers.llm_manager import LLMManager, DEFAULT_REQUESTS_PER_SECOND
 from ..managers.file_manager import FileManager
 from ..managers.prompt_manager import PromptManager
+from ..managers.cache_manager import ResponseCache
+from ..managers.request_scheduler import RequestScheduler
+from ..managers.token_manager import TokenManager
+from ..managers.summary_manager import SummaryManager
+from ..indexes.lexical_index import LexicalIndex
+from ..indexes.symbol_index import SymbolIndex, CALLABLE_KINDS, extract_symbols
+from ..indexes.dependency_graph import DependencyGraph, extract_imports
 from ..utils.utils import Utils
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from pydantic import BaseModel, Field
-from typing import List, Dict
+from typing import AsyncIterator, Callable, Iterable, Iterator, List, Dict, Optional, Tuple
+
+# Number of processed files between mapping and manifest commits during a mapping run
+MANIFEST_SAVE_INTERVAL = 50
+
+# Number of lines per embedded code chunk when embed_code is enabled
+EMBEDDING_CHUNK_LINES = 80
+
+# Files of at most this many tokens are mapped several per request when batch_small_files is set
+SMALL_FILE_MAX_TOKENS = 500
+
+# Larger files are not read to count their tokens, since they cannot be small
+SMALL_FILE_MAX_BYTES = SMALL_FILE_MAX_TOKENS * 8
+
+# Upper bounds of the file content tokens and the number of files of one batched mapping request
+MAPPING_BATCH_MAX_TOKENS = 4000
+MAPPING_BATCH_MAX_FILES = 10
 
 class MappingAgent:
-    def __init__(self, model_name: str, src_path: str, app_data_path: str = None):
+    def __init__(self, model_name: str, src_path: str, app_data_path: str = None,
+                 max_workers: int = 1, requests_per_second: Optional[float] = None, mapping_store = None,
+                 embedder = None, embed_code: bool = False, response_cache = None, static_symbols: bool = True,
+                 scan_options: Optional[Dict] = None, batch_small_files: bool = False,
+                 request_scheduler = None):
         """
         Initialize the mapping agent with:
         - LLM model name - supported list (openai, azure, ollama, gemini, anthropic)
         - Source code path
         - Output path for JSON files
         - File manager instance
+        - Optional: max_workers for concurrent file analysis (1 = sequential)
+        - Optional: requests_per_second limit for the provider (defaults to the provider
+          limit when max_workers > 1); not used with a request_scheduler, which paces requests itself
+        - Optional: mapping_store type ("json", "sqlite") or MappingStore instance
+        - Optional: embedder - LangChain Embeddings instance (e.g. HashingEmbedder) used to
+          build the vector index; embed_code also embeds the file content in chunks
+        - Optional: response_cache - True to cache LLM responses in app_data, or a ResponseCache instance
+        - Optional: static_symbols - fill the functions of mapping entries from the statically extracted
+          symbols and ask the LLM only for descriptions (languages without an extractor still use the LLM)
+        - Optional: scan_options - FileScanner arguments, e.g. {"extensions": {".py"}, "max_file_size": 500000}
+        - Optional: batch_small_files - map files of at most SMALL_FILE_MAX_TOKENS tokens several per
+          LLM request; files of a batch whose response cannot be parsed are mapped one by one
+        - Optional: request_scheduler - True to schedule LLM requests with the provider's shared
+          RequestScheduler (rate limits, retries with backoff, adaptive concurrency), or a RequestScheduler instance
         """
+        if request_scheduler is True:
+            request_scheduler = RequestScheduler.for_provider(model_name)
+        self.request_scheduler = request_scheduler or None
         llm_manager = LLMManager()
-        self.prompt_manager = PromptManager()
-        self.llm_model = llm_manager.create_model_instance_by_name(model_name, 'AZ_OPENAI_LLM_4_O_MINI')
+        if self.request_scheduler is not None:
+            # The scheduler is the only limiter and retries; the client neither throttles nor retries
+            self.llm_model = llm_manager.create_model_instance_by_name(model_name, 'AZ_OPENAI_LLM_4_O_MINI', max_retries=0)
+        else:
+            if requests_per_second is None and max_workers > 1:
+                requests_per_second = DEFAULT_REQUESTS_PER_SECOND.get(model_name)
+            self.llm_model = llm_manager.create_model_instance_by_name(
+                model_name, 'AZ_OPENAI_LLM_4_O_MINI', requests_per_second=requests_per_second
+            )
         self.src_path = src_path
         if not app_data_path:
             app_data_path = Utils.get_app_data_path(src_path)
         
         self.app_data_path = app_data_path
-        self.file_manager = FileManager(src_path, app_data_path)
+        self.file_manager = FileManager(src_path, app_data_path, mapping_store, scan_options)
+        if response_cache is True:
+            response_cache = ResponseCache(self.file_manager.response_cache_path)
+        self.response_cache = response_cache or None
+        self.prompt_manager = PromptManager(self.response_cache, self.request_scheduler)
+        self.max_workers = max(1, max_workers)
+        self.token_manager = TokenManager(self.llm_model, self.file_manager.token_cache_path)
+        self.summary_manager = SummaryManager(
+            self.file_manager, self.prompt_manager, self.llm_model, self.token_manager, self.max_workers
+        )
+        self.batch_small_files = batch_small_files
+        self.embedder = embedder
+        self.embed_code = embed_code
+        self.vector_index = None
+        if embedder is not None:
+            # numpy is only needed when vector retrieval is enabled
+            from ..indexes.vector_index import VectorIndex
+            self.vector_index = VectorIndex(self.file_manager.vector_index_path)
+        self.static_symbols = static_symbols
+        self.symbol_index = SymbolIndex.load(self.file_manager.symbol_index_path)
+        self.dependency_graph = DependencyGraph.load(self.file_manager.dependency_graph_path)
         self.unmapped_files = []
 
-    def run_mapping_process(self, ovveride: bool = False, generate_summery = True):
+    def run_mapping_process(self, ovveride: bool = False, generate_summery = True, max_workers: int = None):
         """
         Main function to run the entire mapping process:
         1. Scan source directory
-        2. Process each file
-        3. Save mapping results
+        2. Select added or changed files using the file manifest (all files if ovveride)
+        3. Process each file (concurrently when max_workers > 1)
+        4. Save mapping results and file fingerprints
+        5. Drop mapping entries of deleted files
+        6. Update the summaries of changed directories and the project summary
+
+        The changed files are selected before the first analysis, so progress is reported
+        as "i/N" of the files to process; the scan itself only stats files and is fast
+        next to the LLM calls. File analyses run in a bounded window of worker threads, but results are
+        saved, summarized and reported in scan order, so the output is the same
+        as a sequential run. With batch_small_files, small files are reported when
+        their batch is analyzed, after the larger files scanned in the meantime.
 
         Yields:
             str: Status message for each file being processed
         """
+        max_workers = max(1, max_workers or self.max_workers)
+        self.unmapped_files = []
         
         # Get all relevant files from FileManager
-        code_files = self.file_manager.scan_directory()
-        
-        if not ovveride and os.path.exists(self.file_manager.main_json_path):
-            exist_mapped = self.file_manager.get_mapped_files()
-            code_files = [file for file in code_files if file not in exist_mapped]
+        manifest = self.file_manager.read_manifest()
+        scanned_names = set()
+        code_files = list(self.file_manager.iter_changed_files(
+            self.file_manager.iter_code_files(), manifest, scanned_names, include_unchanged=ovveride
+        ))
         
         # Process each file
-        for file_path in code_files:
-            try:
-                current_index = code_files.index(file_path)
-                status_message = f"Processing {current_index + 1}/{len(code_files)}: {os.path.basename(file_path)}"
-                yield status_message
-                
-                self.process_single_file(file_path, generate_summery)
-            except Exception as e:
-                error_message = f"Error processing file {file_path}: {str(e)}"
-                yield error_message
-                self.unmapped_files.append(file_path)
-                continue
+        analyses = self._iter_file_analyses(code_files, max_workers)
+        try:
+            for current_index, (file_path, get_analysis) in enumerate(analyses):
+                try:
+                    status_message = f"Processing {current_index + 1}/{len(code_files)}: {os.path.basename(file_path)}"
+                    yield status_message
+                    
+                    analysis = get_analysis()
+                    self._save_file_results(file_path, analysis)
+                    manifest[self.file_manager.get_relative_path(file_path)] = analysis["fingerprint"]
+                    if (current_index + 1) % MANIFEST_SAVE_INTERVAL == 0:
+                        self._persist_progress(manifest)
+                except Exception as e:
+                    error_message = f"Error processing file {file_path}: {str(e)}"
+                    yield error_message
+                    self.unmapped_files.append(file_path)
+                    continue
+        finally:
+            self._persist_progress(manifest)
+
+        deleted_count = self._remove_deleted_files(scanned_names, manifest)
+        if deleted_count:
+            yield f"Removed {deleted_count} deleted files from the mapping."
+
+        # The search index only needs the mapping, so a failing summary cannot leave it stale
+        self.build_search_index()
+
+        if generate_summery:
+            yield "Updating project summary..."
+            for message in self._update_summary():
+                yield message
 
         yield f"Mapping process completed. {len(self.unmapped_files)} files could not be processed."
         for file in self.unmapped_files:
             yield f"Unmapped file: {file}"
-    
+
+    async def arun_mapping_process(self, ovveride: bool = False, generate_summery = True, max_workers: int = None,
+                                   file_timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Async variant of run_mapping_process, yielding the same status messages.
+        Files are analyzed by asyncio tasks on the chains' ainvoke, at most max_workers at once and
+        2 * max_workers in flight; scanning, file reads, saving and the summary run in the default
+        executor, so the event loop is not blocked.
+        A file whose analysis takes longer than file_timeout seconds is reported and left unmapped.
+        Closing or cancelling the generator cancels the pending analyses and saves the progress so far
+        (on the event loop, since a closed generator cannot await).
+
+        Yields:
+            str: Status message for each file being processed
+        """
+        loop = asyncio.get_running_loop()
+        max_workers = max(1, max_workers or self.max_workers)
+        self.unmapped_files = []
+
+        manifest = await loop.run_in_executor(None, self.file_manager.read_manifest)
+        scanned_names = set()
+        code_files = await loop.run_in_executor(None, lambda: list(self.file_manager.iter_changed_files(
+            self.file_manager.iter_code_files(), manifest, scanned_names, include_unchanged=ovveride
+        )))
+        if self.batch_small_files:
+            units = self._iter_work_units(code_files)
+        else:
+            units = ([file_path] for file_path in code_files)
+
+        semaphore = asyncio.Semaphore(max_workers)
+        pending = deque()
+        current_index = 0
+        completed = False
+        try:
+            # Work units are built lazily (batching reads the files), so each step runs in the executor
+            for _ in range(max_workers * 2):
+                unit = await loop.run_in_executor(None, next, units, None)
+                if unit is None:
+                    break
+                pending.append((unit, asyncio.ensure_future(self._aanalyze_unit(unit, semaphore, file_timeout))))
+            while pending:
+                unit, task = pending.popleft()
+                results = None
+                for index, file_path in enumerate(unit):
+                    current_index += 1
+                    try:
+                        yield f"Processing {current_index}/{len(code_files)}: {os.path.basename(file_path)}"
+
+                        if results is None:
+                            results = await task
+                        if isinstance(results[index], Exception):
+                            raise results[index]
+                        analysis = results[index]
+                        await loop.run_in_executor(None, self._save_file_results, file_path, analysis)
+                        manifest[self.file_manager.get_relative_path(file_path)] = analysis["fingerprint"]
+                        if current_index % MANIFEST_SAVE_INTERVAL == 0:
+                            await loop.run_in_executor(None, self._persist_progress, manifest)
+                    except Exception as e:
+                        yield f"Error processing file {file_path}: {str(e)}"
+                        self.unmapped_files.append(file_path)
+                        continue
+                next_unit = await loop.run_in_executor(None, next, units, None)
+                if next_unit is not None:
+                    pending.append((next_unit, asyncio.ensure_future(self._aanalyze_unit(next_unit, semaphore, file_timeout))))
+            completed = True
+        finally:
+            for _, task in pending:
+                task.cancel()
+            if not completed:
+                # The generator was closed or failed; awaiting is not allowed when it is closed
+                self._persist_progress(manifest)
+        await loop.run_in_executor(None, self._persist_progress, manifest)
+
+        deleted_count = await loop.run_in_executor(None, self._remove_deleted_files, scanned_names, manifest)
+        if deleted_count:
+            yield f"Removed {deleted_count} deleted files from the mapping."
+
+        await loop.run_in_executor(None, self.build_search_index)
+
+        if generate_summery:
+            yield "Updating project summary..."
+            for message in await loop.run_in_executor(None, self._update_summary):
+                yield message
+
+        yield f"Mapping process completed. {len(self.unmapped_files)} files could not be processed."
+        for file in self.unmapped_files:
+            yield f"Unmapped file: {file}"
+
+    def _update_summary(self) -> List[str]:
+        """
+        Update the directory and project summaries; returns the status messages. Failures are
+        reported per directory, the previous summaries are kept and retried on the next run.
+        """
+        try:
+            updated_directories = self.summary_manager.update_summary(self.file_manager.get_mapping_data())
+        except Exception as e:
+            return [f"Error updating project summary: {str(e)}"]
+        messages = [
+            f"Error summarizing directory {directory or '.'}: {error}; kept its previous summary."
+            for directory, error in self.summary_manager.failed_directories.items()
+        ]
+        if self.summary_manager.roll_up_error:
+            messages.append(f"Error updating project summary: {self.summary_manager.roll_up_error}; kept the previous summary.")
+        messages.append(f"Updated the summaries of {updated_directories} directories.")
+        return messages
+
+    def _remove_deleted_files(self, scanned_names: set, manifest: Dict) -> int:
+        """
+        Drop the mapping, index and manifest entries of mapped files missing from a complete scan.
+
+        Returns:
+            int: Number of deleted files
+        """
+        deleted_files = self.file_manager.get_deleted_files(scanned_names)
+        if deleted_files:
+            self.file_manager.remove_mappings(deleted_files)
+            if self.vector_index is not None:
+                self.vector_index.remove(deleted_files)
+            self.symbol_index.remove(deleted_files)
+            self.dependency_graph.remove(deleted_files)
+            for file_name in deleted_files:
+                manifest.pop(file_name, None)
+            self._persist_progress(manifest)
+        return len(deleted_files)
+
+    def build_search_index(self) -> None:
+        """
+        Rebuild the local lexical index from the current mapping, resolve the dependency
+        graph and save both in app_data
+        """
+        LexicalIndex.build(self.file_manager.get_mapping_data()).save(self.file_manager.lexical_index_path)
+        self.dependency_graph.resolve()
+        self.dependency_graph.save(self.file_manager.dependency_graph_path)
+
+    def _persist_progress(self, manifest: Dict) -> None:
+        """
+        Commit pending mapping writes, then the manifest, so the manifest never
+        lists a file whose mapping was not saved. Also saves the symbol and vector indexes
+        and the imports of the dependency graph (resolved by build_search_index).
+        """
+        self.file_manager.commit_mappings()
+        self.symbol_index.save(self.file_manager.symbol_index_path)
+        self.dependency_graph.save(self.file_manager.dependency_graph_path)
+        self.file_manager.save_manifest(manifest)
+        if self.vector_index is not None:
+            self.vector_index.save()
+        self.token_manager.save_token_cache()
+
+    def _iter_file_analyses(self, code_files: Iterable[str], max_workers: int) -> Iterator[Tuple[str, Callable]]:
+        """
+        Yield (file_path, get_analysis) pairs in the order of the work units of code_files, which may be a generator.
+        Calling get_analysis returns the analysis dict of _analyze_file or raises the analysis error.
+        With more than one worker, at most 2 * max_workers units are in flight at once.
+        """
+        if self.batch_small_files:
+            units = self._iter_work_units(code_files)
+        else:
+            units = ([file_path] for file_path in code_files)
+
+        if max_workers <= 1:
+            for unit in units:
+                yield from self._get_unit_analyses(unit, partial(self._analyze_unit, unit))
+            return
+
+        window_size = max_workers * 2
+        pending = deque()
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="codeace-mapping")
+        try:
+            for unit in islice(units, window_size):
+                pending.append((unit, executor.submit(self._analyze_unit, unit)))
+            while pending:
+                unit, future = pending.popleft()
+                yield from self._get_unit_analyses(unit, future.result)
+                next_unit = next(units, None)
+                if next_unit is not None:
+                    pending.append((next_unit, executor.submit(self._analyze_unit, next_unit)))
+        finally:
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    @staticmethod
+    def _get_unit_analyses(unit: List[str], get_results: Callable) -> List[Tuple[str, Callable]]:
+        """
+        Return the (file_path, get_analysis) pairs of a work unit. The unit is analyzed
+        (or its future awaited) by the first get_analysis call.
+        """
+        results = []
+
+        def get_analysis(index: int) -> Dict:
+            if not results:
+                results.extend(get_results())
+            if isinstance(results[index], Exception):
+                raise results[index]
+            return results[index]
+
+        return [(file_path, partial(get_analysis, index)) for index, file_path in enumerate(unit)]
+
+    def _iter_work_units(self, code_files: Iterable[str]) -> Iterator[List[str]]:
+        """
+        Group code files into work units. Small files are packed into batches of at most
+        MAPPING_BATCH_MAX_TOKENS content tokens and MAPPING_BATCH_MAX_FILES files; every other
+        file is a unit of its own and is not held back by the batch being filled.
+        """
+        budget = min(MAPPING_BATCH_MAX_TOKENS, self.token_manager.max_tokens)
+        batch = []
+        batch_tokens = 0
+        for file_path in code_files:
+            tokens = self._get_small_file_tokens(file_path)
+            if tokens is None:
+                yield [file_path]
+                continue
+            if batch and (batch_tokens + tokens > budget or len(batch) >= MAPPING_BATCH_MAX_FILES):
+                yield batch
+                batch = []
+                batch_tokens = 0
+            batch.append(file_path)
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+    def _get_small_file_tokens(self, file_path: str) -> Optional[int]:
+        """Token count of a file of at most SMALL_FILE_MAX_TOKENS tokens, or None for other files"""
+        try:
+            if os.path.getsize(file_path) > SMALL_FILE_MAX_BYTES:
+                return None
+            content = self.file_manager.read_file(file_path)
+        except (IOError, ValueError):
+            # Mapped on its own, so the error is reported for this file only
+            return None
+        tokens = self.token_manager.calculate_tokens(content)
+        return tokens if tokens <= SMALL_FILE_MAX_TOKENS else None
+
+    def _analyze_unit(self, file_paths: List[str]) -> List:
+        """
+        Analyze a work unit; returns the analysis dict or the raised exception of each file.
+        Files missing from the response of a batch, or of a batch whose request or parsing
+        failed, are analyzed one by one.
+        """
+        analyses = {}
+        if len(file_paths) > 1:
+            try:
+                analyses = self._analyze_small_files(file_paths)
+            except Exception:
+                analyses = {}
+
+        results = []
+        for file_path in file_paths:
+            if file_path in analyses:
+                results.append(analyses[file_path])
+                continue
+            try:
+                results.append(self._analyze_file(file_path))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    async def _aanalyze_unit(self, file_paths: List[str], semaphore: asyncio.Semaphore,
+                             timeout: Optional[float] = None) -> List:
+        """
+        Async variant of _analyze_unit; each request is given timeout seconds
+        """
+        async with semaphore:
+            analyses = {}
+            if len(file_paths) > 1:
+                try:
+                    analyses = await asyncio.wait_for(self._aanalyze_small_files(file_paths), timeout)
+                except Exception:
+                    analyses = {}
+
+            results = []
+            for file_path in file_paths:
+                if file_path in analyses:
+                    results.append(analyses[file_path])
+                    continue
+                try:
+                    results.append(await asyncio.wait_for(self._aanalyze_file(file_path), timeout))
+                except asyncio.TimeoutError:
+                    results.append(TimeoutError(f"Analysis of {file_path} timed out after {timeout} seconds"))
+                except Exception as e:
+                    results.append(e)
+            return results
+
     def process_single_file(self, file_path: str, generate_summery = True) -> None:
         """
         Process a single file and save mapping results
         """
         try:
-            # Get file content from FileManager
-            content = self.file_manager.read_file(file_path)
-            
-            # Generate description using LLM
-            description = self._generate_file_description(content, file_path)
-            
-            if generate_summery:
-                # Generate summary using LLM
-                self._generate_summary(content, file_path)
+            analysis = self._analyze_file(file_path)
+            self._save_file_results(file_path, analysis)
 
-            # Create mapping structure
-            mapping_data = self._create_mapping_structure(file_path,description)
-            
-            # Save mapping using FileManager
-            self.file_manager.save_mapping(mapping_data)
+            manifest = self.file_manager.read_manifest()
+            manifest[self.file_manager.get_relative_path(file_path)] = analysis["fingerprint"]
+            self._persist_progress(manifest)
+            if generate_summery:
+                self.summary_manager.update_summary(self.file_manager.get_mapping_data())
 
         except Exception as e:
             raise e
-            
 
-    def _generate_file_description(self, content: str, file_path: str) -> Dict:
+    def _analyze_file(self, file_path: str) -> Dict:
         """
-        Use LLM to generate file description based on content
-        Uses predefined prompt template
+        Read a file, fingerprint it, extract its symbols and imports, generate its description and,
+        if an embedder is set, its embeddings. Safe to run from worker threads.
+
+        Returns:
+            Dict: content, description, symbols and imports (None for unsupported languages),
+            fingerprint and embedding ((labels, vectors) or None)
         """
-        # Run LLM to generate description
-        mapping_chain = self.prompt_manager.create_mapping_chain(self.llm_model)
-        result = mapping_chain.invoke(input={'file_name': file_path, "file_content": content})
+        analysis = self._read_file_facts(file_path)
+        chain = self._get_file_chain(analysis["symbols"])
+        result = chain.invoke(input={'file_name': file_path, "file_content": analysis["content"]})
+        return self._complete_analysis(file_path, analysis, self._get_file_description(result, analysis["symbols"]))
 
-        return result
-    
-    def _generate_summary(self, content: str, file_path: str) -> None:
+    async def _aanalyze_file(self, file_path: str) -> Dict:
         """
-        Use LLM to generate summary based on content
+        Async variant of _analyze_file; file reads, extraction and embeddings run in the default executor
         """
-        # Run summarization chain
-        last_summary = self.file_manager.read_summary()
-        summary_chain = self.prompt_manager.create_summery_update_chain(self.llm_model)
-        summary = summary_chain.invoke(input={"existing_summary": last_summary,"file_name":file_path , "file_content":content})
-        self.file_manager.save_summary(summary)
-    
+        loop = asyncio.get_running_loop()
+        analysis = await loop.run_in_executor(None, self._read_file_facts, file_path)
+        chain = self._get_file_chain(analysis["symbols"])
+        result = await chain.ainvoke(input={'file_name': file_path, "file_content": analysis["content"]})
+        description = self._get_file_description(result, analysis["symbols"])
+        return await loop.run_in_executor(None, self._complete_analysis, file_path, analysis, description)
+
+    def _get_file_chain(self, symbols: Optional[List[Dict]]):
+        """The mapping chain of a file: description only when its functions are known statically"""
+        if symbols is None or not self.static_symbols:
+            # Generate description and functions using LLM
+            return self.prompt_manager.create_mapping_chain(self.llm_model)
+        # Functions are known statically, so the LLM only describes the file
+        return self.prompt_manager.create_description_chain(self.llm_model)
+
+    def _get_file_description(self, result: Dict, symbols: Optional[List[Dict]]) -> Dict:
+        """The description dict of a chain result, with the statically extracted functions if known"""
+        functions = result.get("functions", "")
+        if symbols is not None and self.static_symbols:
+            functions = self._get_static_functions(symbols)
+        return {"description": result["description"], "functions": functions, "summary": result.get("summary", "")}
+
+    def _analyze_small_files(self, file_paths: List[str]) -> Dict[str, Dict]:
+        """
+        Analyze several small files with one batched mapping request.
+
+        Returns:
+            Dict[str, Dict]: Analysis dict of each file found in the response, by file path
+        """
+        facts, names, batch_input = self._read_small_files(file_paths)
+        batch_chain = self.prompt_manager.create_batch_mapping_chain(self.llm_model)
+        return self._collect_batch_analyses(batch_chain.invoke(input=batch_input), facts, names)
+
+    async def _aanalyze_small_files(self, file_paths: List[str]) -> Dict[str, Dict]:
+        """
+        Async variant of _analyze_small_files
+        """
+        loop = asyncio.get_running_loop()
+        facts, names, batch_input = await loop.run_in_executor(None, self._read_small_files, file_paths)
+        batch_chain = self.prompt_manager.create_batch_mapping_chain(self.llm_model)
+        result = await batch_chain.ainvoke(input=batch_input)
+        return await loop.run_in_executor(None, self._collect_batch_analyses, result, facts, names)
+
+    def _read_small_files(self, file_paths: List[str]) -> Tuple[Dict, Dict, Dict]:
+        """
+        Read the files of a batch.
+
+        Returns:
+            Tuple[Dict, Dict, Dict]: Facts by file path, file paths by '/'-separated relative name,
+            and the batch mapping chain input
+        """
+        facts = {}
+        names = {}
+        for file_path in file_paths:
+            facts[file_path] = self._read_file_facts(file_path)
+            names[self.file_manager.get_relative_path(file_path).replace(os.sep, "/")] = file_path
+        files_text = "\n\n".join(f"File name: {name}\n{facts[file_path]['content']}" for name, file_path in names.items())
+        return facts, names, {"files": files_text}
+
+    def _collect_batch_analyses(self, result: Dict, facts: Dict, names: Dict) -> Dict[str, Dict]:
+        """Analysis dicts of the files found in a batch mapping result, by file path"""
+        analyses = {}
+        for item in result.get("files") or []:
+            if not isinstance(item, dict) or not item.get("description"):
+                continue
+            file_path = names.get(str(item.get("file_name", "")).strip().replace("\\", "/"))
+            if file_path is None or file_path in analyses:
+                continue
+            description = self._get_file_description(item, facts[file_path]["symbols"])
+            analyses[file_path] = self._complete_analysis(file_path, facts[file_path], description)
+        return analyses
+
+    def _read_file_facts(self, file_path: str) -> Dict:
+        """Read a file and return its content, fingerprint, symbols and imports"""
+        # Fingerprint before reading, so an edit made during analysis is picked up by the next run
+        fingerprint = self.file_manager.get_file_fingerprint(file_path)
+
+        # Get file content from FileManager
+        content = self.file_manager.read_file(file_path)
+
+        # Symbols feed the symbol index whatever fills the mapping's functions field
+        return {
+            "content": content,
+            "symbols": extract_symbols(file_path, content),
+            "imports": extract_imports(file_path, content),
+            "fingerprint": fingerprint,
+        }
+
+    def _complete_analysis(self, file_path: str, facts: Dict, description: Dict) -> Dict:
+        """Add the description and embeddings to the facts of _read_file_facts"""
+        analysis = dict(facts)
+        analysis["description"] = description
+        analysis["embedding"] = self._generate_embeddings(file_path, facts["content"], description, facts["fingerprint"])
+        return analysis
+
+    @staticmethod
+    def _get_static_functions(symbols: List[Dict]) -> str:
+        """The mapping's functions field from statically extracted symbols"""
+        functions = [symbol["qualified_name"] for symbol in symbols if symbol["kind"] in CALLABLE_KINDS]
+        return ", ".join(dict.fromkeys(functions))
+
+    def _save_file_results(self, file_path: str, analysis: Dict) -> None:
+        """
+        Update the mapping, symbol index, dependency graph and vector index with an analyzed file.
+        Must run on the calling thread, since these steps update shared files.
+        """
+        # Create mapping structure
+        mapping_data = self._create_mapping_structure(file_path, analysis["description"])
+        
+        # Save mapping using FileManager
+        self.file_manager.save_mapping(mapping_data)
+        if analysis["symbols"] is not None:
+            self.symbol_index.update_file(mapping_data["file_name"], analysis["symbols"])
+        if analysis["imports"] is not None:
+            self.dependency_graph.update_file(mapping_data["file_name"], analysis["imports"])
+
+        if analysis["embedding"] is not None:
+            labels, vectors = analysis["embedding"]
+            self.vector_index.upsert(
+                mapping_data["file_name"], analysis["fingerprint"]["content_hash"], vectors, labels
+            )
+
+    def _generate_embeddings(self, file_path: str, content: str, description: Dict, fingerprint: Dict):
+        """
+        Embed the file description and, if embed_code is set, its code in chunks of lines.
+        Returns None when no embedder is set or the file was already embedded from the same content.
+
+        Returns:
+            Tuple[List[str], List[List[float]]]: Row labels and vectors, or None
+        """
+        if self.embedder is None:
+            return None
+        file_name = self.file_manager.get_relative_path(file_path)
+        if not self.vector_index.needs_update(file_name, fingerprint["content_hash"]):
+            return None
+
+        labels = ["description"]
+        texts = [f"{file_name}\n{description['description']}\n{description['functions']}"]
+        if self.embed_code:
+            lines = content.splitlines()
+            for start in range(0, len(lines), EMBEDDING_CHUNK_LINES):
+                end = min(start + EMBEDDING_CHUNK_LINES, len(lines))
+                labels.append(f"lines {start + 1}-{end}")
+                texts.append(f"{file_name}\n" + "\n".join(lines[start:end]))
+        return labels, self.embedder.embed_documents(texts)
+            
+
     # TODO - Is this function needed?
     def _create_mapping_structure(self, 
                                 file_path: str, 
@@ -124,6 +649,7 @@ class MappingAgent:
             "file_name": file_path,
             "description": description["description"],
             "functions": description["functions"],
+            "summary": description.get("summary", ""),
         }
     
 
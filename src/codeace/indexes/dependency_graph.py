@@ -0,0 +1,360 @@
+import ast
+import os
+import posixpath
+import re
+from typing import List, Dict, Optional
+from ..utils.utils import Utils
+
+# Damping factor and iterations of the PageRank centrality of files
+PAGERANK_DAMPING = 0.85
+PAGERANK_ITERATIONS = 30
+
+# Header extensions of C++ includes; headers are not mapped, so an include resolves to the source of the same name
+_HEADER_EXTENSIONS = (".h", ".hpp", ".hh", ".hxx")
+_SCRIPT_EXTENSIONS = (".ts", ".js")
+# Directories top-level Python modules are commonly imported from, besides the importing file's own
+_PYTHON_SOURCE_ROOTS = ("", "src", "lib")
+
+_JS_IMPORT_PATTERN = re.compile(
+    r"""(?:\bimport\s+(?:[\w*{}\s,$]+\s+from\s+)?|\bexport\s+[\w*{}\s,$]+\s+from\s+|\brequire\s*\(\s*|\bimport\s*\(\s*)['"]([^'"]+)['"]"""
+)
+_JAVA_IMPORT_PATTERN = re.compile(r"^\s*import\s+(?:static\s+)?([\w.]+(?:\.\*)?)\s*;", re.MULTILINE)
+_CS_USING_PATTERN = re.compile(r"^\s*(?:global\s+)?using\s+(?:static\s+)?(?:\w+\s*=\s*)?([\w.]+)\s*;", re.MULTILINE)
+_GO_IMPORT_BLOCK_PATTERN = re.compile(r"^import\s*\((.*?)\)", re.MULTILINE | re.DOTALL)
+_GO_IMPORT_PATTERN = re.compile(r"""^import\s+(?:[\w.]+\s+)?"([^"]+)\"""", re.MULTILINE)
+_GO_QUOTED_PATTERN = re.compile(r'"([^"]+)"')
+_RUBY_REQUIRE_PATTERN = re.compile(r"""^\s*(require|require_relative|load)\s*\(?\s*['"]([^'"]+)['"]""", re.MULTILINE)
+_CPP_INCLUDE_PATTERN = re.compile(r'^\s*#\s*include\s*"([^"]+)"', re.MULTILINE)
+
+
+def extract_imports(file_path: str, content: str) -> Optional[List[str]]:
+    """
+    Statically extract the import specifiers of a source file, as written in the file.
+    Python relative imports keep their leading dots; Ruby relative requires are prefixed
+    with './'. Specifiers are resolved to files later by DependencyGraph.resolve.
+
+    Returns:
+        Optional[List[str]]: Unique specifiers in file order; None if the language is not supported
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == ".py":
+        specifiers = _extract_python_imports(content)
+    elif extension in _SCRIPT_EXTENSIONS:
+        specifiers = _JS_IMPORT_PATTERN.findall(content)
+    elif extension == ".java":
+        specifiers = _JAVA_IMPORT_PATTERN.findall(content)
+    elif extension == ".cs":
+        specifiers = _CS_USING_PATTERN.findall(content)
+    elif extension == ".go":
+        specifiers = []
+        for block in _GO_IMPORT_BLOCK_PATTERN.findall(content):
+            specifiers.extend(_GO_QUOTED_PATTERN.findall(block))
+        specifiers.extend(_GO_IMPORT_PATTERN.findall(content))
+    elif extension == ".rb":
+        specifiers = [
+            f"./{path}" if kind == "require_relative" else path
+            for kind, path in _RUBY_REQUIRE_PATTERN.findall(content)
+        ]
+    elif extension == ".cpp":
+        specifiers = _CPP_INCLUDE_PATTERN.findall(content)
+    else:
+        return None
+    return list(dict.fromkeys(specifiers))
+
+
+def _extract_python_imports(content: str) -> List[str]:
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        return []
+    specifiers = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            specifiers.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            module = "." * node.level + (node.module or "")
+            separator = "" if module.endswith(".") or not module else "."
+            # 'from pkg import name' may import the module pkg.name; resolve falls back to pkg
+            specifiers.extend(f"{module}{separator}{alias.name}" for alias in node.names if alias.name != "*")
+            if any(alias.name == "*" for alias in node.names):
+                specifiers.append(module)
+    return specifiers
+
+
+class DependencyGraph:
+    """
+    Import graph of the mapped files, built statically at mapping time and stored in app_data.
+    The import specifiers of every file are kept, so the graph is updated incrementally,
+    and are resolved to files as a compact adjacency list (file indexes) with a PageRank
+    centrality per file. Used to expand a set of relevant files without LLM calls.
+    """
+
+    def __init__(self):
+        self.imports: Dict[str, List[str]] = {}
+        self.files: List[str] = []
+        self.edges: List[List[int]] = []
+        self.centrality: List[float] = []
+        self._positions: Dict[str, int] = {}
+        self._reverse_edges: Optional[List[List[int]]] = None
+
+    def update_file(self, file_name: str, specifiers: List[str]) -> None:
+        """
+        Replace the import specifiers of a file. Edges change on the next resolve()
+        """
+        self.imports[file_name] = specifiers
+
+    def remove(self, file_names: List[str]) -> None:
+        """
+        Remove files from the graph. Edges change on the next resolve()
+        """
+        for file_name in file_names:
+            self.imports.pop(file_name, None)
+
+    def resolve(self) -> None:
+        """
+        Resolve the import specifiers of all files to edges between files and update centrality
+        """
+        self.files = sorted(self.imports)
+        self._positions = {file_name: index for index, file_name in enumerate(self.files)}
+        # Mapping file names use the platform's separator; the resolver works on '/' paths
+        posix_names = {file_name.replace("\\", "/"): file_name for file_name in self.files}
+        resolver = _ImportResolver(list(posix_names))
+        self.edges = []
+        for file_name in self.files:
+            targets = []
+            for specifier in self.imports[file_name]:
+                for target in resolver.resolve(file_name.replace("\\", "/"), specifier):
+                    position = self._positions[posix_names[target]]
+                    if posix_names[target] != file_name and position not in targets:
+                        targets.append(position)
+            self.edges.append(targets)
+        self._reverse_edges = None
+        self.centrality = self._compute_pagerank()
+
+    def _compute_pagerank(self) -> List[float]:
+        count = len(self.files)
+        if not count:
+            return []
+        ranks = [1.0 / count] * count
+        for _ in range(PAGERANK_ITERATIONS):
+            # Files without imports spread their rank evenly
+            dangling = sum(rank for rank, targets in zip(ranks, self.edges) if not targets)
+            base = (1 - PAGERANK_DAMPING) / count + PAGERANK_DAMPING * dangling / count
+            next_ranks = [base] * count
+            for source, targets in enumerate(self.edges):
+                if targets:
+                    share = PAGERANK_DAMPING * ranks[source] / len(targets)
+                    for target in targets:
+                        next_ranks[target] += share
+            ranks = next_ranks
+        return ranks
+
+    def _get_reverse_edges(self) -> List[List[int]]:
+        if self._reverse_edges is None:
+            reverse_edges = [[] for _ in self.files]
+            for source, targets in enumerate(self.edges):
+                for target in targets:
+                    reverse_edges[target].append(source)
+            self._reverse_edges = reverse_edges
+        return self._reverse_edges
+
+    def get_imports(self, file_name: str) -> List[str]:
+        """
+        Return the files imported by a file
+        """
+        position = self._positions.get(file_name)
+        return [] if position is None else [self.files[target] for target in self.edges[position]]
+
+    def get_importers(self, file_name: str) -> List[str]:
+        """
+        Return the files importing a file
+        """
+        position = self._positions.get(file_name)
+        return [] if position is None else [self.files[source] for source in self._get_reverse_edges()[position]]
+
+    def expand(self, seed_files: List[str], hops: int = 1, include_importers: bool = False,
+               max_files: Optional[int] = None) -> List[str]:
+        """
+        Return the files reachable from the seed files within the given number of hops,
+        excluding the seeds. Closer files come first, then more central ones.
+
+        Args:
+            seed_files (List[str]): Relative file names to expand from
+            hops (int): Maximum number of import edges to follow
+            include_importers (bool): Also follow edges backwards, to files importing the seeds
+            max_files (Optional[int]): Maximum number of files to return
+        """
+        visited = {self._positions[name] for name in seed_files if name in self._positions}
+        frontier = list(visited)
+        found = []
+        for _ in range(hops):
+            reached = []
+            for position in frontier:
+                neighbours = list(self.edges[position])
+                if include_importers:
+                    neighbours.extend(self._get_reverse_edges()[position])
+                for neighbour in neighbours:
+                    if neighbour not in visited:
+                        visited.add(neighbour)
+                        reached.append(neighbour)
+            if not reached:
+                break
+            found.extend(sorted(reached, key=lambda position: (-self.centrality[position], self.files[position])))
+            frontier = reached
+        names = [self.files[position] for position in found]
+        return names[:max_files] if max_files is not None else names
+
+    def save(self, path: str) -> None:
+        """
+        Save the import specifiers and the resolved graph as JSON
+        """
+        Utils.atomic_write_json(path, {
+            "imports": self.imports,
+            "files": self.files,
+            "edges": self.edges,
+            "centrality": self.centrality,
+        })
+
+    @classmethod
+    def load(cls, path: str) -> "DependencyGraph":
+        """
+        Load a graph saved with save(), or return an empty graph if there is none
+        """
+        graph = cls()
+        if os.path.exists(path):
+            data = Utils.read_json(path)
+            graph.imports = data["imports"]
+            graph.files = data["files"]
+            graph.edges = data["edges"]
+            graph.centrality = data["centrality"]
+            graph._positions = {file_name: index for index, file_name in enumerate(graph.files)}
+        return graph
+
+
+class _ImportResolver:
+    """Resolves import specifiers to mapped files by relative path, or by path suffix for absolute imports"""
+
+    def __init__(self, file_names: List[str]):
+        self.file_names = set(file_names)
+        self.by_suffix: Dict[str, List[str]] = {}
+        self.by_directory_suffix: Dict[str, List[str]] = {}
+        self.by_stem: Dict[str, List[str]] = {}
+        for file_name in file_names:
+            parts = file_name.split("/")
+            for index in range(len(parts)):
+                self.by_suffix.setdefault("/".join(parts[index:]), []).append(file_name)
+            for index in range(len(parts) - 1):
+                self.by_directory_suffix.setdefault("/".join(parts[index:-1]), []).append(file_name)
+            self.by_stem.setdefault(os.path.splitext(file_name)[0], []).append(file_name)
+
+    def resolve(self, file_name: str, specifier: str) -> List[str]:
+        extension = os.path.splitext(file_name)[1].lower()
+        directory = posixpath.dirname(file_name)
+        if extension == ".py":
+            return self._resolve_python(directory, specifier)
+        if extension in _SCRIPT_EXTENSIONS:
+            return self._resolve_script(directory, specifier)
+        if extension == ".java":
+            return self._resolve_dotted(specifier, ".java")
+        if extension == ".cs":
+            return self.by_directory_suffix.get(specifier.replace(".", "/"), [])
+        if extension == ".go":
+            return self._resolve_go(specifier)
+        if extension == ".rb":
+            return self._resolve_path(directory, specifier, [".rb", ""])
+        if extension == ".cpp":
+            stem, include_extension = os.path.splitext(specifier)
+            if include_extension in _HEADER_EXTENSIONS:
+                found = self._resolve_path(directory, f"./{stem}", [".cpp"]) or self._resolve_path(directory, stem, [".cpp"])
+                if found:
+                    return found
+            return self._resolve_path(directory, f"./{specifier}", [""]) or self._resolve_path(directory, specifier, [""])
+        return []
+
+    def _find(self, path: str) -> List[str]:
+        """Files at the exact relative path, or else files whose path ends with it"""
+        if path in self.file_names:
+            return [path]
+        return self.by_suffix.get(path, [])
+
+    def _resolve_python(self, directory: str, specifier: str) -> List[str]:
+        module = specifier.lstrip(".")
+        level = len(specifier) - len(module)
+        base = None
+        if level:
+            base = directory
+            for _ in range(level - 1):
+                base = posixpath.dirname(base)
+        parts = module.split(".") if module else []
+        # 'from pkg import name' is stored as pkg.name; name may be a function, so try pkg too
+        for length in range(len(parts), 0, -1):
+            path = "/".join(parts[:length])
+            if base is not None:
+                path = posixpath.normpath(posixpath.join(base, path)) if path else base
+            elif length == 1:
+                # A top-level module ('import config') is matched only exactly, at a source root or next
+                # to the importing file, so names like 'os' do not match project files by suffix
+                found = self._find_top_level_module(directory, path)
+                if found:
+                    return found
+                break
+            for candidate in (f"{path}.py", f"{path}/__init__.py"):
+                found = [candidate] if candidate in self.file_names else ([] if level else self._find(candidate))
+                if found:
+                    return found
+            if length == len(parts) - 1 or len(parts) <= 1:
+                break
+        if level and not parts and base is not None:
+            candidate = f"{base}/__init__.py" if base else "__init__.py"
+            return [candidate] if candidate in self.file_names else []
+        return []
+
+    def _find_top_level_module(self, directory: str, name: str) -> List[str]:
+        for root in dict.fromkeys((directory,) + _PYTHON_SOURCE_ROOTS):
+            for candidate in (f"{name}.py", f"{name}/__init__.py"):
+                candidate = posixpath.join(root, candidate) if root else candidate
+                if candidate in self.file_names:
+                    return [candidate]
+        return []
+
+    def _resolve_script(self, directory: str, specifier: str) -> List[str]:
+        if not specifier.startswith("."):
+            # Packages are not part of the codebase; path-like specifiers may be base-url imports
+            if "/" not in specifier or specifier.startswith("@") and specifier.count("/") < 2:
+                return []
+        extensions = ["", ".ts", ".js", "/index.ts", "/index.js"]
+        return self._resolve_path(directory, specifier, extensions)
+
+    def _resolve_path(self, directory: str, specifier: str, extensions: List[str]) -> List[str]:
+        relative = specifier.startswith(".")
+        path = posixpath.normpath(posixpath.join(directory, specifier)) if relative else specifier.lstrip("/")
+        for extension in extensions:
+            candidate = f"{path}{extension}"
+            if relative:
+                if candidate in self.file_names:
+                    return [candidate]
+            else:
+                found = self._find(candidate)
+                if found:
+                    return found[:1]
+        return []
+
+    def _resolve_dotted(self, specifier: str, extension: str) -> List[str]:
+        parts = specifier.split(".")
+        if parts[-1] == "*":
+            return self.by_directory_suffix.get("/".join(parts[:-1]), [])
+        # Static imports name a member of a class; try the class file, then its outer classes
+        for length in range(len(parts), 0, -1):
+            found = self._find("/".join(parts[:length]) + extension)
+            if found:
+                return found[:1]
+        return []
+
+    def _resolve_go(self, specifier: str) -> List[str]:
+        # Import paths start with the module path, which is not part of the file names; match the longest suffix
+        parts = specifier.split("/")
+        for index in range(len(parts)):
+            found = self.by_directory_suffix.get("/".join(parts[index:]))
+            if found:
+                return [name for name in found if name.endswith(".go")]
+        return []
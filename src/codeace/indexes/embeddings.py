@@ -0,0 +1,35 @@
+import hashlib
+import math
+from collections import Counter
+from typing import List
+from langchain_core.embeddings import Embeddings
+from .lexical_index import tokenize
+
+
+class HashingEmbedder(Embeddings):
+    """
+    Deterministic local embedder based on feature hashing of search terms.
+    Needs no model or network access, so it suits offline use and tests.
+    Any LangChain Embeddings implementation can be used in its place.
+    """
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for term, count in Counter(tokenize(text)).items():
+            digest = hashlib.md5(term.encode('utf-8')).digest()
+            bucket = int.from_bytes(digest[:4], 'little') % self.dimensions
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[bucket] += sign * (1.0 + math.log(count))
+        norm = math.sqrt(sum(value * value for value in vector))
+        if norm:
+            vector = [value / norm for value in vector]
+        return vector
@@ -0,0 +1,112 @@
+import difflib
+import os
+import posixpath
+from typing import Dict, Iterable, List
+from ..utils.utils import Utils
+
+
+def _normalize(path: str) -> str:
+    """'/'-separated form of a relative path, without leading './' or '/'"""
+    path = path.strip().strip('"\'`').replace('\\', '/')
+    while path.startswith('./'):
+        path = path[2:]
+    return posixpath.normpath(path.lstrip('/')) if path else ''
+
+
+class FileNameIndex:
+    """
+    Index of the scanned files by base name, used to resolve inexact paths (e.g. paths
+    returned by the LLM) without walking the source tree. A path resolves to the files
+    ending with it, or else to files with the same name, ignoring case and extension
+    as a last resort; ambiguous matches are ranked by path similarity.
+    """
+
+    def __init__(self, file_names: Iterable[str] = ()):
+        self.files: Dict[str, str] = {}  # normalized path -> relative name as stored in the mapping
+        self.by_name: Dict[str, List[str]] = {}
+        self.by_stem: Dict[str, List[str]] = {}
+        for file_name in file_names:
+            self.add(file_name)
+
+    def add(self, file_name: str) -> None:
+        """
+        Add a relative file name
+        """
+        path = _normalize(file_name)
+        if path in self.files:
+            return
+        self.files[path] = file_name
+        name = posixpath.basename(path).lower()
+        self.by_name.setdefault(name, []).append(path)
+        self.by_stem.setdefault(os.path.splitext(name)[0], []).append(path)
+
+    def remove(self, file_name: str) -> None:
+        """
+        Remove a relative file name
+        """
+        path = _normalize(file_name)
+        if self.files.pop(path, None) is None:
+            return
+        name = posixpath.basename(path).lower()
+        for key, table in ((name, self.by_name), (os.path.splitext(name)[0], self.by_stem)):
+            paths = table.get(key, [])
+            if path in paths:
+                paths.remove(path)
+            if not paths:
+                table.pop(key, None)
+
+    def resolve(self, path: str) -> List[str]:
+        """
+        Return the relative names of the files matching a possibly partial or inexact path,
+        best match first
+        """
+        query = _normalize(path)
+        if not query or query == '.':
+            return []
+        if query in self.files:
+            return [self.files[query]]
+
+        name = posixpath.basename(query).lower()
+        candidates = self.by_name.get(name, [])
+        lowered_query = query.lower()
+        suffix_matches = [
+            candidate for candidate in candidates
+            if candidate.lower() == lowered_query or candidate.lower().endswith('/' + lowered_query)
+        ]
+        if suffix_matches:
+            candidates = suffix_matches
+        elif not candidates:
+            candidates = self.by_stem.get(os.path.splitext(name)[0], [])
+        return [self.files[candidate] for candidate in self._rank(query, candidates)]
+
+    @staticmethod
+    def _rank(query: str, candidates: List[str]) -> List[str]:
+        """Order by shared trailing path components, then by similarity of the whole path"""
+        if len(candidates) <= 1:
+            return list(candidates)
+        query_parts = query.lower().split('/')
+
+        def sort_key(candidate: str):
+            candidate_parts = candidate.lower().split('/')
+            shared = 0
+            for query_part, candidate_part in zip(reversed(query_parts), reversed(candidate_parts)):
+                if query_part != candidate_part:
+                    break
+                shared += 1
+            ratio = difflib.SequenceMatcher(None, query.lower(), candidate.lower()).ratio()
+            return -shared, -ratio, len(candidate), candidate
+
+        return sorted(candidates, key=sort_key)
+
+    def save(self, path: str) -> None:
+        """
+        Save the indexed file names as JSON
+        """
+        Utils.atomic_write_json(path, {"files": list(self.files.values())})
+
+    @classmethod
+    def load(cls, path: str) -> "FileNameIndex":
+        """
+        Load an index saved with save()
+        """
+        return cls(Utils.read_json(path)["files"])
@@ -0,0 +1,116 @@
+import math
+import re
+from collections import Counter
+from typing import List, Dict, Tuple
+from ..utils.utils import Utils
+
+_WORD_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|[0-9]+")
+_CAMEL_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+_STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from",
+    "how", "i", "in", "is", "it", "of", "on", "or", "that", "the", "this", "to", "what",
+    "when", "where", "which", "who", "why", "with", "file", "files", "code",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase search terms.
+    Identifiers are kept whole and also split on camelCase and snake_case boundaries,
+    so 'parseUserConfig' matches queries for 'parse', 'user' and 'config'.
+    """
+    terms = []
+    for word in _WORD_PATTERN.findall(text or ""):
+        lowered = word.lower()
+        parts = [part.lower() for part in _CAMEL_PATTERN.findall(word)]
+        if lowered not in _STOP_WORDS and len(lowered) > 1:
+            terms.append(lowered)
+        if len(parts) > 1:
+            terms.extend(part for part in parts if part not in _STOP_WORDS and len(part) > 1)
+    return terms
+
+
+class LexicalIndex:
+    """
+    BM25 index over mapping entries (file_name, description and functions).
+    Built once at mapping time and saved in app_data, so a query can shortlist
+    candidate files locally before any LLM call.
+    """
+
+    # File names and function names are stronger signals than free-text descriptions
+    FIELD_WEIGHTS = {"file_name": 3, "functions": 2, "description": 1}
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.file_names: List[str] = []
+        self.doc_lengths: List[int] = []
+        self.postings: Dict[str, List[List[int]]] = {}
+        self.avg_doc_length = 0.0
+
+    @classmethod
+    def build(cls, mapping_data: List[Dict], **kwargs) -> "LexicalIndex":
+        """
+        Build an index from mapping entries
+        """
+        index = cls(**kwargs)
+        for doc_id, entry in enumerate(mapping_data):
+            term_counts = Counter()
+            for field, weight in cls.FIELD_WEIGHTS.items():
+                for term in tokenize(str(entry.get(field, ""))):
+                    term_counts[term] += weight
+            index.file_names.append(entry["file_name"])
+            index.doc_lengths.append(sum(term_counts.values()))
+            for term, count in term_counts.items():
+                index.postings.setdefault(term, []).append([doc_id, count])
+        if index.doc_lengths:
+            index.avg_doc_length = sum(index.doc_lengths) / len(index.doc_lengths)
+        return index
+
+    def search(self, query: str, top_k: int = 50) -> List[Tuple[str, float]]:
+        """
+        Return up to top_k (file_name, score) pairs ranked by BM25 score.
+        Files that share no term with the query are not returned.
+        """
+        if not self.file_names:
+            return []
+        doc_count = len(self.file_names)
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings:
+                length_norm = 1 - self.b + self.b * self.doc_lengths[doc_id] / (self.avg_doc_length or 1)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (
+                    frequency + self.k1 * length_norm
+                )
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+        return [(self.file_names[doc_id], score) for doc_id, score in ranked]
+
+    def save(self, path: str) -> None:
+        """
+        Save the index as JSON
+        """
+        Utils.atomic_write_json(path, {
+            "k1": self.k1,
+            "b": self.b,
+            "file_names": self.file_names,
+            "doc_lengths": self.doc_lengths,
+            "postings": self.postings,
+        })
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        """
+        Load an index saved with save()
+        """
+        data = Utils.read_json(path)
+        index = cls(k1=data["k1"], b=data["b"])
+        index.file_names = data["file_names"]
+        index.doc_lengths = data["doc_lengths"]
+        index.postings = data["postings"]
+        if index.doc_lengths:
+            index.avg_doc_length = sum(index.doc_lengths) / len(index.doc_lengths)
+        return index
@@ -0,0 +1,332 @@
+import ast
+import os
+import re
+from typing import List, Dict, Optional
+from ..utils.code_chunker import BRACE_EXTENSIONS, brace_code
+from ..utils.utils import Utils
+
+# Kinds that contain other symbols; members are qualified with the container's name
+CONTAINER_KINDS = {"class", "interface", "struct", "enum", "record", "module", "trait", "impl"}
+
+# Kinds listed in the 'functions' field of a mapping entry
+CALLABLE_KINDS = {"function", "method", "constructor"}
+
+_KEYWORDS = {
+    "if", "for", "foreach", "while", "switch", "catch", "return", "new", "throw", "else",
+    "do", "try", "using", "lock", "sizeof", "typeof", "await", "yield", "delete", "function",
+}
+_IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_$][A-Za-z0-9_$]*(?:(?:\.|::)[A-Za-z_$][A-Za-z0-9_$]*)*")
+# An identifier with its optional surrounding backticks and call parentheses, as written in a query
+_CODE_REFERENCE_PATTERN = re.compile(r"(`)?(" + _IDENTIFIER_PATTERN.pattern + r")(\(\))?(`)?")
+_BARE_IDENTIFIER_PATTERN = re.compile(r"^\s*(`)?(" + _IDENTIFIER_PATTERN.pattern + r")(\(\))?(`)?\s*\??\s*$")
+_CAMEL_CASE_PATTERN = re.compile(r"[a-z0-9][A-Z]")
+_JAVA_MODIFIERS = (
+    r"(?:(?:public|private|protected|internal|static|final|abstract|virtual|override|async|"
+    r"synchronized|sealed|partial|extern|unsafe|new|readonly|default)\s+)*"
+)
+# What follows the '(' of a definition: parameters continuing on the next lines,
+# or a parameter list followed by the opening brace of a body on the same line
+_BODY_TAIL = r"(?:[^;=]*$|[^)]*\)[^;={]*\{)"
+
+# (kind, pattern) per extension; the first matching pattern of a line wins.
+# Group 'name' is the symbol name and the optional group 'owner' its receiver type (Go)
+_DECLARATION_PATTERNS = {
+    ".js": [
+        ("class", re.compile(r"^\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+(?P<name>[A-Za-z_$][\w$]*)")),
+        ("interface", re.compile(r"^\s*(?:export\s+)?interface\s+(?P<name>[A-Za-z_$][\w$]*)")),
+        ("enum", re.compile(r"^\s*(?:export\s+)?(?:const\s+)?enum\s+(?P<name>[A-Za-z_$][\w$]*)")),
+        ("type", re.compile(r"^\s*(?:export\s+)?type\s+(?P<name>[A-Za-z_$][\w$]*)\s*(?:<[^=]*>)?\s*=")),
+        ("function", re.compile(r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\s*\*?\s*(?P<name>[A-Za-z_$][\w$]*)")),
+        ("function", re.compile(
+            r"^\s*(?:export\s+)?(?:const|let|var)\s+(?P<name>[A-Za-z_$][\w$]*)\s*(?::[^=]+)?=\s*(?:async\s+)?"
+            r"(?:function\b|(?:\([^)]*\)|[A-Za-z_$][\w$]*)\s*(?::[^=]+)?=>)"
+        )),
+        ("method", re.compile(
+            r"^\s+(?:(?:public|private|protected|static|readonly|abstract|override|async|get|set)\s+)*"
+            r"\*?(?P<name>[A-Za-z_$][\w$]*)\s*(?:<[^>]*>)?\s*\(" + _BODY_TAIL
+        )),
+    ],
+    ".java": [
+        ("class", re.compile(r"^\s*" + _JAVA_MODIFIERS + r"class\s+(?P<name>[A-Za-z_]\w*)")),
+        ("interface", re.compile(r"^\s*" + _JAVA_MODIFIERS + r"interface\s+(?P<name>[A-Za-z_]\w*)")),
+        ("enum", re.compile(r"^\s*" + _JAVA_MODIFIERS + r"enum\s+(?P<name>[A-Za-z_]\w*)")),
+        ("record", re.compile(r"^\s*" + _JAVA_MODIFIERS + r"record\s+(?P<name>[A-Za-z_]\w*)")),
+        ("struct", re.compile(r"^\s*" + _JAVA_MODIFIERS + r"struct\s+(?P<name>[A-Za-z_]\w*)")),
+        ("method", re.compile(
+            r"^\s*" + _JAVA_MODIFIERS + r"(?:<[^>]+>\s+)?[A-Za-z_][\w.<>\[\],?\s]*?\s+(?P<name>[A-Za-z_]\w*)\s*(?:<[^>]*>)?\s*\(" + _BODY_TAIL
+        )),
+        ("constructor", re.compile(r"^\s*(?:public|private|protected|internal)\s+(?P<name>[A-Za-z_]\w*)\s*\(" + _BODY_TAIL)),
+    ],
+    ".go": [
+        ("method", re.compile(r"^func\s+\(\s*\w*\s*\*?(?P<owner>[A-Za-z_]\w*)[^)]*\)\s*(?P<name>[A-Za-z_]\w*)")),
+        ("function", re.compile(r"^func\s+(?P<name>[A-Za-z_]\w*)")),
+        ("struct", re.compile(r"^type\s+(?P<name>[A-Za-z_]\w*)\s+struct\b")),
+        ("interface", re.compile(r"^type\s+(?P<name>[A-Za-z_]\w*)\s+interface\b")),
+        ("type", re.compile(r"^type\s+(?P<name>[A-Za-z_]\w*)\b")),
+    ],
+    ".rb": [
+        ("module", re.compile(r"^\s*module\s+(?P<name>[A-Z]\w*(?:::[A-Z]\w*)*)")),
+        ("class", re.compile(r"^\s*class\s+(?P<name>[A-Z]\w*(?:::[A-Z]\w*)*)")),
+        ("function", re.compile(r"^\s*def\s+(?:self\.)?(?P<name>[A-Za-z_]\w*[?!=]?)")),
+    ],
+    ".cpp": [
+        ("namespace", re.compile(r"^\s*namespace\s+(?P<name>[A-Za-z_]\w*)")),
+        ("class", re.compile(r"^\s*(?:template\s*<[^>]*>\s*)?class\s+(?P<name>[A-Za-z_]\w*)(?!\s*;)")),
+        ("struct", re.compile(r"^\s*(?:template\s*<[^>]*>\s*)?struct\s+(?P<name>[A-Za-z_]\w*)(?!\s*;)")),
+        ("enum", re.compile(r"^\s*enum\s+(?:class\s+)?(?P<name>[A-Za-z_]\w*)")),
+        ("function", re.compile(
+            r"^\s*(?:template\s*<[^>]*>\s*)?(?:(?:static|inline|virtual|explicit|constexpr|extern)\s+)*"
+            r"(?:[A-Za-z_][\w:<>,*&\s]*?[\s*&]+)?(?P<name>(?:[A-Za-z_]\w*::)*~?[A-Za-z_]\w*)\s*\(" + _BODY_TAIL
+        )),
+    ],
+}
+_DECLARATION_PATTERNS[".ts"] = _DECLARATION_PATTERNS[".js"]
+_DECLARATION_PATTERNS[".cs"] = [("namespace", re.compile(r"^\s*namespace\s+(?P<name>[A-Za-z_][\w.]*)"))] + _DECLARATION_PATTERNS[".java"]
+
+# Extensions the static extractor supports
+SYMBOL_EXTENSIONS = {".py"} | set(_DECLARATION_PATTERNS)
+
+
+def is_code_shaped(identifier: str, parentheses: bool = False, backticks: bool = False) -> bool:
+    """
+    Whether an identifier written in a query can only be code: a qualified name ('a.b', 'a::b'),
+    a name with an underscore or in camelCase/PascalCase, or one written as a call or in backticks.
+    Plain words ('save', 'tests', 'hello') may be ordinary English and are not.
+    """
+    return (parentheses or backticks or "." in identifier or "::" in identifier or "_" in identifier
+            or bool(_CAMEL_CASE_PATTERN.search(identifier)))
+
+
+def extract_symbols(file_path: str, content: str) -> Optional[List[Dict]]:
+    """
+    Statically extract the declared symbols of a source file: Python with the ast module,
+    other supported languages with per-language declaration patterns.
+    Member names are qualified with their container, e.g. 'UserService.save'.
+
+    Returns:
+        Optional[List[Dict]]: Symbols with name, qualified_name, kind, start_line and end_line
+        (1-based, inclusive), in file order; None if the file's language is not supported
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in SYMBOL_EXTENSIONS:
+        return None
+    lines = content.splitlines()
+    if extension == ".py":
+        try:
+            return _extract_python_symbols(ast.parse(content))
+        except (SyntaxError, ValueError):
+            return []
+
+    declarations = []
+    # Brace languages: declarations count only at the top level or directly in a container's body,
+    # so calls and local definitions inside function bodies are not taken for declarations
+    containers = []  # stack of (body depth, end index)
+    depth = 0
+    for index, line in enumerate(lines):
+        line_depth = depth
+        if extension in BRACE_EXTENSIONS:
+            code = brace_code(line)
+            depth = max(0, depth + code.count("{") - code.count("}"))
+        if not line.strip() or line.lstrip().startswith(("//", "/*", "*", "#")):
+            continue
+        while containers and index > containers[-1][1]:
+            containers.pop()
+        if extension in BRACE_EXTENSIONS and line_depth != (containers[-1][0] if containers else 0):
+            continue
+        for kind, pattern in _DECLARATION_PATTERNS[extension]:
+            match = pattern.match(line)
+            if not match:
+                continue
+            name = match.group("name")
+            if name in _KEYWORDS:
+                break
+            end = _find_ruby_end(lines, index) if extension == ".rb" else _find_block_end(lines, index)
+            declarations.append({
+                "name": name,
+                "kind": kind,
+                "start_line": index + 1,
+                "end_line": end + 1,
+                "owner": match.groupdict().get("owner"),
+            })
+            if kind in CONTAINER_KINDS | {"namespace"} and end > index:
+                containers.append((line_depth + 1, end))
+            break
+    return _qualify(declarations)
+
+
+def _extract_python_symbols(tree: ast.AST) -> List[Dict]:
+    symbols = []
+
+    def visit(nodes, parent: Optional[str], in_class: bool):
+        for node in nodes:
+            if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                continue
+            is_class = isinstance(node, ast.ClassDef)
+            qualified_name = f"{parent}.{node.name}" if parent else node.name
+            kind = "class" if is_class else ("method" if in_class else "function")
+            start = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+            symbols.append({
+                "name": node.name,
+                "qualified_name": qualified_name,
+                "kind": kind,
+                "start_line": start,
+                "end_line": getattr(node, "end_lineno", node.lineno),
+            })
+            # Nested functions are implementation details; class bodies are walked for members
+            if is_class:
+                visit(node.body, qualified_name, True)
+
+    visit(tree.body, None, False)
+    return symbols
+
+
+def _find_block_end(lines: List[str], start: int) -> int:
+    """Index of the line closing the block opened at or after start; start for one-line declarations"""
+    depth = 0
+    opened = False
+    for index in range(start, len(lines)):
+        code = brace_code(lines[index])
+        depth += code.count("{") - code.count("}")
+        opened = opened or "{" in code
+        if opened and depth <= 0:
+            return index
+        if not opened and code.rstrip().endswith(";"):
+            return index
+    return start if not opened else len(lines) - 1
+
+
+def _find_ruby_end(lines: List[str], start: int) -> int:
+    """Index of the 'end' line at the indentation of the declaration at start"""
+    indent = len(lines[start]) - len(lines[start].lstrip())
+    for index in range(start + 1, len(lines)):
+        line = lines[index]
+        if line.strip() and len(line) - len(line.lstrip()) <= indent:
+            return index if line.strip() == "end" else index - 1
+    return len(lines) - 1
+
+
+def _qualify(declarations: List[Dict]) -> List[Dict]:
+    """
+    Qualify names with their innermost enclosing container, or with their owner for members
+    defined outside it (Go receivers, C++ 'Type::member'). Namespaces are dropped.
+    """
+    symbols = []
+    containers = []  # stack of (qualified_name, end_line)
+    for declaration in declarations:
+        while containers and declaration["start_line"] > containers[-1][1]:
+            containers.pop()
+        name = declaration["name"]
+        owner = declaration.pop("owner", None)
+        kind = declaration["kind"]
+        if kind == "function" and "::" in name:
+            owner, name = name.rsplit("::", 1)
+            owner = owner.replace("::", ".")
+        parent = owner or (containers[-1][0] if containers else None)
+        if kind == "function" and parent:
+            kind = "method"
+        if kind == "method" and parent and (name == "constructor" or name.lstrip("~") == parent.split(".")[-1]):
+            kind = "constructor"
+        qualified_name = f"{parent}.{name}" if parent else name
+        if declaration["kind"] in CONTAINER_KINDS | {"namespace"} and declaration["end_line"] > declaration["start_line"]:
+            # Namespaces scope declarations but do not qualify them
+            container_name = qualified_name if declaration["kind"] != "namespace" else parent
+            containers.append((container_name, declaration["end_line"]))
+        if declaration["kind"] == "namespace":
+            continue
+        if kind == "method" and not parent:
+            # A call or statement that matched the member pattern outside any container
+            continue
+        symbols.append(dict(declaration, name=name, kind=kind, qualified_name=qualified_name))
+    return symbols
+
+
+class SymbolIndex:
+    """
+    Persistent index from symbol names to the files and line ranges that declare them.
+    Symbols are extracted statically at mapping time and stored per file in app_data,
+    so exact identifier lookups need no LLM call. Both short names ('save') and
+    qualified names ('UserService.save') can be looked up.
+    """
+
+    def __init__(self):
+        self.files: Dict[str, List[Dict]] = {}
+        self._by_name: Optional[Dict[str, List[Dict]]] = None
+
+    def update_file(self, file_name: str, symbols: List[Dict]) -> None:
+        """
+        Replace the symbols of a file
+        """
+        self.files[file_name] = symbols
+        self._by_name = None
+
+    def remove(self, file_names: List[str]) -> None:
+        """
+        Remove the symbols of the given files
+        """
+        for file_name in file_names:
+            self.files.pop(file_name, None)
+        self._by_name = None
+
+    def _get_names(self) -> Dict[str, List[Dict]]:
+        if self._by_name is None:
+            by_name: Dict[str, List[Dict]] = {}
+            for file_name, symbols in self.files.items():
+                for symbol in symbols:
+                    entry = dict(symbol, file_name=file_name)
+                    by_name.setdefault(symbol["name"], []).append(entry)
+                    if symbol["qualified_name"] != symbol["name"]:
+                        by_name.setdefault(symbol["qualified_name"], []).append(entry)
+            self._by_name = by_name
+        return self._by_name
+
+    def lookup(self, name: str) -> List[Dict]:
+        """
+        Return the declarations of an exact (case-sensitive) short or qualified name.
+        '::' separators are treated as '.'.
+        """
+        return list(self._get_names().get(name.replace("::", "."), []))
+
+    def find_files(self, text: str) -> List[str]:
+        """
+        Return the files declaring any code-shaped identifier (see is_code_shaped) that appears
+        in the text, in order of appearance
+        """
+        file_names = []
+        seen = set()
+        for match in _CODE_REFERENCE_PATTERN.finditer(text or ""):
+            opening, identifier, parentheses, closing = match.groups()
+            if not is_code_shaped(identifier, bool(parentheses), bool(opening and closing)):
+                continue
+            for symbol in self.lookup(identifier):
+                if symbol["file_name"] not in seen:
+                    seen.add(symbol["file_name"])
+                    file_names.append(symbol["file_name"])
+        return file_names
+
+    @staticmethod
+    def get_bare_identifier(text: str) -> Optional[str]:
+        """
+        Return the identifier if the text is nothing but a code-shaped one
+        (e.g. 'UserService.save', 'parse_args', 'run()' or '`main`'); None for plain words like 'hello'
+        """
+        match = _BARE_IDENTIFIER_PATTERN.match(text or "")
+        if not match:
+            return None
+        opening, identifier, parentheses, closing = match.groups()
+        return identifier if is_code_shaped(identifier, bool(parentheses), bool(opening and closing)) else None
+
+    def save(self, path: str) -> None:
+        """
+        Save the index as JSON
+        """
+        Utils.atomic_write_json(path, {"files": self.files})
+
+    @classmethod
+    def load(cls, path: str) -> "SymbolIndex":
+        """
+        Load an index saved with save(), or return an empty index if there is none
+        """
+        index = cls()
+        if os.path.exists(path):
+            index.files = Utils.read_json(path)["files"]
+        return index
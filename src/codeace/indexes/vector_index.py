@@ -0,0 +1,188 @@
+import io
+import os
+import tempfile
+from typing import List, Dict, Optional, Tuple
+import numpy as np
+from ..utils.utils import Utils
+
+# Share of dead rows (of changed or removed files) above which save() rewrites the matrix without them
+COMPACTION_RATIO = 0.25
+
+
+class VectorIndex:
+    """
+    On-disk embedding index for mapped files.
+    Vectors are stored as a normalized float32 matrix in '<path>.npy', which is opened
+    memory-mapped, and row metadata is stored in '<path>.json'. A file can own several rows
+    (its description and, optionally, its code chunks); every row keeps the content hash of
+    its file, so unchanged files are not embedded again. Saves append new rows to the matrix
+    file instead of rewriting it, see save().
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.matrix_path = f"{path}.npy"
+        self.meta_path = f"{path}.json"
+        self.rows: List[List[str]] = []  # [file_name, label] per matrix row
+        self.file_hashes: Dict[str, str] = {}
+        self.matrix: Optional[np.ndarray] = None
+        self._updates: Dict[str, Tuple[str, List[str], np.ndarray]] = {}
+        self._removed = set()
+        if os.path.exists(self.meta_path) and os.path.exists(self.matrix_path):
+            self._load()
+
+    def _load(self) -> None:
+        meta = Utils.read_json(self.meta_path)
+        self.rows = meta["rows"]
+        self.file_hashes = meta["file_hashes"]
+        self.matrix = np.load(self.matrix_path, mmap_mode='r')
+        if len(self.matrix) > len(self.rows):
+            # Rows appended by a save interrupted before its metadata was written
+            self.matrix = self.matrix[:len(self.rows)]
+
+    def needs_update(self, file_name: str, content_hash: str) -> bool:
+        """
+        Return True if the file has no vectors yet or was embedded from different content
+        """
+        if file_name in self._updates:
+            return self._updates[file_name][0] != content_hash
+        return self.file_hashes.get(file_name) != content_hash
+
+    def upsert(self, file_name: str, content_hash: str, vectors: List[List[float]], labels: List[str]) -> None:
+        """
+        Replace the vectors of a file. Changes are kept in memory until save()
+        """
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self._updates[file_name] = (content_hash, list(labels), matrix / norms)
+        self._removed.discard(file_name)
+
+    def remove(self, file_names: List[str]) -> None:
+        """
+        Remove the vectors of the given files. Changes are kept in memory until save()
+        """
+        for file_name in file_names:
+            self._updates.pop(file_name, None)
+            self._removed.add(file_name)
+
+    def save(self) -> None:
+        """
+        Write pending changes. New vectors are appended to the matrix file and the rows of
+        changed or removed files are marked dead (file name None); the matrix is rewritten
+        without dead rows once they exceed COMPACTION_RATIO of all rows, or when it cannot
+        be appended to.
+        """
+        if not self._updates and not self._removed:
+            return
+        changed = set(self._updates) | self._removed
+        saved_count = len(self.rows)
+        rows = [[None, label] if file_name in changed else [file_name, label] for file_name, label in self.rows]
+        file_hashes = {name: h for name, h in self.file_hashes.items() if name not in changed}
+        blocks = []
+        for file_name, (content_hash, labels, vectors) in self._updates.items():
+            rows.extend([file_name, label] for label in labels)
+            blocks.append(vectors)
+            file_hashes[file_name] = content_hash
+
+        dead_count = sum(1 for file_name, _ in rows if file_name is None)
+        if self.matrix is None or dead_count > len(rows) * COMPACTION_RATIO or not self._append_rows(blocks):
+            keep = [i for i in range(saved_count) if rows[i][0] is not None]
+            if self.matrix is not None and keep:
+                blocks.insert(0, np.asarray(self.matrix[keep]))
+            rows = [rows[i] for i in keep] + rows[saved_count:]
+            self._write_matrix(blocks)
+        Utils.atomic_write_json(self.meta_path, {"rows": rows, "file_hashes": file_hashes})
+
+        self._updates.clear()
+        self._removed.clear()
+        self._load()
+
+    def _append_rows(self, blocks: List[np.ndarray]) -> bool:
+        """
+        Append rows to the saved matrix file in place; returns False if the file cannot be appended to
+        (a different layout, or a header that would grow), so the caller rewrites it
+        """
+        if not blocks:
+            return True
+        saved_count, dimensions = self.matrix.shape
+        new_dimensions = self._get_dimensions(blocks)
+        if new_dimensions != dimensions:
+            if saved_count:
+                raise ValueError(f"Embedding dimensions do not match: {sorted({dimensions, new_dimensions})}")
+            return False
+        with open(self.matrix_path, 'rb') as f:
+            if np.lib.format.read_magic(f) != (1, 0):
+                return False
+            _, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            data_offset = f.tell()
+        if fortran_order or dtype != np.float32:
+            return False
+        new_rows = np.concatenate(blocks).astype(np.float32, copy=False)
+        header = io.BytesIO()
+        np.lib.format.write_array_header_1_0(header, {
+            "descr": np.lib.format.dtype_to_descr(np.dtype(np.float32)),
+            "fortran_order": False,
+            "shape": (saved_count + len(new_rows), dimensions),
+        })
+        if len(header.getvalue()) != data_offset:
+            return False
+
+        # Release the memory map before changing the file it points to. The rows are written
+        # before the header, so an interrupted append leaves the previous matrix readable.
+        self.matrix = None
+        with open(self.matrix_path, 'r+b') as f:
+            f.seek(data_offset + saved_count * dimensions * np.dtype(np.float32).itemsize)
+            f.write(np.ascontiguousarray(new_rows).tobytes())
+            f.truncate()
+            f.flush()
+            f.seek(0)
+            f.write(header.getvalue())
+        return True
+
+    def _write_matrix(self, blocks: List[np.ndarray]) -> None:
+        """Rewrite the matrix file atomically from blocks of rows"""
+        dimensions = self._get_dimensions(blocks)
+        matrix = np.concatenate(blocks) if blocks else np.zeros((0, dimensions), dtype=np.float32)
+        # Release the memory map before replacing the file it points to
+        self.matrix = None
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.matrix_path)), suffix=".npy")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, matrix)
+            os.replace(temp_path, self.matrix_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def _get_dimensions(self, blocks: List[np.ndarray]) -> int:
+        dimensions = {block.shape[1] for block in blocks}
+        if len(dimensions) > 1:
+            raise ValueError(f"Embedding dimensions do not match: {sorted(dimensions)}")
+        return dimensions.pop() if dimensions else 0
+
+    def search(self, query_vector: List[float], top_k: int = 50) -> List[Tuple[str, float]]:
+        """
+        Return up to top_k (file_name, score) pairs ranked by cosine similarity.
+        A file scores as its best matching row. Only saved vectors are searched.
+        """
+        if self.matrix is None or not len(self.rows):
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if not norm:
+            return []
+        scores = self.matrix @ (query / norm)
+
+        # Take enough rows to cover top_k files even when files own several rows
+        candidate_count = min(len(scores), top_k * 4)
+        candidates = np.argpartition(-scores, candidate_count - 1)[:candidate_count]
+        best: Dict[str, float] = {}
+        for row in candidates[np.argsort(-scores[candidates], kind='stable')]:
+            file_name = self.rows[row][0]
+            if file_name is not None and file_name not in best:
+                best[file_name] = float(scores[row])
+                if len(best) == top_k:
+                    break
+        return list(best.items())
@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+from langchain_core.runnables import Runnable, RunnableConfig
+
+# Number of writes between checks of the entry limit
+EVICTION_CHECK_INTERVAL = 100
+
+# Number of cache hits whose access times are buffered before they are written
+ACCESS_FLUSH_INTERVAL = 100
+
+
+class ResponseCache:
+    """
+    Disk-backed cache of LLM chain results stored in SQLite.
+    Entries expire after ttl_seconds (if set), and the least recently used entries
+    are evicted once the cache holds more than max_entries. Access times of hits are
+    buffered and written with the next set, or every ACCESS_FLUSH_INTERVAL hits, so a hit
+    is a single read.
+    """
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None, max_entries: int = 50000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes_since_check = 0
+        self._pending_accesses: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        try:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, "
+                "value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, "
+                "accessed_at REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+            self._connection.commit()
+        except sqlite3.Error as e:
+            raise IOError(f"Error opening response cache at {self.path}: {str(e)}")
+
+    @staticmethod
+    def make_key(model_id: str, prompt_name: str, prompt_version: int, inputs: Any) -> str:
+        """
+        Build a cache key from the model, the prompt template and its version, and the chain input
+        """
+        payload = json.dumps([model_id, prompt_name, prompt_version, inputs], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Return the cached value of a key, or None if it is missing or expired
+        """
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl_seconds is not None and now - row[1] > self.ttl_seconds):
+                self.misses += 1
+                return None
+            self._pending_accesses[key] = now
+            if len(self._pending_accesses) >= ACCESS_FLUSH_INTERVAL:
+                self._flush_accesses()
+                self._connection.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Store a JSON-serializable value under a key
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self._writes_since_check += 1
+            self._flush_accesses()
+            if self._writes_since_check >= EVICTION_CHECK_INTERVAL:
+                self._evict(now)
+            self._connection.commit()
+
+    def _flush_accesses(self) -> None:
+        """Write the buffered access times of hits; the caller commits"""
+        if self._pending_accesses:
+            self._connection.executemany(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._pending_accesses.items()],
+            )
+            self._pending_accesses.clear()
+
+    def _evict(self, now: float) -> None:
+        """Remove expired entries, then the least recently used ones above max_entries"""
+        self._writes_since_check = 0
+        if self.ttl_seconds is not None:
+            self._connection.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        count = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            self._connection.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        """
+        Remove all entries and reset the counters
+        """
+        with self._lock:
+            self._pending_accesses.clear()
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return hit and miss counters and the number of stored entries
+        """
+        with self._lock:
+            entries = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_accesses()
+            self._connection.commit()
+            self._connection.close()
+
+
+class CachedRunnable(Runnable):
+    """
+    Wraps a chain so that its results are served from a ResponseCache.
+    Streaming is preserved: on a miss the chain is streamed and the collected result cached,
+    on a hit the cached result is returned as a single chunk.
+    The async methods (and so abatch) run the SQLite calls in the default executor.
+    """
+
+    def __init__(self, chain: Runnable, cache: ResponseCache, model_id: str, prompt_name: str, prompt_version: int):
+        self.chain = chain
+        self.cache = cache
+        self.model_id = model_id
+        self.prompt_name = prompt_name
+        self.prompt_version = prompt_version
+
+    def _key(self, inputs: Any) -> str:
+        return self.cache.make_key(self.model_id, self.prompt_name, self.prompt_version, inputs)
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        key = self._key(input)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        result = self.chain.invoke(input, config, **kwargs)
+        self.cache.set(key, result)
+        return result
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        key = self._key(input)
+        cached = await loop.run_in_executor(None, self.cache.get, key)
+        if cached is not None:
+            return cached
+        result = await self.chain.ainvoke(input, config, **kwargs)
+        await loop.run_in_executor(None, self.cache.set, key, result)
+        return result
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Iterator[Any]:
+        key = self._key(input)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        chunks = []
+        for chunk in self.chain.stream(input, config, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        self.cache.set(key, self._collect(chunks))
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> AsyncIterator[Any]:
+        loop = asyncio.get_running_loop()
+        key = self._key(input)
+        cached = await loop.run_in_executor(None, self.cache.get, key)
+        if cached is not None:
+            yield cached
+            return
+        chunks = []
+        async for chunk in self.chain.astream(input, config, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        await loop.run_in_executor(None, self.cache.set, key, self._collect(chunks))
+
+    @staticmethod
+    def _collect(chunks: list) -> Any:
+        """Text chunks are deltas and are joined; parsed JSON chunks are cumulative, so the last one wins"""
+        if chunks and all(isinstance(chunk, str) for chunk in chunks):
+            return "".join(chunks)
+        return chunks[-1] if chunks else None
@@ -1,14 +1,23 @@
 import os
 import json
-from typing import List, Dict
+import hashlib
+from typing import Iterable, Iterator, List, Dict, Optional, Set, Tuple, Union
 from pathlib import Path
 from PyPDF2 import PdfReader
+from .mapping_store import MappingStore, create_mapping_store
+from ..utils.utils import Utils
+from ..utils.file_scanner import FileScanner, ScannedFile
+from ..indexes.file_name_index import FileNameIndex
 
 
 class FileManager:
-    def __init__(self, src_path: str, app_data_path: str):
+    def __init__(self, src_path: str, app_data_path: str, mapping_store=None, scan_options: Optional[Dict] = None):
         """
-        Initialize FileManager with source and output paths
+        Initialize FileManager with source and output paths.
+        mapping_store is a MappingStore instance or a store type name ("json", "sqlite");
+        if None, an existing SQLite store is reused and JSON is used otherwise.
+        scan_options are FileScanner arguments (extensions, excluded_dirs, max_file_size,
+        skip_binary, ignore_file_names, max_workers); the app_data directory is always excluded.
         """
         if not os.path.exists(src_path):
             raise FileNotFoundError(f"Source path not found: {src_path}")
@@ -17,15 +26,23 @@ class FileManager:
         self._create_app_data_dir()
         self.main_json_path = os.path.join(self.app_data_path, "code_mapping.json")
         self.summary_doc_path = os.path.join(self.app_data_path, "summary_doc.md")
-        self._initialize_main_json()
-    
-    def _initialize_main_json(self) -> None:
-        """Initialize the main JSON file if it doesn't exist"""
-        if not os.path.exists(self.main_json_path):
-            with open(self.main_json_path, 'w', encoding='utf-8') as f:
-                json.dump([], f)
-    
-    
+        self.directory_summaries_path = os.path.join(self.app_data_path, "directory_summaries.json")
+        self.manifest_path = os.path.join(self.app_data_path, "file_manifest.json")
+        self.lexical_index_path = os.path.join(self.app_data_path, "lexical_index.json")
+        self.symbol_index_path = os.path.join(self.app_data_path, "symbol_index.json")
+        self.dependency_graph_path = os.path.join(self.app_data_path, "dependency_graph.json")
+        self.file_name_index_path = os.path.join(self.app_data_path, "file_name_index.json")
+        self._file_name_index = None
+        self.vector_index_path = os.path.join(self.app_data_path, "vector_index")
+        self.response_cache_path = os.path.join(self.app_data_path, "llm_cache.db")
+        self.token_cache_path = os.path.join(self.app_data_path, "token_counts.json")
+        scan_options = dict(scan_options or {})
+        scan_options["excluded_paths"] = list(scan_options.get("excluded_paths", [])) + [self.app_data_path]
+        self.scanner = FileScanner(self.src_path, **scan_options)
+        if isinstance(mapping_store, MappingStore):
+            self.mapping_store = mapping_store
+        else:
+            self.mapping_store = create_mapping_store(self.app_data_path, mapping_store)
     
     def _create_app_data_dir(self) -> None:
         """Create app_data directory if it doesn't exist"""
@@ -35,20 +52,32 @@ class FileManager:
         """
         Recursively scan directory and return list of code files
         """
-        code_files = []
-        excluded_dirs = {'.git', '__pycache__', 'node_modules', 'venv', '.env'}
-        code_extensions = {'.py', '.js', '.ts', '.java', '.cpp', '.cs', '.rb', '.go'}
+        return [scanned_file.path for scanned_file in self.iter_code_files()]
 
-        for root, dirs, files in os.walk(self.src_path):
-            # Remove excluded directories
-            dirs[:] = [d for d in dirs if d not in excluded_dirs]
-            
-            for file in files:
-                if Path(file).suffix in code_extensions:
-                    full_path = os.path.join(root, file)
-                    code_files.append(full_path)
-        
-        return code_files
+    def iter_code_files(self) -> Iterator[ScannedFile]:
+        """
+        Yield the code files of the source directory with their stat data while the scan runs.
+        See FileScanner for the filters applied. A completed scan also rebuilds and saves
+        the file name index.
+        """
+        file_names = []
+        for scanned_file in self.scanner.scan():
+            file_names.append(scanned_file.relative_path)
+            yield scanned_file
+        self._file_name_index = FileNameIndex(file_names)
+        self._file_name_index.save(self.file_name_index_path)
+
+    def get_file_name_index(self) -> FileNameIndex:
+        """
+        Return the file name index, loaded from app_data or built by a scan if there is none
+        """
+        if self._file_name_index is None:
+            if os.path.exists(self.file_name_index_path):
+                self._file_name_index = FileNameIndex.load(self.file_name_index_path)
+            else:
+                for _ in self.iter_code_files():
+                    pass
+        return self._file_name_index
     
     def read_extra_context_doc(self, extra_context_doc_path: str) -> str:
         """
@@ -99,59 +128,145 @@ class FileManager:
 
     def save_mapping(self, mapping_data: Dict) -> None:
         """
-        Add or update mapping data in the main JSON file
+        Add or update mapping data in the mapping store.
+        Writes are batched; call commit_mappings() to persist them immediately.
+        """
+        self.mapping_store.upsert(mapping_data)
+
+    def commit_mappings(self) -> None:
+        """
+        Persist pending mapping writes
+        """
+        self.mapping_store.commit()
+
+    def remove_mappings(self, file_names: List[str]) -> None:
+        """
+        Remove the mapping entries of the given relative file names
+        """
+        if not file_names:
+            return
+        self.mapping_store.delete(file_names)
+
+    def get_relative_path(self, path: str) -> str:
+        """
+        Return the path relative to the source directory, as stored in the mapping
+        """
+        return os.path.relpath(path, self.src_path)
+
+    def get_file_fingerprint(self, path: str) -> Dict:
+        """
+        Return the content hash, modification time and size of a file
         """
         try:
-            # Read existing mappings
-            with open(self.main_json_path, 'r', encoding='utf-8') as f:
-                mappings = json.load(f)
-            
-            # Check if file already exists in mappings
-            file_path = mapping_data.get('file_name')
-            existing_index = next(
-                (index for (index, d) in enumerate(mappings) 
-                if d.get('file_name') == file_path),
-                None
-            )
-            
-            # Update existing or append new
-            if existing_index is not None:
-                mappings[existing_index] = mapping_data
-            else:
-                mappings.append(mapping_data)
-            
-            # Write back to file
-            with open(self.main_json_path, 'w', encoding='utf-8') as f:
-                json.dump(mappings, f, indent=2)
-                
+            stat = os.stat(path)
+            sha = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    sha.update(block)
+            return {
+                "content_hash": sha.hexdigest(),
+                "mtime": stat.st_mtime,
+                "size": stat.st_size,
+            }
+        except FileNotFoundError:
+            raise FileNotFoundError(f"File not found at path: {path}")
         except IOError as e:
-            raise IOError(f"Error updating mapping file at {self.main_json_path}: {str(e)}")
+            raise IOError(f"Error reading file at {path}: {str(e)}")
 
-    def get_mapped_files(self) -> List[str]:
+    def read_manifest(self) -> Dict[str, Dict]:
         """
-        Get list of mapped files from main JSON file
+        Read the manifest of mapped files: relative file name -> {content_hash, mtime, size}
         """
         try:
-            with open(self.main_json_path, 'r', encoding='utf-8') as f:
-                mappings = json.load(f)
-                return [m['file_name'] for m in mappings]
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
         except FileNotFoundError:
-            return []
+            return {}
         except IOError as e:
-            raise IOError(f"Error reading mapping file at {self.main_json_path}: {str(e)}")
-    
-    def get_mapping_data(self) -> Dict:
+            raise IOError(f"Error reading manifest file at {self.manifest_path}: {str(e)}")
+
+    def save_manifest(self, manifest: Dict[str, Dict]) -> None:
         """
-        Get mapping data from main JSON file
+        Save the manifest of mapped files
         """
         try:
-            with open(self.main_json_path, 'r', encoding='utf-8') as f:
-                mappings = json.load(f)
-                return mappings
-        except FileNotFoundError:
-            return []
+            Utils.atomic_write_json(self.manifest_path, manifest)
         except IOError as e:
-            raise IOError(f"Error reading mapping file at {self.main_json_path}: {str(e)}")
+            raise IOError(f"Error saving manifest to {self.manifest_path}: {str(e)}")
+
+    def get_changed_files(self, code_files: Iterable[Union[str, ScannedFile]],
+                          manifest: Dict[str, Dict]) -> Tuple[List[str], List[str]]:
+        """
+        Compare scanned files against the mapping and its manifest.
+        Files whose mtime and size match the manifest are unchanged without hashing;
+        otherwise the content hash decides. Mapped files that predate the manifest
+        are adopted as unchanged, and their fingerprint is added to the manifest.
+
+        Args:
+            code_files: Full paths returned by scan_directory, or ScannedFile items
+            manifest: Manifest to check, updated in place for touched-but-unchanged files
+
+        Returns:
+            Tuple[List[str], List[str]]: Full paths of added or changed files, and
+            relative names of mapped files that no longer exist
+        """
+        scanned_names = set()
+        changed_files = list(self.iter_changed_files(code_files, manifest, scanned_names))
+        return changed_files, self.get_deleted_files(scanned_names)
+
+    def iter_changed_files(self, code_files: Iterable[Union[str, ScannedFile]], manifest: Dict[str, Dict],
+                           scanned_names: Set[str], include_unchanged: bool = False) -> Iterator[str]:
+        """
+        Streaming form of get_changed_files: yield the full paths of added or changed files
+        as code_files are consumed, adding every scanned relative name to scanned_names.
+        ScannedFile items carry their stat data, so they are not stat'ed again.
+        With include_unchanged, every file is yielded (manifest fingerprints are still updated).
+        """
+        mapped_files = set(self.get_mapped_files())
+        for code_file in code_files:
+            if isinstance(code_file, ScannedFile):
+                file_path, file_name = code_file.path, code_file.relative_path
+                mtime, size = code_file.mtime, code_file.size
+            else:
+                file_path, file_name = code_file, self.get_relative_path(code_file)
+                stat = os.stat(file_path)
+                mtime, size = stat.st_mtime, stat.st_size
+            scanned_names.add(file_name)
+            if file_name not in mapped_files:
+                yield file_path
+                continue
+
+            known = manifest.get(file_name)
+            if known and known.get("mtime") == mtime and known.get("size") == size:
+                if include_unchanged:
+                    yield file_path
+                continue
+
+            fingerprint = self.get_file_fingerprint(file_path)
+            if known and known.get("content_hash") != fingerprint["content_hash"]:
+                yield file_path
+                continue
+            manifest[file_name] = fingerprint
+            if include_unchanged:
+                yield file_path
+
+    def get_deleted_files(self, scanned_names: Set[str]) -> List[str]:
+        """
+        Return the relative names of mapped files that were not scanned
+        """
+        return sorted(set(self.get_mapped_files()) - scanned_names)
+
+    def get_mapped_files(self) -> List[str]:
+        """
+        Get list of mapped files from the mapping store
+        """
+        return self.mapping_store.get_file_names()
+    
+    def get_mapping_data(self) -> List[Dict]:
+        """
+        Get mapping data from the mapping store
+        """
+        return self.mapping_store.get_all()
     
     def save_summary(self, summary: str) -> None:
         """
@@ -191,7 +306,8 @@ class FileManager:
     def verify_files_list_paths(self, file_paths: List[str]) -> List[str]:
         """
         Verify and correct file paths in the given list.
-        If a path doesn't exist, searches for the file by name in the source directory.
+        If a path doesn't exist, it is resolved with the file name index: files ending with
+        the path, or else files of the same name, the most similar path first.
         Returns a list of corrected paths, removing invalid ones.
         
         Args:
@@ -201,29 +317,40 @@ class FileManager:
             List of verified and corrected file paths
         """
         verified_paths = []
+        file_name_index = None
         
         for file_path in file_paths:
-            file_path = os.path.join(self.src_path, file_path)
-            if os.path.exists(file_path):
-                verified_paths.append(file_path)
-            else:
-                # Get just the filename from the path
-                file_name = os.path.basename(file_path)
-                
-                # Search for the file in the source directory
-                found = False
-                for root, _, files in os.walk(self.src_path):
-                    if file_name in files:
-                        new_path = os.path.join(root, file_name)
-                        verified_paths.append(new_path)
-                        found = True
-                        break
-                        
-                # If file wasn't found, it will be skipped
+            full_path = os.path.join(self.src_path, file_path)
+            if os.path.exists(full_path):
+                verified_paths.append(full_path)
+                continue
+
+            if file_name_index is None:
+                file_name_index = self.get_file_name_index()
+            for file_name in file_name_index.resolve(self._strip_src_path(file_path)):
+                candidate_path = os.path.join(self.src_path, file_name)
+                if os.path.exists(candidate_path):
+                    verified_paths.append(candidate_path)
+                    break
+                # Deleted since the last scan
+                file_name_index.remove(file_name)
+            # If file wasn't found, it will be skipped
         # Filter out duplicates
         verified_paths = list(dict.fromkeys(verified_paths))
         return verified_paths
 
+    def _strip_src_path(self, file_path: str) -> str:
+        """Make a path under the source directory relative; other paths are returned unchanged"""
+        if os.path.isabs(file_path):
+            try:
+                relative_path = os.path.relpath(file_path, self.src_path)
+            except ValueError:
+                # On another drive
+                return file_path
+            if not relative_path.startswith(os.pardir):
+                return relative_path
+        return file_path
+
 #Tests...
 if __name__ == "__main__":
     file_m = FileManager(r"C:\CodeAce",r"C:\CodeAce\CodeAceData")
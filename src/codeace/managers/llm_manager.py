@@ -1,17 +1,76 @@
 from langchain_core.language_models import BaseLLM
 from langchain_core.language_models import BaseChatModel
-from langchain_openai import ChatOpenAI, AzureChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_ollama.chat_models import ChatOllama
-from typing import Optional, Dict, Any
-from dotenv import load_dotenv
+from langchain_core.rate_limiters import InMemoryRateLimiter
+from typing import TYPE_CHECKING, Optional, Dict, Any, Callable, Tuple
+import asyncio
+import atexit
+import hashlib
+import json
+import threading
 import os
-load_dotenv()
+from .model_registry import model_registry
+
+# Provider packages are imported by the factory that needs them, since each deployment uses one
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI, AzureChatOpenAI
+    from langchain_anthropic import ChatAnthropic
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    from langchain_ollama.chat_models import ChatOllama
+
+# Conservative default request rates (requests per second) used when a caller asks
+# for rate limiting without giving an explicit value. Local Ollama is not limited.
+DEFAULT_REQUESTS_PER_SECOND = {
+    "openai": 5.0,
+    "anthropic": 1.0,
+    "azure": 5.0,
+    "gemini": 1.0,
+    "ollama": None,
+}
+
+# Rate limiters are shared per provider so that every agent in the process draws
+# from the same budget.
+_rate_limiters: Dict[str, InMemoryRateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+# Connection pool of the HTTP clients shared by the models of one provider endpoint
+DEFAULT_POOL_SETTINGS = {
+    "max_connections": 20,
+    "max_keepalive_connections": 10,
+    "keepalive_expiry": 60.0,
+}
+
+# Models and HTTP clients are shared process-wide, so agents reuse warm keep-alive
+# connections instead of opening their own pools. See LLMManager.close_shared_clients.
+_pool_settings: Dict[str, Any] = dict(DEFAULT_POOL_SETTINGS)
+_shared_models: Dict[str, BaseChatModel] = {}
+_http_clients: Dict[Tuple[str, str], Tuple[Any, Any]] = {}
+_clients_lock = threading.Lock()
+
+# Chat model factories added with LLMManager.register_provider, e.g. self-hosted or test models
+_custom_providers: Dict[str, Callable[..., BaseChatModel]] = {}
+
+_dotenv_loaded = False
+
+
+def _load_dotenv_once() -> None:
+    """Load the .env file on first use of LLMManager rather than at import time"""
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _dotenv_loaded = True
+
+
 class LLMManager:
     """Manager class for handling different LLM providers through LangChain."""
     
-    def __init__(self):
+    def __init__(self, shared_clients: bool = True):
+        """
+        Optional: shared_clients - reuse the process-wide model instance of identical parameters,
+        and its pooled HTTP connections, instead of creating a new model
+        """
+        _load_dotenv_once()
+        self.shared_clients = shared_clients
         self.supported_llms = {
             "openai": self._get_openai_llm,
             "anthropic": self._get_anthropic_llm,
@@ -19,14 +78,136 @@ class LLMManager:
             "ollama": self._get_ollama_llm,
             "gemini": self._get_gemini_llm,
         }
+        self.supported_llms.update(_custom_providers)
     # TODO - Add model mane and max tokens all models
-    def create_model_instance_by_name(self, model_type: str, _model_name: str = None) -> BaseChatModel:
+    def create_model_instance_by_name(self, model_type: str, _model_name: str = None,
+                                      requests_per_second: Optional[float] = None,
+                                      max_retries: Optional[int] = None) -> BaseChatModel:
+        """
+        Create a chat model for the given provider.
+        If requests_per_second is set, the model is throttled by a rate limiter shared
+        by all models of the same provider in this process. If max_retries is set, it
+        replaces the provider client's own retry count (0 when a RequestScheduler retries).
+        """
         if model_type not in self.supported_llms:
             raise ValueError(f"Model {model_type} is not supported.")
+        kwargs = {}
         if _model_name is not None:
-            return self.supported_llms[model_type](model_name=_model_name) 
-        return self.supported_llms[model_type]()   
+            kwargs["model_name"] = _model_name
+        if requests_per_second:
+            kwargs["rate_limiter"] = self.get_rate_limiter(model_type, requests_per_second)
+        if max_retries is not None:
+            kwargs["max_retries"] = max_retries
+        llm = self.supported_llms[model_type](**kwargs)
+        # Unknown model names get the context window and tokenizer defaults of their provider
+        model_registry.register_llm(llm, model_type)
+        return llm
+
+    @staticmethod
+    def register_provider(name: str, factory: Callable[..., BaseChatModel]) -> None:
+        """
+        Make a chat model factory available under a provider name, for every LLMManager
+        created afterwards. The factory is called with the optional keyword arguments
+        model_name, rate_limiter and max_retries, and may ignore them.
+        """
+        _custom_providers[name] = factory
+
+    def get_rate_limiter(self, model_type: str, requests_per_second: float) -> InMemoryRateLimiter:
+        """Return the process-wide rate limiter of a provider, creating it on first use."""
+        with _rate_limiters_lock:
+            limiter = _rate_limiters.get(model_type)
+            if limiter is None:
+                limiter = InMemoryRateLimiter(
+                    requests_per_second=requests_per_second,
+                    check_every_n_seconds=0.05,
+                    max_bucket_size=max(1, int(requests_per_second)),
+                )
+                _rate_limiters[model_type] = limiter
+            return limiter
     
+    @staticmethod
+    def configure_pool(max_connections: Optional[int] = None, max_keepalive_connections: Optional[int] = None,
+                       keepalive_expiry: Optional[float] = None) -> None:
+        """
+        Set the connection pool of the shared HTTP clients. Applies to clients created
+        afterwards, so call it before creating agents (or after close_shared_clients).
+        """
+        with _clients_lock:
+            for key, value in (("max_connections", max_connections),
+                               ("max_keepalive_connections", max_keepalive_connections),
+                               ("keepalive_expiry", keepalive_expiry)):
+                if value is not None:
+                    _pool_settings[key] = value
+
+    @staticmethod
+    def close_shared_clients() -> None:
+        """
+        Close the shared HTTP clients and forget the shared models; later calls create new ones.
+        Call it at shutdown: agents created before can no longer send requests.
+        Async clients are closed here only outside a running event loop; from async code,
+        await aclose_shared_clients instead.
+        """
+        with _clients_lock:
+            clients = list(_http_clients.values())
+            _http_clients.clear()
+            _shared_models.clear()
+        for sync_client, async_client in clients:
+            sync_client.close()
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                try:
+                    asyncio.run(async_client.aclose())
+                except Exception:
+                    # Connections bound to an event loop that is already closed cannot be closed cleanly
+                    pass
+
+    @staticmethod
+    async def aclose_shared_clients() -> None:
+        """
+        Async variant of close_shared_clients
+        """
+        with _clients_lock:
+            clients = list(_http_clients.values())
+            _http_clients.clear()
+            _shared_models.clear()
+        for sync_client, async_client in clients:
+            sync_client.close()
+            await async_client.aclose()
+
+    @staticmethod
+    def _get_pool_limits():
+        import httpx
+        return httpx.Limits(**_pool_settings)
+
+    def _get_http_clients(self, provider: str, endpoint: str) -> Tuple[Any, Any]:
+        """Return the shared (sync, async) httpx clients of a provider endpoint, creating them on first use"""
+        import httpx
+        with _clients_lock:
+            clients = _http_clients.get((provider, endpoint))
+            if clients is None:
+                limits = self._get_pool_limits()
+                clients = (httpx.Client(limits=limits), httpx.AsyncClient(limits=limits))
+                _http_clients[(provider, endpoint)] = clients
+            return clients
+
+    def _create_model(self, model_class, params: Dict[str, Any]) -> BaseChatModel:
+        """
+        Create a model, or with shared_clients return the shared instance created from the same parameters
+        """
+        if not self.shared_clients:
+            return model_class(**params)
+        key_params = {key: value for key, value in params.items() if key not in ("http_client", "http_async_client")}
+        key = hashlib.sha256(
+            f"{model_class.__name__}:{json.dumps(key_params, sort_keys=True, default=repr)}".encode("utf-8")
+        ).hexdigest()
+        with _clients_lock:
+            model = _shared_models.get(key)
+            if model is None:
+                model = model_class(**params)
+                _shared_models[key] = model
+            return model
+
     def _initialize_api_key(self, provider: str, api_key: Optional[str] = None) -> str:
         """Initialize API key for a provider."""
         env_vars = {
@@ -47,8 +228,9 @@ class LLMManager:
         
         return env_key
 
-    def _get_openai_llm(self, **kwargs) -> ChatOpenAI:
+    def _get_openai_llm(self, **kwargs) -> "ChatOpenAI":
         """Initialize an OpenAI LLM instance."""
+        from langchain_openai import ChatOpenAI
         api_key = self._initialize_api_key("openai", kwargs.pop("api_key", None))
         default_params = {
             "model": "gpt-3.5-turbo",
@@ -62,10 +244,15 @@ class LLMManager:
             default_params["organization"] = org_id
         
         params = {**default_params, **kwargs}
-        return ChatOpenAI(**params)
+        if self.shared_clients:
+            params["http_client"], params["http_async_client"] = self._get_http_clients(
+                "openai", os.getenv("OPENAI_BASE_URL", "")
+            )
+        return self._create_model(ChatOpenAI, params)
     
-    def _get_anthropic_llm(self, **kwargs) -> ChatAnthropic:
+    def _get_anthropic_llm(self, **kwargs) -> "ChatAnthropic":
         """Initialize an Anthropic LLM instance."""
+        from langchain_anthropic import ChatAnthropic
         api_key = self._initialize_api_key("anthropic", kwargs.pop("api_key", None))
         default_params = {
             "model": "claude-3-sonnet-20240229",
@@ -73,12 +260,13 @@ class LLMManager:
             "anthropic_api_key": api_key,
         }
         params = {**default_params, **kwargs}
-        return ChatAnthropic(**params)
+        return self._create_model(ChatAnthropic, params)
 
-    def _get_azure_openai_llm(self, **kwargs) -> AzureChatOpenAI:
+    def _get_azure_openai_llm(self, **kwargs) -> "AzureChatOpenAI":
         model_name = kwargs.pop("model_name", "AZ_OPENAI_LLM_4_O")
         model_name = os.getenv(model_name)
         """Initialize an Azure OpenAI LLM instance."""
+        from langchain_openai import AzureChatOpenAI
         openai_api_key = self._initialize_api_key("azure", kwargs.pop("api_key", None))
         azure_deployment = model_name
         azure_endpoint = os.getenv("AZ_OPENAI_API_BASE")
@@ -109,20 +297,29 @@ class LLMManager:
 
         
         params = {**default_params, **kwargs}
-        return AzureChatOpenAI(**params)
+        if self.shared_clients:
+            params["http_client"], params["http_async_client"] = self._get_http_clients("azure", azure_endpoint)
+        return self._create_model(AzureChatOpenAI, params)
 
-    def _get_ollama_llm(self, **kwargs) -> ChatOllama:
+    def _get_ollama_llm(self, **kwargs) -> "ChatOllama":
         """Initialize an Ollama LLM instance."""
+        from langchain_ollama.chat_models import ChatOllama
+        # The Ollama client does not retry
+        kwargs.pop("max_retries", None)
         default_params = {
             "model": "llama3.2",
             "temperature": 0.2,
             "base_url": "http://localhost:11434"
         }
         params = {**default_params, **kwargs}
-        return ChatOllama(**params)
+        if self.shared_clients:
+            # The Ollama client creates its own httpx pools, sized by these arguments
+            params.setdefault("client_kwargs", {"limits": self._get_pool_limits()})
+        return self._create_model(ChatOllama, params)
 
-    def _get_gemini_llm(self, **kwargs) -> ChatGoogleGenerativeAI:
+    def _get_gemini_llm(self, **kwargs) -> "ChatGoogleGenerativeAI":
         """Initialize a Google Gemini LLM instance."""
+        from langchain_google_genai import ChatGoogleGenerativeAI
         api_key = self._initialize_api_key("gemini", kwargs.pop("api_key", None))
         default_params = {
             "model": "gemini-1.5-flash-002",
@@ -130,7 +327,10 @@ class LLMManager:
             "google_api_key": api_key,
         }
         params = {**default_params, **kwargs}
-        return ChatGoogleGenerativeAI(**params)
+        return self._create_model(ChatGoogleGenerativeAI, params)
+
+
+atexit.register(LLMManager.close_shared_clients)
 
 
 if __name__ == '__main__':
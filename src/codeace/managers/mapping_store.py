@@ -0,0 +1,211 @@
+import os
+import json
+import sqlite3
+import threading
+from typing import List, Dict, Optional
+from ..utils.utils import Utils
+
+
+class MappingStore:
+    """
+    Base class for mapping storage backends.
+    Entries are dictionaries keyed by their 'file_name' value and are kept in insertion order.
+    Writes may be buffered until commit() is called; every backend also commits on its own
+    after batch_size pending writes.
+    """
+
+    def __init__(self, batch_size: int = 100):
+        self.batch_size = max(1, batch_size)
+        self._pending_writes = 0
+        self._lock = threading.RLock()
+
+    def get(self, file_name: str) -> Optional[Dict]:
+        """Return the entry of a file, or None if it is not mapped"""
+        raise NotImplementedError
+
+    def get_all(self) -> List[Dict]:
+        """Return all entries in insertion order"""
+        raise NotImplementedError
+
+    def get_file_names(self) -> List[str]:
+        """Return the file names of all entries in insertion order"""
+        raise NotImplementedError
+
+    def upsert(self, entry: Dict) -> None:
+        """Add an entry, or replace the entry with the same file_name"""
+        raise NotImplementedError
+
+    def delete(self, file_names: List[str]) -> None:
+        """Remove the entries of the given file names"""
+        raise NotImplementedError
+
+    def commit(self) -> None:
+        """Persist all pending writes"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Commit pending writes and release resources"""
+        self.commit()
+
+    def _track_write(self, count: int = 1) -> None:
+        self._pending_writes += count
+        if self._pending_writes >= self.batch_size:
+            self.commit()
+
+
+class JsonMappingStore(MappingStore):
+    """
+    Stores the mapping as a JSON array (the code_mapping.json format).
+    Entries are held in memory in a dict, so upserts are O(1); the file is rewritten
+    atomically (temporary file + rename) once per batch instead of once per entry.
+    Each commit still rewrites every entry, so large codebases should use SqliteMappingStore.
+    """
+
+    def __init__(self, path: str, batch_size: int = 100):
+        super().__init__(batch_size)
+        self.path = path
+        self._entries = self._load()
+        if not os.path.exists(self.path):
+            Utils.atomic_write_json(self.path, [])
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                mappings = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (IOError, ValueError) as e:
+            raise IOError(f"Error reading mapping file at {self.path}: {str(e)}")
+        return {m['file_name']: m for m in mappings}
+
+    def get(self, file_name: str) -> Optional[Dict]:
+        with self._lock:
+            return self._entries.get(file_name)
+
+    def get_all(self) -> List[Dict]:
+        with self._lock:
+            return list(self._entries.values())
+
+    def get_file_names(self) -> List[str]:
+        with self._lock:
+            return list(self._entries.keys())
+
+    def upsert(self, entry: Dict) -> None:
+        with self._lock:
+            self._entries[entry['file_name']] = entry
+            self._track_write()
+
+    def delete(self, file_names: List[str]) -> None:
+        with self._lock:
+            removed = 0
+            for file_name in file_names:
+                if self._entries.pop(file_name, None) is not None:
+                    removed += 1
+            if removed:
+                self._track_write(removed)
+
+    def commit(self) -> None:
+        with self._lock:
+            if not self._pending_writes:
+                return
+            try:
+                Utils.atomic_write_json(self.path, list(self._entries.values()))
+            except IOError as e:
+                raise IOError(f"Error updating mapping file at {self.path}: {str(e)}")
+            self._pending_writes = 0
+
+
+class SqliteMappingStore(MappingStore):
+    """
+    Stores the mapping in a SQLite database with one row per file.
+    Upserts are indexed by file_name and grouped into one transaction per batch.
+    """
+
+    def __init__(self, path: str, batch_size: int = 100):
+        super().__init__(batch_size)
+        self.path = path
+        try:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS mappings ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "file_name TEXT NOT NULL UNIQUE, "
+                "data TEXT NOT NULL)"
+            )
+            self._connection.commit()
+        except sqlite3.Error as e:
+            raise IOError(f"Error opening mapping database at {self.path}: {str(e)}")
+
+    def get(self, file_name: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data FROM mappings WHERE file_name = ?", (file_name,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_all(self) -> List[Dict]:
+        with self._lock:
+            rows = self._connection.execute("SELECT data FROM mappings ORDER BY id").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def get_file_names(self) -> List[str]:
+        with self._lock:
+            rows = self._connection.execute("SELECT file_name FROM mappings ORDER BY id").fetchall()
+        return [row[0] for row in rows]
+
+    def upsert(self, entry: Dict) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO mappings (file_name, data) VALUES (?, ?) "
+                "ON CONFLICT(file_name) DO UPDATE SET data = excluded.data",
+                (entry['file_name'], json.dumps(entry)),
+            )
+            self._track_write()
+
+    def delete(self, file_names: List[str]) -> None:
+        with self._lock:
+            self._connection.executemany(
+                "DELETE FROM mappings WHERE file_name = ?", [(name,) for name in file_names]
+            )
+            self._track_write(len(file_names))
+
+    def commit(self) -> None:
+        with self._lock:
+            if not self._pending_writes:
+                return
+            try:
+                self._connection.commit()
+            except sqlite3.Error as e:
+                raise IOError(f"Error updating mapping database at {self.path}: {str(e)}")
+            self._pending_writes = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self.commit()
+            self._connection.close()
+
+
+# Available backends: store type -> (class, file name inside app_data)
+MAPPING_STORES = {
+    "json": (JsonMappingStore, "code_mapping.json"),
+    "sqlite": (SqliteMappingStore, "code_mapping.db"),
+}
+
+
+def create_mapping_store(app_data_path: str, store_type: Optional[str] = None, batch_size: int = 100) -> MappingStore:
+    """
+    Create the mapping store of the given type inside app_data_path.
+    If store_type is None, an existing JSON mapping (and no SQLite store) keeps using JSON;
+    new mappings use SQLite, whose commits only write the changed rows.
+    """
+    if store_type is None:
+        sqlite_file = MAPPING_STORES["sqlite"][1]
+        json_file = MAPPING_STORES["json"][1]
+        has_json = os.path.exists(os.path.join(app_data_path, json_file))
+        has_sqlite = os.path.exists(os.path.join(app_data_path, sqlite_file))
+        store_type = "json" if has_json and not has_sqlite else "sqlite"
+    if store_type not in MAPPING_STORES:
+        raise ValueError(f"Mapping store {store_type} is not supported.")
+    store_class, file_name = MAPPING_STORES[store_type]
+    return store_class(os.path.join(app_data_path, file_name), batch_size=batch_size)
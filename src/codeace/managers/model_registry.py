@@ -0,0 +1,157 @@
+import math
+import threading
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional
+import tiktoken
+
+
+@dataclass(frozen=True)
+class ModelCapabilities:
+    """Context window of a model, the part of it kept for the answer, and how to count its tokens"""
+    context_window: int
+    output_reserve: int
+    # "tiktoken:<encoding name>", or "approximate" for models without a local tokenizer
+    tokenizer: str = "approximate"
+    # Characters per token of the approximate counter, kept low so counts err on the high side
+    chars_per_token: float = 3.3
+
+    @property
+    def max_input_tokens(self) -> int:
+        return max(1, self.context_window - self.output_reserve)
+
+
+# Known models by name prefix; the longest matching prefix wins
+KNOWN_MODELS: Dict[str, ModelCapabilities] = {
+    "gpt-4o": ModelCapabilities(128000, 16384, "tiktoken:o200k_base"),
+    "gpt-4.1": ModelCapabilities(1047576, 32768, "tiktoken:o200k_base"),
+    "gpt-4-turbo": ModelCapabilities(128000, 4096, "tiktoken:cl100k_base"),
+    "gpt-4": ModelCapabilities(8192, 2048, "tiktoken:cl100k_base"),
+    "gpt-3.5-turbo": ModelCapabilities(16385, 4096, "tiktoken:cl100k_base"),
+    "o1": ModelCapabilities(200000, 100000, "tiktoken:o200k_base"),
+    "o3": ModelCapabilities(200000, 100000, "tiktoken:o200k_base"),
+    "o4-mini": ModelCapabilities(200000, 100000, "tiktoken:o200k_base"),
+    "claude": ModelCapabilities(200000, 8192, chars_per_token=3.0),
+    "gemini-1.5-pro": ModelCapabilities(2097152, 8192, chars_per_token=3.5),
+    "gemini-1.5-flash": ModelCapabilities(1048576, 8192, chars_per_token=3.5),
+    "gemini-2": ModelCapabilities(1048576, 8192, chars_per_token=3.5),
+    "gemini-1.0-pro": ModelCapabilities(32760, 8192, chars_per_token=3.5),
+}
+
+# Capabilities of unknown models, by the provider that created them
+PROVIDER_DEFAULTS: Dict[str, ModelCapabilities] = {
+    "openai": ModelCapabilities(128000, 4096, "tiktoken:o200k_base"),
+    "azure": ModelCapabilities(128000, 4096, "tiktoken:o200k_base"),
+    "anthropic": ModelCapabilities(200000, 8192, chars_per_token=3.0),
+    "gemini": ModelCapabilities(1048576, 8192, chars_per_token=3.5),
+    # Ollama serves models with a 2048-token context unless num_ctx is set
+    "ollama": ModelCapabilities(2048, 512, chars_per_token=3.3),
+}
+
+DEFAULT_CAPABILITIES = ModelCapabilities(32768, 4096)
+
+# Model attributes holding the context window and the output limit, across LangChain chat models
+CONTEXT_WINDOW_ATTRIBUTES = ("num_ctx",)
+OUTPUT_LIMIT_ATTRIBUTES = ("max_tokens", "max_output_tokens", "num_predict")
+
+
+class ApproximateTokenizer:
+    """
+    Fast token counter for models without a local tokenizer. ASCII text is counted at
+    chars_per_token characters per token; other characters, which BPE vocabularies split
+    much finer, are counted as one token each.
+    """
+
+    def __init__(self, chars_per_token: float = 3.3):
+        self.chars_per_token = chars_per_token
+
+    def count(self, text: str) -> int:
+        ascii_chars = len(text.encode("ascii", "ignore"))
+        return math.ceil(ascii_chars / self.chars_per_token) + len(text) - ascii_chars
+
+
+class ModelRegistry:
+    """
+    Capabilities of the chat models used by the agents. Models are matched by name prefix;
+    LLMManager records the provider of every model it creates, so unknown model names
+    (e.g. Azure deployments or local Ollama models) get their provider's defaults.
+    Limits set on the model instance (num_ctx, max_tokens) take precedence.
+    """
+
+    def __init__(self):
+        self.models: Dict[str, ModelCapabilities] = dict(KNOWN_MODELS)
+        self.providers: Dict[str, ModelCapabilities] = dict(PROVIDER_DEFAULTS)
+        self.model_providers: Dict[str, str] = {}
+        self._tokenizers: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def register(self, model_name: str, capabilities: ModelCapabilities) -> None:
+        """
+        Register the capabilities of a model, or of all models starting with model_name
+        """
+        self.models[model_name.lower()] = capabilities
+
+    def register_llm(self, llm: Any, provider: str) -> None:
+        """
+        Record the provider of a model instance, used when its name is not known
+        """
+        model_name = self.get_model_name(llm)
+        if model_name:
+            self.model_providers[model_name] = provider
+
+    @staticmethod
+    def get_model_name(llm: Any) -> str:
+        """The model name of a LangChain chat model, whichever attribute holds it"""
+        for attribute in ("model_name", "model", "deployment_name"):
+            value = getattr(llm, attribute, None)
+            if isinstance(value, str) and value:
+                # Gemini names may carry a "models/" prefix
+                return value.split("/")[-1]
+        return ""
+
+    def get_capabilities(self, llm: Any) -> ModelCapabilities:
+        """
+        Return the capabilities of a model instance
+        """
+        model_name = self.get_model_name(llm)
+        capabilities = self._match(model_name)
+        if capabilities is None:
+            capabilities = self.providers.get(self.model_providers.get(model_name), DEFAULT_CAPABILITIES)
+
+        for attribute in CONTEXT_WINDOW_ATTRIBUTES:
+            value = getattr(llm, attribute, None)
+            if isinstance(value, int) and value > 0:
+                capabilities = replace(capabilities, context_window=value)
+                break
+        for attribute in OUTPUT_LIMIT_ATTRIBUTES:
+            value = getattr(llm, attribute, None)
+            if isinstance(value, int) and 0 < value < capabilities.context_window:
+                capabilities = replace(capabilities, output_reserve=value)
+                break
+        return capabilities
+
+    def _match(self, model_name: str) -> Optional[ModelCapabilities]:
+        lowered = model_name.lower()
+        prefixes = [prefix for prefix in self.models if lowered.startswith(prefix)]
+        return self.models[max(prefixes, key=len)] if prefixes else None
+
+    def get_tokenizer(self, capabilities: ModelCapabilities) -> Any:
+        """
+        Return a tiktoken Encoding for "tiktoken:" tokenizers, or an ApproximateTokenizer when
+        the model has no local tokenizer or its encoding cannot be loaded (e.g. offline)
+        """
+        key = f"{capabilities.tokenizer}:{capabilities.chars_per_token}"
+        with self._lock:
+            tokenizer = self._tokenizers.get(key)
+            if tokenizer is None:
+                tokenizer = ApproximateTokenizer(capabilities.chars_per_token)
+                if capabilities.tokenizer.startswith("tiktoken:"):
+                    try:
+                        tokenizer = tiktoken.get_encoding(capabilities.tokenizer.split(":", 1)[1])
+                    except (KeyError, ValueError, OSError):
+                        pass
+                self._tokenizers[key] = tokenizer
+            return tokenizer
+
+
+# Registry shared by every LLMManager and TokenManager in the process
+model_registry = ModelRegistry()
@@ -2,22 +2,80 @@ from typing import List, Dict, Optional
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
 from pydantic import BaseModel, Field
-from langchain_core.runnables import RunnableSequence
+from langchain_core.runnables import Runnable, RunnableSequence
+from .cache_manager import CachedRunnable, ResponseCache
+from .request_scheduler import RequestScheduler, ScheduledRunnable
 
 class CodeFileAnalysis(BaseModel):
     """Schema for code file analysis output"""
     description: str = Field(description="A deep and clear description of what the file does or represents")
     functions: str = Field(description="Comma-separated list of function names implemented in the file")
+    summary: str = Field(description="One or two sentences on the file's role in the project, for the project summary")
+
+class FileDescription(BaseModel):
+    """Schema for description-only file analysis output, used when symbols are extracted statically"""
+    description: str = Field(description="A deep and clear description of what the file does or represents")
+    summary: str = Field(description="One or two sentences on the file's role in the project, for the project summary")
+
+class BatchFileAnalysis(BaseModel):
+    """Schema for the analysis of one file in a batched mapping request"""
+    file_name: str = Field(description="The file name exactly as given")
+    description: str = Field(description="A deep and clear description of what the file does or represents")
+    functions: str = Field(description="Comma-separated list of function names implemented in the file")
+    summary: str = Field(description="One or two sentences on the file's role in the project, for the project summary")
+
+class BatchCodeFileAnalysis(BaseModel):
+    """Schema for batched code file analysis output, used to map several small files in one request"""
+    files: List[BatchFileAnalysis] = Field(description="One analysis per given file, in the given order")
 
 class RelevantFiles(BaseModel):
     """Schema for relevant files output"""
     files: List[str] = Field(description="List of relevant file names that match the user query")
 
+# Version of every prompt template, part of the response cache key.
+# Bump a version whenever its template changes so stale cached responses are not reused.
+PROMPT_VERSIONS = {
+    "mapping": 2,
+    "description": 2,
+    "batch_mapping": 1,
+    "summary_update": 1,
+    "directory_summary": 1,
+    "project_summary": 1,
+    "file_search": 1,
+    "code_query": 1,
+    "dependencies_analysis": 1,
+    "answer_reduce": 1,
+    "prompt_improver": 1,
+}
+
 class PromptManager:
     """Manager class for handling different prompt templates"""
     
-    def __init__(self):
-        pass
+    def __init__(self, cache: Optional[ResponseCache] = None, scheduler: Optional[RequestScheduler] = None):
+        """
+        Optional: cache - ResponseCache used by every chain this manager creates
+        Optional: scheduler - RequestScheduler that rate-limits and retries the requests of every chain
+        """
+        self.cache = cache
+        self.scheduler = scheduler
+
+    def _wrap_chain(self, chain: Runnable, prompt_name: str, llm) -> Runnable:
+        """Wraps a chain with the request scheduler and the response cache, if set; cache hits skip the scheduler"""
+        if self.scheduler is not None:
+            chain = ScheduledRunnable(chain, self.scheduler)
+        if self.cache is None:
+            return chain
+        return CachedRunnable(chain, self.cache, self._get_model_id(llm), prompt_name, PROMPT_VERSIONS[prompt_name])
+
+    @staticmethod
+    def _get_model_id(llm) -> str:
+        """Identifies the model behind a chain for cache keys"""
+        parts = [getattr(llm, "_llm_type", type(llm).__name__)]
+        for attribute in ("model_name", "model", "deployment_name", "temperature"):
+            value = getattr(llm, attribute, None)
+            if value is not None:
+                parts.append(f"{attribute}={value}")
+        return ";".join(parts)
         
     def create_mapping_chain(self, llm)-> RunnableSequence:
         """Creates a mapping chain combining prompt template, LLM, and parser"""
@@ -42,6 +100,7 @@ class PromptManager:
 
                 1. description: A deep and clear description of what the file does or represents
                 2. functions: An array of function names implemented in the file in ONE line split by ',' 
+                3. summary: One or two sentences on the role of the file in the project, used to build the project summary
                 - Focus on the core content and purpose of the code, not the type of file it is.
 
                 Here is the file:
@@ -58,9 +117,65 @@ class PromptManager:
             }
         )
         
-        return mapping_prompt | llm | parser
+        return self._wrap_chain(mapping_prompt | llm | parser, "mapping", llm)
     
 
+    def create_description_chain(self, llm)-> RunnableSequence:
+        """
+        Creates a shorter mapping chain that only asks for the file description.
+        Used when the file's functions are extracted statically.
+        """
+        parser = JsonOutputParser(pydantic_object=FileDescription)
+
+        description_prompt = PromptTemplate(
+            template="""
+                You are an expert software developer. Describe what the following code file does or represents,
+                focusing on its functionality and business logic rather than the type of file it is.
+                Also give a summary: one or two sentences on the role of the file in the project,
+                used to build the project summary.
+
+                File name: {file_name}
+                {file_content}
+
+                {format_instructions}
+                """,
+            input_variables=["file_name", "file_content"],
+            partial_variables={"format_instructions": parser.get_format_instructions()}
+        )
+
+        return self._wrap_chain(description_prompt | llm | parser, "description", llm)
+
+    def create_batch_mapping_chain(self, llm) -> RunnableSequence:
+        """
+        Creates a mapping chain that analyzes several small files in one request.
+        The input "files" holds the files one after another, each under a "File name:" line.
+        """
+        parser = JsonOutputParser(pydantic_object=BatchCodeFileAnalysis)
+
+        batch_prompt = PromptTemplate(
+            template="""
+                You are an expert software developer. Analyze each of the following code files and provide,
+                for every file, the following information in JSON format:
+
+                1. file_name: The file name exactly as given
+                2. description: A deep and clear description of what the file does or represents
+                3. functions: The function names implemented in the file in ONE line split by ','
+                4. summary: One or two sentences on the role of the file in the project, used to build the project summary
+                - Focus on the core content and purpose of the code, not the type of file it is.
+                - Return exactly one entry per file, in the order given.
+
+                Here are the files:
+
+                {files}
+
+                {format_instructions}
+                """,
+            input_variables=["files"],
+            partial_variables={"format_instructions": parser.get_format_instructions()}
+        )
+
+        return self._wrap_chain(batch_prompt | llm | parser, "batch_mapping", llm)
+
     def create_summery_update_chain(self, llm)-> RunnableSequence:
         """Creates a mapping chain combining prompt template, LLM, and parser"""
          # Define a prompt template for updating the summary
@@ -83,8 +198,39 @@ class PromptManager:
         )
 
         # Combine the components: prompt template, LLM, and output parser
-        return prompt_template | llm | StrOutputParser()
+        return self._wrap_chain(prompt_template | llm | StrOutputParser(), "summary_update", llm)
     
+    def create_directory_summary_chain(self, llm) -> RunnableSequence:
+        """Creates a chain that summarizes one directory from short digests of its files"""
+        prompt_template = PromptTemplate(
+            template=(
+                "You are a professional technical writer. Below are short descriptions of the files in one "
+                "directory of a software project. Write a concise paragraph, in natural language and without "
+                "code snippets, explaining what this directory is responsible for and how its files work together.\n\n"
+                "Directory: {directory}\n\n"
+                "Files:\n{file_digests}\n\n"
+                "Directory Summary:"
+            ),
+            input_variables=["directory", "file_digests"],
+        )
+        return self._wrap_chain(prompt_template | llm | StrOutputParser(), "directory_summary", llm)
+
+    def create_project_summary_chain(self, llm) -> RunnableSequence:
+        """Creates a chain that rolls directory summaries up into a project summary"""
+        prompt_template = PromptTemplate(
+            template=(
+                "You are a professional technical writer. Your task is to write a comprehensive, "
+                "cohesive, and natural language description of a software project. This description should "
+                "explain the purpose, functionality, and structure of the project in simple terms for developers, "
+                "managers, and stakeholders. It should not include code snippets.\n\n"
+                "Below are summaries of the project's directories (or of groups of directories).\n\n"
+                "{directory_summaries}\n\n"
+                "Project Summary (natural language only):"
+            ),
+            input_variables=["directory_summaries"],
+        )
+        return self._wrap_chain(prompt_template | llm | StrOutputParser(), "project_summary", llm)
+
     def create_mappint_searcher_promtp_chain(self, llm)-> RunnableSequence:
         """Creates a mapping chain combining prompt template, LLM, and parser"""
         parser = JsonOutputParser(pydantic_object=RelevantFiles)
@@ -118,7 +264,7 @@ class PromptManager:
             }
         )
         
-        return search_prompt | llm | parser
+        return self._wrap_chain(search_prompt | llm | parser, "file_search", llm)
 
     def create_code_query_chain(self, llm) -> RunnableSequence:
         """Creates a chain for answering queries based on code content"""
@@ -127,7 +273,7 @@ class PromptManager:
             input_variables=["context", "code_content", "user_query", "previous_response_context", "continuation_context", "response_type"]
         )
         
-        return prompt_template | llm | StrOutputParser()
+        return self._wrap_chain(prompt_template | llm | StrOutputParser(), "code_query", llm)
 
     def _get_code_query_prompt_template(self) -> str:
         """Returns the template for code query prompts"""
@@ -223,7 +369,40 @@ class PromptManager:
             input_variables=["context", "code_content", "user_query", "continuation_context", "response_type"]
         )
         
-        return prompt_template | llm | StrOutputParser()
+        return self._wrap_chain(prompt_template | llm | StrOutputParser(), "dependencies_analysis", llm)
+
+    def create_answer_reduce_chain(self, llm) -> RunnableSequence:
+        """Creates a chain that merges partial answers from separate code chunks into one answer"""
+        prompt_template = PromptTemplate(
+            template="""You are an expert software developer and code analyst.
+            The files relevant to the user's question were analyzed in separate parts, and each
+            part produced a partial answer. Merge the partial answers into one complete answer.
+
+            Guidelines:
+            1. Keep every relevant fact, file reference and code snippet from the partial answers
+            2. Remove repetitions and resolve contradictions in favour of the more specific answer
+            3. Do not mention that the answer was produced in parts
+            4. Keep the structure and format the partial answers use
+
+            Additional Context Information:
+            {context}
+
+            User Question: {user_query}
+
+            Partial Answers:
+            {partial_responses}
+
+            Please provide the merged answer:""",
+            input_variables=["context", "user_query", "partial_responses"]
+        )
+
+        return self._wrap_chain(prompt_template | llm | StrOutputParser(), "answer_reduce", llm)
+
+    def format_partial_responses(self, responses: List[str]) -> str:
+        """Formats partial answers for the reduce prompt"""
+        return "\n\n".join(
+            f"--- Partial answer {index} ---\n{response}" for index, response in enumerate(responses, start=1)
+        )
 
     def create_prompt_improver_chain(self, llm) -> RunnableSequence:
         """Creates a chain for improving user prompts with documentation context"""
@@ -253,7 +432,7 @@ class PromptManager:
             input_variables=["documentation", "user_query"]
         )
         
-        return prompt_template | llm | StrOutputParser()
+        return self._wrap_chain(prompt_template | llm | StrOutputParser(), "prompt_improver", llm)
 
 if __name__ == "__main__":
     prompt_manager = PromptManager()
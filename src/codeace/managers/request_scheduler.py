@@ -0,0 +1,387 @@
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, Optional
+from langchain_core.runnables import Runnable, RunnableConfig
+from .llm_manager import DEFAULT_REQUESTS_PER_SECOND
+from .model_registry import ApproximateTokenizer
+
+# Conservative input token budgets (estimated tokens per minute) of the shared schedulers
+DEFAULT_TOKENS_PER_MINUTE = {
+    "openai": 150000,
+    "azure": 150000,
+    "anthropic": 40000,
+}
+
+# Per-provider limits of the shared schedulers. Request rates are those of the rate limiters
+# (DEFAULT_REQUESTS_PER_SECOND), so both ways of throttling a provider agree; local Ollama is not limited.
+DEFAULT_PROVIDER_LIMITS = {
+    provider: {
+        "requests_per_minute": requests_per_second * 60 if requests_per_second else None,
+        "tokens_per_minute": DEFAULT_TOKENS_PER_MINUTE.get(provider),
+    }
+    for provider, requests_per_second in DEFAULT_REQUESTS_PER_SECOND.items()
+}
+
+# HTTP statuses worth retrying, and those meaning the provider is throttling us
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+THROTTLING_STATUS_CODES = {429, 529}
+
+# Provider SDK exception names (OpenAI, Anthropic, Google) for errors without a status code
+RETRYABLE_ERROR_NAMES = ("RateLimit", "ResourceExhausted", "Timeout", "APIConnectionError",
+                         "ServiceUnavailable", "InternalServerError", "Overloaded")
+THROTTLING_ERROR_NAMES = ("RateLimit", "ResourceExhausted", "Overloaded")
+
+# Seconds between checks for a free request slot from async code
+SLOT_POLL_INTERVAL = 0.02
+
+# Schedulers are shared per provider so that every agent in the process draws from the same budget
+_schedulers: Dict[str, "RequestScheduler"] = {}
+_schedulers_lock = threading.Lock()
+
+_token_estimator = ApproximateTokenizer()
+
+
+def get_status_code(error: BaseException) -> Optional[int]:
+    """HTTP status of a provider error, from the error or its response"""
+    for source in (error, getattr(error, "response", None)):
+        for attribute in ("status_code", "code"):
+            value = getattr(source, attribute, None)
+            if isinstance(value, int):
+                return value
+    return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    status_code = get_status_code(error)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+    if isinstance(error, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+        return True
+    return any(name in type(error).__name__ for name in RETRYABLE_ERROR_NAMES)
+
+
+def is_throttling(error: BaseException) -> bool:
+    status_code = get_status_code(error)
+    if status_code is not None:
+        return status_code in THROTTLING_STATUS_CODES
+    return any(name in type(error).__name__ for name in THROTTLING_ERROR_NAMES)
+
+
+def get_retry_after(error: BaseException) -> Optional[float]:
+    """Seconds to wait from a retry_after attribute or the Retry-After / retry-after-ms headers"""
+    value = getattr(error, "retry_after", None)
+    if isinstance(value, (int, float)):
+        return max(0.0, float(value))
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        retry_after = headers.get("retry-after")
+        if not retry_after:
+            return None
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at rate_per_minute, holding at most one minute of budget.
+    Reservations may overdraw the bucket; the caller then waits until the debt is repaid,
+    so waiting requests are served in order.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """
+        Take amount from the bucket and return the seconds to wait before using it
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # A request larger than the bucket waits for a full bucket
+            self.tokens -= min(amount, self.capacity)
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class RequestScheduler:
+    """
+    Schedules LLM requests of one provider:
+    - token buckets on requests and input tokens per minute
+    - a concurrency limit adapted to throttling: halved when the provider throttles,
+      raised by one after increase_after successful requests in a row
+    - retries of timeouts, connection errors, 429 and 5xx responses, after the Retry-After
+      delay when the provider gives one (which also pauses the other requests), otherwise
+      after an exponential backoff with full jitter
+    Safe to share between threads and event loops.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 max_concurrency: int = 8, min_concurrency: int = 1, max_retries: int = 5,
+                 base_delay: float = 1.0, max_delay: float = 60.0, increase_after: int = 10):
+        """
+        Args:
+            requests_per_minute (Optional[float]): Request budget; None for no limit
+            tokens_per_minute (Optional[float]): Input token budget (estimated); None for no limit
+            max_concurrency (int): Upper bound, and starting value, of the concurrent requests
+            min_concurrency (int): Lower bound of the concurrent requests under throttling
+            max_retries (int): Retries of one request before its error is raised
+            base_delay (float): Backoff of the first retry, doubled on each further retry
+            max_delay (float): Upper bound of a backoff or Retry-After delay
+            increase_after (int): Successful requests in a row before the concurrency is raised
+        """
+        # Providers enforce request limits over windows shorter than a minute, so requests are
+        # paced with a burst of one second's budget; token budgets allow a minute's burst
+        self.request_bucket = (
+            TokenBucket(requests_per_minute, max(1.0, requests_per_minute / 60)) if requests_per_minute else None
+        )
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.concurrency = self.max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.increase_after = increase_after
+        self._active = 0
+        self._successes = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+        self._stats = {"requests": 0, "retries": 0, "throttled": 0, "failures": 0}
+
+    @classmethod
+    def for_provider(cls, provider: str) -> "RequestScheduler":
+        """
+        Return the process-wide scheduler of a provider, created with DEFAULT_PROVIDER_LIMITS on first use
+        """
+        with _schedulers_lock:
+            scheduler = _schedulers.get(provider)
+            if scheduler is None:
+                scheduler = cls(**DEFAULT_PROVIDER_LIMITS.get(provider, {}))
+                _schedulers[provider] = scheduler
+            return scheduler
+
+    def run(self, call: Callable[[], Any], tokens: int = 0) -> Any:
+        """
+        Run a request, retrying it as needed, and return its result
+        """
+        attempt = 0
+        while True:
+            self._acquire_slot()
+            try:
+                time.sleep(self._reserve(tokens))
+                result = call()
+            except Exception as e:
+                delay = self._on_error(e, attempt)
+                if delay is None:
+                    raise
+            else:
+                self._on_success()
+                return result
+            finally:
+                self._release_slot()
+            attempt += 1
+            time.sleep(delay)
+
+    async def arun(self, call: Callable[[], Awaitable[Any]], tokens: int = 0) -> Any:
+        """
+        Async variant of run
+        """
+        attempt = 0
+        while True:
+            while not self._try_acquire_slot():
+                await asyncio.sleep(SLOT_POLL_INTERVAL)
+            try:
+                await asyncio.sleep(self._reserve(tokens))
+                result = await call()
+            except Exception as e:
+                delay = self._on_error(e, attempt)
+                if delay is None:
+                    raise
+            else:
+                self._on_success()
+                return result
+            finally:
+                self._release_slot()
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def stream(self, start: Callable[[], Iterable[Any]], tokens: int = 0) -> Iterator[Any]:
+        """
+        Run a streaming request and yield its chunks. The request slot is held until the stream
+        is exhausted or closed. Errors before the first chunk are retried like those of run;
+        later errors are recorded (e.g. as throttling) and raised, since chunks were already yielded.
+        """
+        attempt = 0
+        while True:
+            self._acquire_slot()
+            started = False
+            try:
+                time.sleep(self._reserve(tokens))
+                for chunk in start():
+                    started = True
+                    yield chunk
+            except Exception as e:
+                delay = self._on_error(e, attempt, retry=not started)
+                if delay is None:
+                    raise
+            else:
+                self._on_success()
+                return
+            finally:
+                self._release_slot()
+            attempt += 1
+            time.sleep(delay)
+
+    async def astream(self, start: Callable[[], AsyncIterable[Any]], tokens: int = 0) -> AsyncIterator[Any]:
+        """
+        Async variant of stream
+        """
+        attempt = 0
+        while True:
+            while not self._try_acquire_slot():
+                await asyncio.sleep(SLOT_POLL_INTERVAL)
+            started = False
+            try:
+                await asyncio.sleep(self._reserve(tokens))
+                async for chunk in start():
+                    started = True
+                    yield chunk
+            except Exception as e:
+                delay = self._on_error(e, attempt, retry=not started)
+                if delay is None:
+                    raise
+            else:
+                self._on_success()
+                return
+            finally:
+                self._release_slot()
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the numbers of requests, retries, throttled responses and failed requests,
+        and the current concurrency limit
+        """
+        with self._condition:
+            return {**self._stats, "concurrency": self.concurrency}
+
+    def _acquire_slot(self) -> None:
+        with self._condition:
+            while self._active >= self.concurrency:
+                self._condition.wait()
+            self._active += 1
+
+    def _try_acquire_slot(self) -> bool:
+        with self._condition:
+            if self._active >= self.concurrency:
+                return False
+            self._active += 1
+            return True
+
+    def _release_slot(self) -> None:
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    def _reserve(self, tokens: int) -> float:
+        """Seconds to wait before sending a request of the given input tokens"""
+        waits = [self._paused_until - time.monotonic()]
+        if self.request_bucket is not None:
+            waits.append(self.request_bucket.reserve(1))
+        if self.token_bucket is not None and tokens:
+            waits.append(self.token_bucket.reserve(tokens))
+        with self._condition:
+            self._stats["requests"] += 1
+        return max(0.0, *waits)
+
+    def _on_success(self) -> None:
+        with self._condition:
+            self._successes += 1
+            if self._successes >= self.increase_after and self.concurrency < self.max_concurrency:
+                self.concurrency += 1
+                self._successes = 0
+                self._condition.notify_all()
+
+    def _on_error(self, error: Exception, attempt: int, retry: bool = True) -> Optional[float]:
+        """
+        Record a failed attempt; returns the delay before retrying, or None if the error is final.
+        With retry False (a stream that already yielded chunks) the error is final, but throttling
+        still lowers the concurrency.
+        """
+        retry_after = get_retry_after(error)
+        if is_throttling(error):
+            self._on_throttling(retry_after)
+        if not retry or attempt >= self.max_retries or not is_retryable(error):
+            with self._condition:
+                self._stats["failures"] += 1
+            return None
+
+        with self._condition:
+            self._stats["retries"] += 1
+            self._successes = 0
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _on_throttling(self, retry_after: Optional[float]) -> None:
+        now = time.monotonic()
+        with self._condition:
+            self._stats["throttled"] += 1
+            self._successes = 0
+            # One decrease per backoff period, so a burst of 429s does not collapse the limit
+            if now - self._last_decrease >= self.base_delay:
+                self.concurrency = max(self.min_concurrency, self.concurrency // 2)
+                self._last_decrease = now
+            if retry_after is not None:
+                self._paused_until = max(self._paused_until, now + min(retry_after, self.max_delay))
+
+
+class ScheduledRunnable(Runnable):
+    """
+    Wraps a chain so that its requests go through a RequestScheduler.
+    Streams hold their request slot until exhausted or closed, and are retried until their
+    first chunk; later errors are raised.
+    """
+
+    def __init__(self, chain: Runnable, scheduler: RequestScheduler):
+        self.chain = chain
+        self.scheduler = scheduler
+
+    @staticmethod
+    def _estimate_tokens(input: Any) -> int:
+        return _token_estimator.count(str(input))
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return self.scheduler.run(lambda: self.chain.invoke(input, config, **kwargs), self._estimate_tokens(input))
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return await self.scheduler.arun(
+            lambda: self.chain.ainvoke(input, config, **kwargs), self._estimate_tokens(input)
+        )
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Iterator[Any]:
+        yield from self.scheduler.stream(lambda: self.chain.stream(input, config, **kwargs), self._estimate_tokens(input))
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> AsyncIterator[Any]:
+        async for chunk in self.scheduler.astream(
+            lambda: self.chain.astream(input, config, **kwargs), self._estimate_tokens(input)
+        ):
+            yield chunk
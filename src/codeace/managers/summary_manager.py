@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import posixpath
+from typing import Dict, List, Optional
+from ..utils.utils import Utils
+
+# Length limit of the per-file digest taken from a mapping description
+FILE_DIGEST_MAX_CHARS = 300
+
+# Directory name of files at the root of the source directory
+ROOT_DIRECTORY = "."
+
+
+class SummaryManager:
+    """
+    Builds the project summary hierarchically from the mapping:
+    1. A short digest of every file, taken from its mapping entry
+    2. A summary per directory, computed concurrently
+    3. A project roll-up of the directory summaries, merged in rounds when they do not fit one prompt
+
+    Directory summaries are stored in app_data with a hash of their input, so an incremental
+    run only recomputes the directories whose files changed, and the roll-up only when a
+    directory summary changed. A directory whose summary fails (e.g. a rate limit or timeout)
+    keeps its previous summary and is retried on the next run; failures are listed in
+    failed_directories and roll_up_error instead of being raised.
+    """
+
+    def __init__(self, file_manager, prompt_manager, llm, token_manager, max_workers: int = 1):
+        self.file_manager = file_manager
+        self.prompt_manager = prompt_manager
+        self.llm = llm
+        self.token_manager = token_manager
+        self.max_workers = max(1, max_workers)
+        self.state_path = file_manager.directory_summaries_path
+        self.failed_directories: Dict[str, str] = {}
+        self.roll_up_error: Optional[str] = None
+
+    def update_summary(self, mapping_data: List[Dict]) -> int:
+        """
+        Recompute the summaries of changed directories and, if any changed, the project summary,
+        which is saved to the summary document.
+
+        Returns:
+            int: Number of directories whose summary was recomputed
+        """
+        self.failed_directories = {}
+        self.roll_up_error = None
+        state = self._read_state()
+        directories = self._group_digests(mapping_data)
+
+        pending = {}
+        for directory, digests in directories.items():
+            digest_hash = self._hash(digests)
+            known = state["directories"].get(directory)
+            if not known or known["hash"] != digest_hash:
+                pending[directory] = (digest_hash, digests)
+
+        summaries = self._summarize_directories({directory: digests for directory, (_, digests) in pending.items()})
+        for directory, (digest_hash, _) in pending.items():
+            if directory in summaries:
+                state["directories"][directory] = {"hash": digest_hash, "summary": summaries[directory]}
+        for directory in set(state["directories"]) - set(directories):
+            del state["directories"][directory]
+
+        directory_texts = [
+            f"### {directory}\n{state['directories'][directory]['summary']}"
+            for directory in sorted(state["directories"])
+        ]
+        project_hash = self._hash(directory_texts)
+        if directory_texts and (project_hash != state.get("project_hash") or not os.path.exists(self.file_manager.summary_doc_path)):
+            try:
+                self.file_manager.save_summary(self._roll_up(directory_texts))
+                state["project_hash"] = project_hash
+            except Exception as e:
+                # The previous project summary is kept; the roll-up is retried on the next run
+                self.roll_up_error = str(e)
+        Utils.atomic_write_json(self.state_path, state, indent=2)
+        self.token_manager.save_token_cache()
+        return len(pending) - len(self.failed_directories)
+
+    def get_directory_summaries(self) -> Dict[str, str]:
+        """
+        Return the stored summary of every directory
+        """
+        return {directory: entry["summary"] for directory, entry in self._read_state()["directories"].items()}
+
+    def _read_state(self) -> Dict:
+        if not os.path.exists(self.state_path):
+            return {"directories": {}, "project_hash": None}
+        try:
+            return Utils.read_json(self.state_path)
+        except (IOError, ValueError) as e:
+            raise IOError(f"Error reading directory summaries at {self.state_path}: {str(e)}")
+
+    def _group_digests(self, mapping_data: List[Dict]) -> Dict[str, List[str]]:
+        """Group file digests by directory, sorted by file name so the input hash is stable"""
+        directories: Dict[str, List[str]] = {}
+        for entry in sorted(mapping_data, key=lambda item: item["file_name"]):
+            file_name = entry["file_name"].replace("\\", "/")
+            directory = posixpath.dirname(file_name) or ROOT_DIRECTORY
+            directories.setdefault(directory, []).append(
+                f"- {posixpath.basename(file_name)}: {self.get_file_digest(entry)}"
+            )
+        return directories
+
+    @staticmethod
+    def get_file_digest(entry: Dict) -> str:
+        """
+        Return a short digest of a file: its summary contribution if the mapping has one,
+        otherwise the beginning of its description
+        """
+        text = " ".join(str(entry.get("summary") or entry.get("description") or "").split())
+        if len(text) <= FILE_DIGEST_MAX_CHARS:
+            return text
+        cut = text.rfind(". ", 0, FILE_DIGEST_MAX_CHARS)
+        return text[:cut + 1] if cut > 0 else text[:FILE_DIGEST_MAX_CHARS].rstrip() + "..."
+
+    @staticmethod
+    def _hash(texts: List[str]) -> str:
+        return hashlib.sha256(json.dumps(texts).encode("utf-8")).hexdigest()
+
+    def _summarize_directories(self, directories: Dict[str, List[str]]) -> Dict[str, str]:
+        """
+        Summarize directories concurrently; a directory too large for one prompt is summarized in parts.
+        Directories with a failed part are left out of the result and recorded in failed_directories.
+        """
+        if not directories:
+            return {}
+        inputs = []
+        owners = []
+        for directory, digests in directories.items():
+            for group in self.token_manager.group_texts_by_tokens(digests, reserved_text=directory):
+                inputs.append({"directory": directory, "file_digests": "\n".join(group)})
+                owners.append(directory)
+
+        chain = self.prompt_manager.create_directory_summary_chain(self.llm)
+        results = chain.batch(inputs, config={"max_concurrency": self.max_workers}, return_exceptions=True)
+        parts: Dict[str, List[str]] = {}
+        for directory, result in zip(owners, results):
+            if isinstance(result, Exception):
+                self.failed_directories.setdefault(directory, str(result))
+            else:
+                parts.setdefault(directory, []).append(result.strip())
+        return {
+            directory: "\n\n".join(texts) for directory, texts in parts.items()
+            if directory not in self.failed_directories
+        }
+
+    def _roll_up(self, directory_texts: List[str]) -> str:
+        """Merge directory summaries into the project summary, in rounds while they exceed one prompt"""
+        chain = self.prompt_manager.create_project_summary_chain(self.llm)
+        groups = self.token_manager.group_texts_by_tokens(directory_texts, min_group_size=2)
+        while len(groups) > 1:
+            results = chain.batch(
+                [{"directory_summaries": "\n\n".join(group)} for group in groups],
+                config={"max_concurrency": self.max_workers},
+            )
+            groups = self.token_manager.group_texts_by_tokens(results, min_group_size=2)
+        return chain.invoke({"directory_summaries": "\n\n".join(groups[0])})
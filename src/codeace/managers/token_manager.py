@@ -1,6 +1,30 @@
 import json
+import math
+import os
+import hashlib
+import threading
+from collections import Counter, OrderedDict
 import tiktoken  # For OpenAI tokenization
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+from ..utils.utils import Utils
+from .model_registry import ApproximateTokenizer, model_registry
+from ..utils.code_chunker import CodeChunker
+from ..indexes.lexical_index import tokenize
+
+# Supported chunk packing strategies, see TokenManager.plan_chunks
+CHUNK_STRATEGIES = ("ordered", "ffd")
+
+# Number of items the ordered packer tries after the first one that does not fit
+CHUNK_LOOKAHEAD = 8
+
+# Parts of a split file scoring below this share of the best part's score are left out
+RELEVANT_PART_SCORE_RATIO = 0.5
+
+# Upper bound of memoized token counts; the oldest counts are dropped beyond it
+MAX_TOKEN_CACHE_ENTRIES = 200000
+
+# New counts after which query paths persist the token cache; the whole file is rewritten on save
+TOKEN_CACHE_SAVE_THRESHOLD = 5000
 
 
 class TokenManager:
@@ -10,33 +34,42 @@ class TokenManager:
     token usage and manage input limits.
     """
 
-    def __init__(self, llm: Any):
+    def __init__(self, llm: Any, token_cache_path: Optional[str] = None):
         """
         Initialize the TokenManager with an LLM instance.
 
         Args:
             llm (Any): An LLM instance (e.g., OpenAI, Hugging Face, or custom).
+            token_cache_path (Optional[str]): JSON file to persist memoized token counts in
         """
         self.llm = llm
         self.tokenizer, self.max_tokens = self._get_tokenizer_and_limits()
+        # Memoized counts are keyed by tokenizer too, since agents of one app_data may use different models
+        if isinstance(self.tokenizer, ApproximateTokenizer):
+            self._tokenizer_id = f"approximate:{self.tokenizer.chars_per_token}"
+        else:
+            self._tokenizer_id = getattr(self.tokenizer, "name", type(self.tokenizer).__name__)
+        self.token_cache_path = token_cache_path
+        self._token_counts: "OrderedDict[str, int]" = self._load_token_cache()
+        self._unsaved_counts = 0
+        self._token_cache_lock = threading.Lock()
 
     def _get_tokenizer_and_limits(self) -> Tuple[Any, int]:
         """
-        Identify the tokenizer and maximum token limit for the LLM.
+        Identify the tokenizer and maximum token limit for the LLM from the model registry.
+        The limit is the model's context window less the tokens reserved for its answer.
 
         Returns:
             Tuple[Any, int]: The tokenizer and maximum token limit.
         """
-        
-        encoding = tiktoken.encoding_for_model(self.llm.model_name)
-        max_tokens = self.llm.max_tokens
-        return encoding, 128000
-        
-       
+        capabilities = model_registry.get_capabilities(self.llm)
+        return model_registry.get_tokenizer(capabilities), capabilities.max_input_tokens
+
 
     def calculate_tokens(self, text: str) -> int:
         """
         Calculate the number of tokens in a given text.
+        Counts are memoized by content hash.
 
         Args:
             text (str): The input text.
@@ -44,94 +77,312 @@ class TokenManager:
         Returns:
             int: The number of tokens in the text.
         """
-        if isinstance(self.tokenizer, tiktoken.Encoding):
-            return len(self.tokenizer.encode(text))
+        return self.calculate_tokens_batch([text])[0]
+
+    def calculate_tokens_batch(self, texts: List[str], memoize: bool = True) -> List[int]:
+        """
+        Calculate the number of tokens of several texts.
+        Memoized counts are reused; the remaining texts are tokenized in one batch.
+
+        Args:
+            texts (List[str]): The input texts.
+            memoize (bool): Whether to memoize the new counts; off for throwaway texts such as single lines
+
+        Returns:
+            List[int]: The number of tokens of each text.
+        """
+        keys = [self._get_text_key(self._tokenizer_id, text) for text in texts]
+        counts = [self._token_counts.get(key) for key in keys]
+        missing = [index for index, count in enumerate(counts) if count is None]
+        if missing:
+            if isinstance(self.tokenizer, tiktoken.Encoding):
+                encoded = self.tokenizer.encode_batch([texts[index] for index in missing], disallowed_special=())
+                new_counts = [len(tokens) for tokens in encoded]
+            elif isinstance(self.tokenizer, ApproximateTokenizer):
+                new_counts = [self.tokenizer.count(texts[index]) for index in missing]
+            else:
+                new_counts = [len(self.tokenizer.encode(texts[index])) for index in missing]
+            for index, count in zip(missing, new_counts):
+                counts[index] = count
+            if memoize:
+                with self._token_cache_lock:
+                    for index in missing:
+                        self._token_counts[keys[index]] = counts[index]
+                    self._unsaved_counts += len(missing)
+                    self._trim_token_cache()
+        return counts
+
+    def calculate_line_tokens(self, lines: List[str]) -> List[int]:
+        """Token counts of single lines; looked up in the memo but not added to it"""
+        return self.calculate_tokens_batch(lines, memoize=False)
+
+    @staticmethod
+    def _get_text_key(tokenizer_id: str, text: str) -> str:
+        return hashlib.sha1(f"{tokenizer_id}\n{text}".encode('utf-8', 'surrogatepass')).hexdigest()
+
+    def _trim_token_cache(self) -> None:
+        while len(self._token_counts) > MAX_TOKEN_CACHE_ENTRIES:
+            self._token_counts.popitem(last=False)
+
+    def _load_token_cache(self) -> "OrderedDict[str, int]":
+        if not self.token_cache_path or not os.path.exists(self.token_cache_path):
+            return OrderedDict()
+        try:
+            return OrderedDict(Utils.read_json(self.token_cache_path))
+        except (IOError, ValueError, TypeError):
+            # A damaged cache only costs re-tokenization
+            return OrderedDict()
+
+    def save_token_cache(self) -> None:
+        """
+        Persist memoized token counts, if a cache path is set and counts were added.
+        """
+        if not self.token_cache_path or not self._unsaved_counts:
+            return
+        with self._token_cache_lock:
+            Utils.atomic_write_json(self.token_cache_path, self._token_counts)
+            self._unsaved_counts = 0
+
+    def save_token_cache_if_due(self) -> None:
+        """
+        Persist memoized token counts once TOKEN_CACHE_SAVE_THRESHOLD counts were added since the last save.
+        """
+        if self._unsaved_counts >= TOKEN_CACHE_SAVE_THRESHOLD:
+            self.save_token_cache()
+
+    @staticmethod
+    def format_mapping_item(item: Dict) -> str:
+        """
+        Return the text a mapping entry is counted as in file-selection prompts.
+        """
+        return f"file_name: {item['file_name']}\nDescription: {item['description']}\nFunctions: {item['functions']}"
         
     def get_possible_data(self, user_query: str, json_data: list) -> Tuple[list, list]:
         """
         Select items from a JSON array based on token constraints.
+        Returns the first chunk planned by plan_data_chunks; see there for the packing rules.
 
         Args:
-            prompt_template (str): The template to be used with the data
             user_query (str): The user's query
             json_data (list): List of dictionaries containing file information
 
         Returns:
             Tuple[list, list]: Selected items and remaining items
         """
-        user_query_tokens = self.calculate_tokens(f"{user_query}")
-        remaining_tokens = self.max_tokens - user_query_tokens
+        chunks = self.plan_data_chunks(user_query, json_data, strategy="ordered")
+        if not chunks:
+            return [], []
+        selected_ids = {id(item) for item in chunks[0]}
+        return chunks[0], [item for item in json_data if id(item) not in selected_ids]
 
-        added_tokens = 0
-        selected_items = []
-        remaining_items = json_data.copy()
-        
-        for item in json_data:
-            # Calculate tokens for the entire item
-            item_str = f"file_name: {item['file_name']}\nDescription: {item['description']}\nFunctions: {item['functions']}"
-            item_tokens = self.calculate_tokens(item_str)
-            
-            if added_tokens + item_tokens <= remaining_tokens:
-                selected_items.append(remaining_items.pop(0))
-                added_tokens += item_tokens
-            else:
-                break
-                
-        return selected_items, remaining_items
+    def plan_chunks(self, sizes: List[int], budget: int, strategy: str = "ordered") -> List[List[int]]:
+        """
+        Pack items of the given token sizes into as few chunks of at most budget tokens as possible.
 
-    def validate_prompt(self, prompt: str) -> bool:
+        Strategies:
+            "ordered": greedy in input order; when an item does not fit, up to CHUNK_LOOKAHEAD
+                following items are still tried, so one large item does not close the chunk early.
+                Items keep their relative order inside and across chunks.
+            "ffd": first-fit-decreasing; usually the fewest chunks, but ignores the input order.
+
+        An item larger than the budget gets a chunk of its own; callers split such items first.
+
+        Returns:
+            List[List[int]]: Indexes of the items of each chunk
         """
-        Validate if a given prompt fits within the model's token constraints.
+        if strategy not in CHUNK_STRATEGIES:
+            raise ValueError(f"Chunk strategy {strategy} is not supported. Use one of {CHUNK_STRATEGIES}")
+
+        if strategy == "ffd":
+            chunks: List[List[int]] = []
+            free_space: List[int] = []
+            for index in sorted(range(len(sizes)), key=lambda i: (-sizes[i], i)):
+                for chunk_index, space in enumerate(free_space):
+                    if sizes[index] <= space:
+                        chunks[chunk_index].append(index)
+                        free_space[chunk_index] -= sizes[index]
+                        break
+                else:
+                    chunks.append([index])
+                    free_space.append(budget - sizes[index])
+            for chunk in chunks:
+                chunk.sort()
+            chunks.sort(key=lambda chunk: chunk[0])
+            return chunks
+
+        chunks = []
+        remaining = list(range(len(sizes)))
+        while remaining:
+            chunk = []
+            used = 0
+            skipped = []
+            misses = 0
+            for position, index in enumerate(remaining):
+                if used + sizes[index] <= budget or not chunk:
+                    chunk.append(index)
+                    used += sizes[index]
+                    if used >= budget:
+                        skipped.extend(remaining[position + 1:])
+                        break
+                else:
+                    skipped.append(index)
+                    misses += 1
+                    if misses > CHUNK_LOOKAHEAD:
+                        skipped.extend(remaining[position + 1:])
+                        break
+            chunks.append(chunk)
+            remaining = skipped
+        return chunks
+
+    def plan_data_chunks(self, user_query: str, json_data: list, strategy: str = "ordered") -> List[list]:
+        """
+        Split mapping entries into chunks that each fit the token limit together with the query.
 
         Args:
-            prompt (str): The prompt to validate.
+            user_query (str): The user's query
+            json_data (list): List of dictionaries containing file information
+            strategy (str): "ordered" or "ffd", see plan_chunks
 
         Returns:
-            bool: True if the prompt is valid, False otherwise.
+            List[list]: The entries of each chunk
         """
-        prompt_tokens = self.calculate_tokens(prompt)
-        return prompt_tokens <= self.max_tokens
+        budget = self.max_tokens - self.calculate_tokens(f"{user_query}")
+        sizes = self.calculate_tokens_batch([self.format_mapping_item(item) for item in json_data])
+        return [[json_data[index] for index in chunk] for chunk in self.plan_chunks(sizes, budget, strategy)]
 
-    def get_possible_files_content(self, user_query: str, extra_context_doc: str, file_paths: list) -> Tuple[str, list]:
+    def plan_files_content_chunks(self, user_query: str, extra_context_doc: str, file_paths: list,
+                                  strategy: str = "ordered", focus_large_files: bool = True) -> List[str]:
         """
-        Select and concatenate file contents based on token constraints.
+        Read the given files and pack their contents into chunks that each fit the token limit
+        together with the query and extra context. Files too large for one chunk are split
+        at function and class boundaries instead of being dropped; unreadable files are skipped.
 
         Args:
             user_query (str): The user's query
+            extra_context_doc (str): Extra context sent with every chunk
             file_paths (list): List of file paths to process
+            strategy (str): "ordered" or "ffd", see plan_chunks
+            focus_large_files (bool): Send only the parts of a split file that share terms
+                with the query (all parts if none does)
 
         Returns:
-            Tuple[str, list]: Concatenated content of selected files and remaining file paths
+            List[str]: The concatenated content of each chunk
         """
-        user_query_tokens = self.calculate_tokens(f"{user_query}")
-        extra_context_tokens = self.calculate_tokens(extra_context_doc)
-        remaining_tokens = self.max_tokens - (user_query_tokens + extra_context_tokens)
-        if remaining_tokens <= 0:
+        user_query_tokens, extra_context_tokens = self.calculate_tokens_batch([f"{user_query}", extra_context_doc or ""])
+        budget = self.max_tokens - (user_query_tokens + extra_context_tokens)
+        if budget <= 0:
             raise ValueError("User query and extra context exceed token limit")
 
-        added_tokens = 0
-        selected_content = []
-        remaining_files = file_paths.copy()
-        
+        pieces = []
         for file_path in file_paths:
             try:
                 with open(file_path, 'r', encoding='utf-8') as f:
-                    file_content = f"File: {file_path}\n{f.read()}\n---\n"
-                    content_tokens = self.calculate_tokens(file_content)
-                    
-                    if added_tokens + content_tokens <= remaining_tokens:
-                        selected_content.append(file_content)
-                        remaining_files.pop(0)
-                        added_tokens += content_tokens
-                    else:
-                        break
+                    pieces.append((file_path, f.read()))
             except Exception as e:
                 print(f"Error reading file {file_path}: {str(e)}")
-                remaining_files.pop(0)
+
+        texts = [f"File: {file_path}\n{content}\n---\n" for file_path, content in pieces]
+        sizes = self.calculate_tokens_batch(texts)
+        items = []
+        for (file_path, content), text, size in zip(pieces, texts, sizes):
+            if size <= budget:
+                items.append((text, size))
+            else:
+                parts = self._split_file_content(file_path, content, budget)
+                if focus_large_files:
+                    parts = self._select_relevant_parts(user_query, parts)
+                items.extend((text, size) for text, size, _ in parts)
+
+        chunks = self.plan_chunks([size for _, size in items], budget, strategy)
+        return ['\n'.join(items[index][0] for index in chunk) for chunk in chunks]
+
+    def _split_file_content(self, file_path: str, content: str, budget: int) -> List[Tuple[str, int, str]]:
+        """
+        Split a file that exceeds the budget at syntactic boundaries (see CodeChunker).
+        Each part is labeled with its line range and the symbols it holds.
+
+        Returns:
+            List[Tuple[str, int, str]]: Each part's text, token count and symbols
+        """
+        header_tokens = self.calculate_tokens(f"File: {file_path} (lines 000000-000000: )\n\n---\n")
+        part_budget = max(1, budget - header_tokens)
+        parts = []
+        for chunk in CodeChunker().chunk(file_path, content, part_budget, self.calculate_tokens_batch,
+                                         self.calculate_line_tokens):
+            label = f"lines {chunk.start_line}-{chunk.end_line}"
+            if chunk.symbol:
+                label = f"{label}: {chunk.symbol}"
+            text = f"File: {file_path} ({label})\n{chunk.content}\n---\n"
+            parts.append((text, self.calculate_tokens(text), chunk.symbol or ""))
+        return parts
+
+    @staticmethod
+    def _select_relevant_parts(user_query: str, parts: List[Tuple[str, int, str]]) -> List[Tuple[str, int, str]]:
+        """
+        Keep the parts of a split file that best match the query, in file order.
+        Parts are scored by the query terms they share, weighted by how rare each term is
+        among the parts; symbol names are tried before content. All parts are kept if none match.
+        """
+        query_terms = set(tokenize(user_query))
+        if not query_terms or len(parts) < 2:
+            return parts
+        for field in (2, 0):
+            part_terms = [query_terms & set(tokenize(part[field])) for part in parts]
+            document_counts = Counter(term for terms in part_terms for term in terms)
+            if not document_counts:
                 continue
-        if not selected_content:
-            raise ValueError("No files selected due to token constraints")
-        return '\n'.join(selected_content), remaining_files
+            scores = [
+                sum(math.log(1 + len(parts) / document_counts[term]) for term in terms)
+                for terms in part_terms
+            ]
+            threshold = max(scores) * RELEVANT_PART_SCORE_RATIO
+            return [part for part, score in zip(parts, scores) if score and score >= threshold]
+        return parts
+
+    def group_texts_by_tokens(self, texts: List[str], reserved_text: str = "", min_group_size: int = 1) -> List[List[str]]:
+        """
+        Split texts into consecutive groups that each fit the token limit.
+
+        Args:
+            texts (List[str]): The texts to group, in order
+            reserved_text (str): Text sent along with every group (query, context)
+            min_group_size (int): Groups hold at least this many texts even if they exceed
+                the limit, so repeated grouping always makes progress
+
+        Returns:
+            List[List[str]]: The groups, in order
+        """
+        budget = self.max_tokens - self.calculate_tokens(reserved_text)
+        groups = []
+        current_group = []
+        current_tokens = 0
+        for text in texts:
+            text_tokens = self.calculate_tokens(text)
+            if current_group and len(current_group) >= min_group_size and current_tokens + text_tokens > budget:
+                groups.append(current_group)
+                current_group = []
+                current_tokens = 0
+            current_group.append(text)
+            current_tokens += text_tokens
+        if current_group:
+            if groups and len(current_group) < min_group_size:
+                groups[-1].extend(current_group)
+            else:
+                groups.append(current_group)
+        return groups
+
+    def validate_prompt(self, prompt: str) -> bool:
+        """
+        Validate if a given prompt fits within the model's token constraints.
+
+        Args:
+            prompt (str): The prompt to validate.
+
+        Returns:
+            bool: True if the prompt is valid, False otherwise.
+        """
+        prompt_tokens = self.calculate_tokens(prompt)
+        return prompt_tokens <= self.max_tokens
 
 
 # Example Usage
@@ -0,0 +1,147 @@
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+from ..managers.model_registry import ApproximateTokenizer
+
+# Schema embedded in the format instructions of JsonOutputParser
+SCHEMA_PATTERN = re.compile(r"Here is the output schema[^\n]*\n\s*```\s*(\{.*?\})\s*```", re.DOTALL)
+FILE_NAME_LINE_PATTERN = re.compile(r"^\s*File name: (\S+)", re.MULTILINE)
+MAPPING_ITEM_PATTERN = re.compile(r"'file_name': '([^']+)'")
+
+# Number of files a fake file search returns
+FAKE_SEARCH_RESULTS = 3
+
+# Counts the prompt tokens a provider would bill
+_token_counter = ApproximateTokenizer()
+
+
+class FakeRateLimitError(Exception):
+    """Throttling error of FakeChatModel, shaped like a provider's 429 error"""
+    status_code = 429
+
+    def __init__(self, retry_after: Optional[float] = None):
+        super().__init__("Rate limit exceeded (fake provider)")
+        self.retry_after = retry_after
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic local chat model for tests and benchmarks, without network access.
+    Prompts with JSON format instructions are answered with output matching the schema
+    (file descriptions, batched file analyses, file search results); other prompts with
+    text derived from the prompt. Simulates latency and, with requests_per_second, a
+    provider that throttles with FakeRateLimitError.
+    """
+    model_name: str = "fake-chat"
+    latency: float = 0.0
+    requests_per_second: Optional[float] = None
+    retry_after: Optional[float] = None
+    answer_words: int = 50
+
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _recent: Any = PrivateAttr(default_factory=deque)
+    _stats: Dict[str, int] = PrivateAttr(
+        default_factory=lambda: {"calls": 0, "throttled": 0, "prompt_chars": 0, "prompt_tokens": 0}
+    )
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the numbers of answered calls, throttled calls, and prompt characters and
+        (approximate) tokens received
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            for key in self._stats:
+                self._stats[key] = 0
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        prompt = self._accept(messages)
+        if self.latency:
+            time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.respond(prompt)))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        prompt = self._accept(messages)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.respond(prompt)))])
+
+    def _stream(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        prompt = self._accept(messages)
+        if self.latency:
+            time.sleep(self.latency)
+        for word in self.respond(prompt).split(" "):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+    def _accept(self, messages: List[BaseMessage]) -> str:
+        """Count the call, or raise FakeRateLimitError above requests_per_second"""
+        prompt = "\n".join(str(message.content) for message in messages)
+        prompt_tokens = _token_counter.count(prompt)
+        with self._lock:
+            if self.requests_per_second:
+                now = time.monotonic()
+                while self._recent and now - self._recent[0] >= 1.0:
+                    self._recent.popleft()
+                if len(self._recent) >= self.requests_per_second:
+                    self._stats["throttled"] += 1
+                    raise FakeRateLimitError(self.retry_after)
+                self._recent.append(now)
+            self._stats["calls"] += 1
+            self._stats["prompt_chars"] += len(prompt)
+            self._stats["prompt_tokens"] += prompt_tokens
+        return prompt
+
+    def respond(self, prompt: str) -> str:
+        """
+        Return the deterministic answer to a prompt
+        """
+        match = SCHEMA_PATTERN.search(prompt)
+        if match is None:
+            return self._text(prompt)
+        try:
+            properties = json.loads(match.group(1)).get("properties", {})
+        except ValueError:
+            return self._text(prompt)
+
+        if set(properties) == {"files"}:
+            file_names = FILE_NAME_LINE_PATTERN.findall(prompt)
+            if properties["files"].get("items", {}).get("type") == "string" or not file_names:
+                # File search: the first candidate files of the prompt
+                candidates = list(dict.fromkeys(MAPPING_ITEM_PATTERN.findall(prompt)))
+                return json.dumps({"files": candidates[:FAKE_SEARCH_RESULTS]})
+            return json.dumps({"files": [self._describe(file_name, prompt) for file_name in file_names]})
+
+        file_names = FILE_NAME_LINE_PATTERN.findall(prompt)
+        analysis = self._describe(file_names[0] if file_names else "file", prompt)
+        return json.dumps({name: analysis.get(name, self._text(prompt, 8)) for name in properties})
+
+    def _describe(self, file_name: str, prompt: str) -> Dict[str, str]:
+        base_name = file_name.replace("\\", "/").split("/")[-1]
+        functions = re.findall(r"def (\w+)", prompt)[:5]
+        return {
+            "file_name": file_name,
+            "description": f"Implements {base_name}. {self._text(file_name + prompt, 12)}",
+            "functions": ", ".join(functions),
+            "summary": f"{base_name} provides part of the project logic.",
+        }
+
+    def _text(self, prompt: str, words: Optional[int] = None) -> str:
+        digest = hashlib.sha1(prompt.encode("utf-8", "surrogatepass")).hexdigest()
+        count = words or self.answer_words
+        return " ".join(f"w{digest[index % 32:index % 32 + 4]}" for index in range(count))
@@ -0,0 +1,308 @@
+import ast
+import os
+import re
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+# Extensions split by brace depth; .py uses the ast module and everything else indentation
+BRACE_EXTENSIONS = {'.js', '.ts', '.java', '.cpp', '.cs', '.go'}
+
+_STRING_PATTERN = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|`(?:\\.|[^`\\])*`')
+_LINE_COMMENT_PATTERN = re.compile(r'//.*$')
+_SYMBOL_PATTERN = re.compile(
+    r'\b(?:class|interface|struct|enum|record|namespace|module|def|func|function|fn|impl)\s+'
+    r'(?:\([^)]*\)\s*)?([A-Za-z_][A-Za-z0-9_]*)'
+)
+_CALLABLE_PATTERN = re.compile(r'([A-Za-z_][A-Za-z0-9_]*)\s*(?:=\s*(?:async\s*)?(?:function\b|\([^)]*\)\s*=>)|\()')
+_BLOCK_START_PATTERN = re.compile(r'^\s*(?:async\s+def|def|class|module)\b')
+
+
+def brace_code(line: str) -> str:
+    """The code of a line without string contents and line comments"""
+    return _LINE_COMMENT_PATTERN.sub('', _STRING_PATTERN.sub('""', line))
+
+
+@dataclass
+class CodeChunk:
+    """A contiguous range of source lines, 1-based and inclusive"""
+    start_line: int
+    end_line: int
+    content: str
+    symbol: Optional[str] = None
+
+
+class CodeChunker:
+    """
+    Splits source files at syntactic boundaries.
+    Python files are split with the ast module (top-level statements, then class members);
+    brace languages by brace depth; other files (e.g. Ruby) by indentation.
+    """
+
+    def split_units(self, file_path: str, content: str) -> List[CodeChunk]:
+        """
+        Return the top-level units of a file (definitions and runs of other statements),
+        covering every line of the file in order.
+        """
+        lines = content.splitlines(keepends=True)
+        if not lines:
+            return []
+        return self._to_chunks(lines, self._find_units(file_path, lines, 0, len(lines)))
+
+    def chunk(self, file_path: str, content: str, max_tokens: int, count_tokens: Callable[[List[str]], List[int]],
+              count_line_tokens: Optional[Callable[[List[str]], List[int]]] = None) -> List[CodeChunk]:
+        """
+        Split a file into chunks of at most max_tokens each.
+        Units larger than max_tokens are split into their members (e.g. class methods), then
+        into runs of lines, and a single line larger than max_tokens (e.g. minified code) at
+        character positions; consecutive small units are merged back up to max_tokens.
+
+        Args:
+            file_path (str): Path of the file, used to pick the splitter
+            content (str): The file content
+            max_tokens (int): Token budget of one chunk
+            count_tokens (Callable): Returns the token counts of a list of texts
+            count_line_tokens (Callable): Counts single lines when a unit is split into runs of
+                lines (defaults to count_tokens), e.g. one that does not memoize them
+
+        Returns:
+            List[CodeChunk]: Chunks in file order
+        """
+        lines = content.splitlines(keepends=True)
+        if not lines:
+            return []
+        count_line_tokens = count_line_tokens or count_tokens
+        units = self._fit_units(file_path, lines, self._find_units(file_path, lines, 0, len(lines)), max_tokens,
+                                count_tokens, count_line_tokens)
+        unit_chunks = self._to_chunks(lines, units)
+        chunks = []
+        sizes = []
+        for chunk, size in zip(unit_chunks, count_tokens([chunk.content for chunk in unit_chunks])):
+            if size <= max_tokens:
+                chunks.append(chunk)
+                sizes.append(size)
+                continue
+            # Only a single line can still exceed max_tokens; its pieces keep its line number
+            for text, text_size in self._split_text(chunk.content, size, max_tokens, count_line_tokens):
+                chunks.append(CodeChunk(chunk.start_line, chunk.end_line, text, chunk.symbol))
+                sizes.append(text_size)
+
+        merged: List[CodeChunk] = []
+        merged_size = 0
+        for chunk, size in zip(chunks, sizes):
+            if merged and merged_size + size <= max_tokens:
+                last = merged[-1]
+                symbols = list(dict.fromkeys(symbol for symbol in (last.symbol, chunk.symbol) if symbol))
+                merged[-1] = CodeChunk(last.start_line, chunk.end_line, last.content + chunk.content,
+                                       ", ".join(symbols) or None)
+                merged_size += size
+            else:
+                merged.append(chunk)
+                merged_size = size
+        return merged
+
+    def _fit_units(self, file_path: str, lines: List[str], units: List[tuple], max_tokens: int,
+                   count_tokens: Callable[[List[str]], List[int]],
+                   count_line_tokens: Callable[[List[str]], List[int]]) -> List[tuple]:
+        """Replace units larger than max_tokens by their members, or by runs of lines"""
+        sizes = count_tokens([''.join(lines[start:end]) for start, end, _ in units])
+        fitted = []
+        for (start, end, symbol), size in zip(units, sizes):
+            if size <= max_tokens:
+                fitted.append((start, end, symbol))
+                continue
+            members = self._find_members(file_path, lines, start, end, symbol)
+            if len(members) > 1:
+                fitted.extend(self._fit_units(file_path, lines, members, max_tokens, count_tokens, count_line_tokens))
+            else:
+                fitted.extend(self._split_lines(lines, start, end, symbol, max_tokens, count_line_tokens))
+        return fitted
+
+    def _split_lines(self, lines: List[str], start: int, end: int, symbol: Optional[str], max_tokens: int,
+                     count_tokens: Callable[[List[str]], List[int]]) -> List[tuple]:
+        """Split a range into runs of whole lines of at most max_tokens each; a longer line is a run of its own"""
+        line_sizes = count_tokens(lines[start:end])
+        parts = []
+        part_start = start
+        used = 0
+        for index, line_size in zip(range(start, end), line_sizes):
+            if index > part_start and used + line_size > max_tokens:
+                parts.append((part_start, index, symbol))
+                part_start = index
+                used = 0
+            used += line_size
+        parts.append((part_start, end, symbol))
+        return parts
+
+    def _split_text(self, text: str, size: int, max_tokens: int,
+                    count_tokens: Callable[[List[str]], List[int]]) -> List[Tuple[str, int]]:
+        """Split a text at character positions into pieces of at most max_tokens each, with their sizes"""
+        if size <= max_tokens or len(text) <= 1:
+            return [(text, size)]
+        piece_length = max(1, len(text) * max_tokens // size)
+        pieces = [text[offset:offset + piece_length] for offset in range(0, len(text), piece_length)]
+        split = []
+        for piece, piece_size in zip(pieces, count_tokens(pieces)):
+            split.extend(self._split_text(piece, piece_size, max_tokens, count_tokens))
+        return split
+
+    def _to_chunks(self, lines: List[str], units: List[tuple]) -> List[CodeChunk]:
+        return [CodeChunk(start + 1, end, ''.join(lines[start:end]), symbol) for start, end, symbol in units]
+
+    def _find_units(self, file_path: str, lines: List[str], start: int, end: int) -> List[tuple]:
+        """Return (start, end, symbol) units covering lines[start:end], as 0-based half-open ranges"""
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension == '.py':
+            try:
+                tree = ast.parse(''.join(lines))
+            except (SyntaxError, ValueError):
+                return self._indent_units(lines, start, end, None)
+            return self._python_units(tree.body, start, end, None)
+        if extension in BRACE_EXTENSIONS:
+            return self._brace_units(lines, start, end, None)
+        return self._indent_units(lines, start, end, None)
+
+    def _find_members(self, file_path: str, lines: List[str], start: int, end: int, symbol: Optional[str]) -> List[tuple]:
+        """Return the member units of a unit (e.g. the methods of a class), or [] if it has none"""
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension == '.py':
+            try:
+                tree = ast.parse(''.join(lines))
+            except (SyntaxError, ValueError):
+                return []
+            # The outermost class inside the unit; the unit may also hold leading blank lines
+            classes = [
+                node for node in ast.walk(tree)
+                if isinstance(node, ast.ClassDef) and start <= self._python_node_start(node) and node.end_lineno <= end
+            ]
+            if not classes:
+                return []
+            node = min(classes, key=lambda candidate: self._python_node_start(candidate))
+            return self._python_units(node.body, start, end, f"{symbol}" if symbol else node.name)
+
+        # Split the body of the block; a body holding a single block (e.g. a namespace around
+        # one class) is descended into. The header joins the first member and the footer the last.
+        members = []
+        body = self._block_body(extension, lines, start, end)
+        while body is not None:
+            if extension in BRACE_EXTENSIONS:
+                members = self._brace_units(lines, body[0], body[1], symbol)
+            else:
+                members = self._indent_units(lines, body[0], body[1], symbol)
+            if len(members) != 1:
+                break
+            symbol = members[0][2]
+            body = self._block_body(extension, lines, members[0][0], members[0][1])
+        if not members:
+            return []
+        members[0] = (start, members[0][1], members[0][2])
+        members[-1] = (members[-1][0], end, members[-1][2])
+        return members
+
+    def _block_body(self, extension: str, lines: List[str], start: int, end: int) -> Optional[tuple]:
+        """Return the (start, end) range between a block's opening and closing lines, or None"""
+        if extension in BRACE_EXTENSIONS:
+            depth = 0
+            for index in range(start, end):
+                code = brace_code(lines[index])
+                depth += code.count('{') - code.count('}')
+                if depth > 0:
+                    closing = end - 1
+                    while closing > index and not lines[closing].strip():
+                        closing -= 1
+                    return (index + 1, closing) if index + 1 < closing else None
+            return None
+
+        content_lines = [index for index in range(start, end) if lines[index].strip()]
+        if len(content_lines) < 3:
+            return None
+        body_end = content_lines[-1] if lines[content_lines[-1]].strip() == 'end' else end
+        return (content_lines[0] + 1, body_end) if content_lines[0] + 1 < body_end else None
+
+    @staticmethod
+    def _python_node_start(node: ast.AST) -> int:
+        decorators = getattr(node, 'decorator_list', [])
+        return min([node.lineno] + [decorator.lineno for decorator in decorators]) - 1
+
+    def _python_units(self, nodes: List[ast.stmt], start: int, end: int, parent: Optional[str]) -> List[tuple]:
+        """Group statements into definitions and runs of other statements; gaps join the next unit"""
+        units = []
+        unit_start = start
+        pending_statements = False
+        for node in nodes:
+            node_start = max(self._python_node_start(node), start)
+            node_end = min(getattr(node, 'end_lineno', node.lineno), end)
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                if pending_statements:
+                    units.append((unit_start, node_start, parent))
+                    unit_start = node_start
+                    pending_statements = False
+                name = f"{parent}.{node.name}" if parent else node.name
+                units.append((unit_start, node_end, name))
+                unit_start = node_end
+            else:
+                pending_statements = True
+                # Statements accumulate until the next definition
+        if unit_start < end:
+            if units and not pending_statements:
+                last_start, _, last_symbol = units[-1]
+                units[-1] = (last_start, end, last_symbol)
+            else:
+                units.append((unit_start, end, parent))
+        return units
+
+    def _brace_units(self, lines: List[str], start: int, end: int, parent: Optional[str]) -> List[tuple]:
+        """
+        A unit ends when a block it opened closes (brace depth back to zero), or at a ';'
+        or blank line at depth zero. Leading blank lines join the next unit.
+        """
+        units = []
+        unit_start = start
+        depth = 0
+        opened = False
+        has_content = False
+        for index in range(start, end):
+            stripped = lines[index].strip()
+            code = brace_code(lines[index])
+            depth = max(0, depth + code.count('{') - code.count('}'))
+            opened = opened or '{' in code
+            has_content = has_content or bool(stripped)
+            if depth > 0:
+                continue
+            ends_statement = stripped.endswith(';') or (not stripped and has_content)
+            if opened or ends_statement:
+                units.append((unit_start, index + 1, self._symbol_of(lines[unit_start:index + 1], parent)))
+                unit_start = index + 1
+                opened = False
+                has_content = False
+        if unit_start < end:
+            units.append((unit_start, end, self._symbol_of(lines[unit_start:end], parent)))
+        return units
+
+    def _indent_units(self, lines: List[str], start: int, end: int, parent: Optional[str]) -> List[tuple]:
+        """A new unit starts at a block-opening line (def, class, module) at the base indentation"""
+        indents = [len(line) - len(line.lstrip()) for line in lines[start:end] if line.strip()]
+        if not indents:
+            return [(start, end, parent)] if start < end else []
+        base_indent = min(indents)
+        units = []
+        unit_start = start
+        for index in range(start, end):
+            line = lines[index]
+            at_base = bool(line.strip()) and len(line) - len(line.lstrip()) == base_indent
+            if index > unit_start and at_base and _BLOCK_START_PATTERN.match(line):
+                units.append((unit_start, index, self._symbol_of(lines[unit_start:index], parent)))
+                unit_start = index
+        units.append((unit_start, end, self._symbol_of(lines[unit_start:end], parent)))
+        return units
+
+    def _symbol_of(self, unit_lines: List[str], parent: Optional[str]) -> Optional[str]:
+        """Name of the first declaration in a unit, prefixed with its parent's name"""
+        for line in unit_lines:
+            stripped = line.strip()
+            if not stripped or stripped.startswith(('//', '#', '*', '/*', '@', 'import ', 'using ', 'package ')):
+                continue
+            match = _SYMBOL_PATTERN.search(stripped) or _CALLABLE_PATTERN.search(stripped)
+            if match and match.group(1) not in ('if', 'for', 'while', 'switch', 'catch', 'return'):
+                return f"{parent}.{match.group(1)}" if parent else match.group(1)
+            break
+        return parent
@@ -0,0 +1,220 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_CODE_EXTENSIONS = {'.py', '.js', '.ts', '.java', '.cpp', '.cs', '.rb', '.go'}
+DEFAULT_EXCLUDED_DIRS = {'.git', '__pycache__', 'node_modules', 'venv', '.env'}
+
+# Files larger than this are usually generated or vendored and are skipped by default
+DEFAULT_MAX_FILE_SIZE = 1024 * 1024
+
+# Ignore files read in every directory, with .gitignore syntax
+IGNORE_FILE_NAMES = ('.gitignore', '.codeaceignore')
+
+# Number of leading bytes checked for NUL bytes when detecting binary files
+BINARY_CHECK_BYTES = 8192
+
+
+@dataclass
+class ScannedFile:
+    """A code file found by FileScanner, with the stat data used for incremental mapping"""
+    path: str
+    relative_path: str
+    size: int
+    mtime: float
+
+
+class IgnoreRules:
+    """
+    Patterns of one ignore file, in .gitignore syntax: '#' comments, '!' negation,
+    a trailing '/' for directories only, '*', '?', '[...]' and '**' wildcards.
+    Patterns containing a '/' are anchored to the directory of the ignore file;
+    others match at any depth below it.
+    """
+
+    def __init__(self, base: str, lines: Iterable[str]):
+        self.base = base
+        self.rules: List[Tuple[re.Pattern, bool, bool]] = []  # (regex, negated, directories only)
+        for line in lines:
+            line = line.rstrip('\n').rstrip()
+            if not line or line.startswith('#'):
+                continue
+            negated = line.startswith('!')
+            if negated or line.startswith('\\'):
+                line = line[1:]
+            directories_only = line.endswith('/')
+            line = line.rstrip('/')
+            if not line:
+                continue
+            anchored = '/' in line
+            regex = self._translate(line.lstrip('/'))
+            if not anchored:
+                regex = '(?:.*/)?' + regex
+            self.rules.append((re.compile(f"^{regex}$"), negated, directories_only))
+
+    @classmethod
+    def from_file(cls, path: str, base: str) -> Optional["IgnoreRules"]:
+        """Read an ignore file; None if it does not exist or has no patterns"""
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                rules = cls(base, f)
+        except OSError:
+            return None
+        return rules if rules.rules else None
+
+    @staticmethod
+    def _translate(pattern: str) -> str:
+        regex = []
+        index = 0
+        while index < len(pattern):
+            char = pattern[index]
+            if pattern.startswith('**/', index):
+                regex.append('(?:.*/)?')
+                index += 3
+                continue
+            if pattern.startswith('**', index):
+                regex.append('.*')
+                index += 2
+                continue
+            if char == '*':
+                regex.append('[^/]*')
+            elif char == '?':
+                regex.append('[^/]')
+            elif char == '[':
+                end = pattern.find(']', index + 1)
+                if end == -1:
+                    regex.append(re.escape(char))
+                else:
+                    content = pattern[index + 1:end]
+                    if content.startswith('!'):
+                        content = '^' + content[1:]
+                    regex.append(f"[{content}]")
+                    index = end
+            else:
+                regex.append(re.escape(char))
+            index += 1
+        return ''.join(regex)
+
+    def match(self, relative_path: str, is_dir: bool) -> Optional[bool]:
+        """
+        Return True if the '/'-separated path (relative to the scan root) is ignored,
+        False if a negated pattern re-includes it, or None if no pattern matches
+        """
+        if self.base:
+            if not relative_path.startswith(self.base + '/'):
+                return None
+            relative_path = relative_path[len(self.base) + 1:]
+        result = None
+        for regex, negated, directories_only in self.rules:
+            if directories_only and not is_dir:
+                continue
+            if regex.match(relative_path):
+                result = not negated
+        return result
+
+
+def is_ignored(rules: Iterable[IgnoreRules], relative_path: str, is_dir: bool) -> bool:
+    """Apply ignore files from the root down; deeper files and later patterns take precedence"""
+    ignored = False
+    for rule_set in rules:
+        result = rule_set.match(relative_path, is_dir)
+        if result is not None:
+            ignored = result
+    return ignored
+
+
+class FileScanner:
+    """
+    Finds the code files under a root directory with os.scandir.
+    Subdirectories are scanned in parallel worker threads, but files are yielded in a
+    stable depth-first order (by name within each directory) as soon as their directory is done.
+    Honors .gitignore and .codeaceignore files and skips excluded directories, excluded paths
+    (such as the app_data directory), files with other extensions, large files and binary files.
+    """
+
+    def __init__(self, root: str, extensions: Optional[Iterable[str]] = None,
+                 excluded_dirs: Optional[Iterable[str]] = None, excluded_paths: Iterable[str] = (),
+                 max_file_size: Optional[int] = DEFAULT_MAX_FILE_SIZE, skip_binary: bool = True,
+                 ignore_file_names: Iterable[str] = IGNORE_FILE_NAMES, max_workers: int = 8):
+        """
+        Args:
+            root (str): Directory to scan
+            extensions (Iterable[str]): File extensions to include (DEFAULT_CODE_EXTENSIONS if None)
+            excluded_dirs (Iterable[str]): Directory names skipped anywhere (DEFAULT_EXCLUDED_DIRS if None)
+            excluded_paths (Iterable[str]): Directories skipped by path, e.g. the app_data directory
+            max_file_size (Optional[int]): Larger files are skipped; None for no limit
+            skip_binary (bool): Skip files containing NUL bytes in their first bytes
+            ignore_file_names (Iterable[str]): Names of ignore files read in every directory
+            max_workers (int): Number of directories scanned concurrently
+        """
+        self.root = root
+        self.extensions = {ext.lower() for ext in (DEFAULT_CODE_EXTENSIONS if extensions is None else extensions)}
+        self.excluded_dirs = set(DEFAULT_EXCLUDED_DIRS if excluded_dirs is None else excluded_dirs)
+        self.excluded_paths = {os.path.normcase(os.path.abspath(path)) for path in excluded_paths}
+        self.max_file_size = max_file_size
+        self.skip_binary = skip_binary
+        self.ignore_file_names = tuple(ignore_file_names)
+        self.max_workers = max(1, max_workers)
+
+    def scan(self) -> Iterator[ScannedFile]:
+        """
+        Yield the code files under the root directory
+        """
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="codeace-scan")
+        # Subdirectories are submitted as soon as their parent is scanned and consumed depth-first
+        stack = [executor.submit(self._scan_directory, self.root, "", ())]
+        try:
+            while stack:
+                files, subdirectories = stack.pop().result()
+                yield from files
+                futures = [executor.submit(self._scan_directory, *subdirectory) for subdirectory in subdirectories]
+                stack.extend(reversed(futures))
+        finally:
+            for future in stack:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def _scan_directory(self, path: str, relative_dir: str, rules: tuple) -> Tuple[List[ScannedFile], List[tuple]]:
+        """Scan one directory; returns its code files and the (path, relative_dir, rules) of its subdirectories"""
+        for ignore_file_name in self.ignore_file_names:
+            ignore_rules = IgnoreRules.from_file(os.path.join(path, ignore_file_name), relative_dir)
+            if ignore_rules is not None:
+                rules = rules + (ignore_rules,)
+        try:
+            with os.scandir(path) as iterator:
+                entries = sorted(iterator, key=lambda entry: entry.name)
+        except OSError:
+            return [], []
+
+        files = []
+        subdirectories = []
+        for entry in entries:
+            relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if (entry.name in self.excluded_dirs
+                            or os.path.normcase(os.path.abspath(entry.path)) in self.excluded_paths
+                            or is_ignored(rules, relative_path, True)):
+                        continue
+                    subdirectories.append((entry.path, relative_path, rules))
+                elif entry.is_file():
+                    if os.path.splitext(entry.name)[1].lower() not in self.extensions:
+                        continue
+                    if is_ignored(rules, relative_path, False):
+                        continue
+                    stat = entry.stat()
+                    if self.max_file_size is not None and stat.st_size > self.max_file_size:
+                        continue
+                    if self.skip_binary and self._is_binary(entry.path):
+                        continue
+                    files.append(ScannedFile(entry.path, os.path.normpath(relative_path), stat.st_size, stat.st_mtime))
+            except OSError:
+                continue
+        return files, subdirectories
+
+    @staticmethod
+    def _is_binary(path: str) -> bool:
+        with open(path, 'rb') as f:
+            return b'\0' in f.read(BINARY_CHECK_BYTES)
@@ -1,4 +1,6 @@
 import os
+import json
+import tempfile
 
 class Utils:
     
@@ -20,3 +22,28 @@ class Utils:
         """
         if not os.path.exists(path):
             raise FileNotFoundError(f"File not found at path {path}")
+
+    @staticmethod
+    def read_json(path: str):
+        """
+        Read and return JSON data from the given path.
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    @staticmethod
+    def atomic_write_json(path: str, data, indent: int = None) -> None:
+        """
+        Write data as JSON to path atomically: the content goes to a temporary file in the
+        same directory, which then replaces the target, so readers never see a partial file.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=indent)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
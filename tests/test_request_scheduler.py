@@ -0,0 +1,157 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from codeace.managers.llm_manager import DEFAULT_REQUESTS_PER_SECOND
+from codeace.managers.request_scheduler import DEFAULT_PROVIDER_LIMITS, RequestScheduler, ScheduledRunnable
+from codeace.testing.fake_llm import FakeChatModel, FakeRateLimitError
+
+
+def test_retry_after_is_honoured():
+    llm = FakeChatModel(requests_per_second=1, retry_after=1.0)
+    scheduler = RequestScheduler(max_retries=3)
+    scheduler.run(lambda: llm.invoke("first"))
+
+    start = time.monotonic()
+    scheduler.run(lambda: llm.invoke("second"))
+
+    assert time.monotonic() - start >= 0.95
+    assert llm.stats()["calls"] == 2
+    assert llm.stats()["throttled"] == 1
+    assert scheduler.stats()["retries"] == 1
+    assert scheduler.stats()["throttled"] == 1
+
+
+def test_retry_after_pauses_other_requests():
+    scheduler = RequestScheduler()
+    assert scheduler._on_error(FakeRateLimitError(retry_after=0.5), 0) == 0.5
+    assert 0.4 < scheduler._reserve(0) <= 0.5
+
+
+def test_backoff_is_jittered_exponential_and_capped():
+    scheduler = RequestScheduler(base_delay=0.1, max_delay=0.5, max_retries=10)
+    for attempt in range(8):
+        delay = scheduler._on_error(FakeRateLimitError(), attempt)
+        assert 0.0 <= delay <= min(0.5, 0.1 * 2 ** attempt)
+
+
+def test_final_and_non_retryable_errors_are_not_retried():
+    scheduler = RequestScheduler(max_retries=2)
+    assert scheduler._on_error(FakeRateLimitError(), 2) is None
+    assert scheduler._on_error(ValueError("bad request"), 0) is None
+    assert scheduler.stats()["failures"] == 2
+
+
+def test_throttled_requests_are_retried_with_backoff():
+    llm = FakeChatModel(requests_per_second=5)
+    scheduler = RequestScheduler(max_concurrency=4, base_delay=0.2, max_retries=20)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        answers = list(executor.map(lambda index: scheduler.run(lambda: llm.invoke(f"question {index}")), range(12)))
+
+    assert len(answers) == 12
+    assert llm.stats()["calls"] == 12
+    assert llm.stats()["throttled"] > 0
+    assert scheduler.stats()["retries"] == llm.stats()["throttled"]
+    assert scheduler.stats()["failures"] == 0
+
+
+def test_throttling_halves_concurrency_down_to_the_minimum():
+    llm = FakeChatModel(requests_per_second=1, retry_after=0.0)
+    scheduler = RequestScheduler(max_concurrency=8, min_concurrency=1, max_retries=2, base_delay=0.0)
+    scheduler.run(lambda: llm.invoke("first"))
+
+    with pytest.raises(FakeRateLimitError):
+        scheduler.run(lambda: llm.invoke("second"))
+
+    stats = scheduler.stats()
+    assert stats["throttled"] == 3
+    assert stats["retries"] == 2
+    assert stats["failures"] == 1
+    assert stats["concurrency"] == 1
+
+
+def test_one_decrease_per_backoff_period():
+    scheduler = RequestScheduler(max_concurrency=8, base_delay=10.0)
+    scheduler._on_error(FakeRateLimitError(), 0)
+    scheduler._on_error(FakeRateLimitError(), 0)
+    assert scheduler.stats()["concurrency"] == 4
+
+
+def test_successes_raise_concurrency_again():
+    scheduler = RequestScheduler(max_concurrency=8, base_delay=0.0, increase_after=3)
+    scheduler._on_error(FakeRateLimitError(), 0)
+    assert scheduler.stats()["concurrency"] == 4
+
+    llm = FakeChatModel()
+    for index in range(6):
+        scheduler.run(lambda: llm.invoke(f"question {index}"))
+    assert scheduler.stats()["concurrency"] == 6
+
+
+def test_stream_holds_its_slot_until_closed():
+    scheduler = RequestScheduler(max_concurrency=2)
+    stream = ScheduledRunnable(FakeChatModel(answer_words=5), scheduler).stream("question")
+
+    next(stream)
+    assert scheduler._active == 1
+    next(stream)
+    assert scheduler._active == 1
+    stream.close()
+    assert scheduler._active == 0
+
+
+def test_stream_error_after_first_chunk_is_recorded_and_raised():
+    scheduler = RequestScheduler(max_concurrency=8, base_delay=0.0)
+
+    def chunks():
+        yield "partial"
+        raise FakeRateLimitError(retry_after=0.0)
+
+    received = []
+    with pytest.raises(FakeRateLimitError):
+        for chunk in scheduler.stream(chunks):
+            received.append(chunk)
+
+    assert received == ["partial"]
+    stats = scheduler.stats()
+    assert stats["throttled"] == 1
+    assert stats["retries"] == 0
+    assert stats["failures"] == 1
+    assert stats["concurrency"] == 4
+    assert scheduler._active == 0
+
+
+def test_stream_error_before_first_chunk_is_retried():
+    llm = FakeChatModel(requests_per_second=1, retry_after=1.0, answer_words=3)
+    scheduler = RequestScheduler(max_retries=3)
+    runnable = ScheduledRunnable(llm, scheduler)
+    list(runnable.stream("first"))
+
+    answer = "".join(chunk.content for chunk in runnable.stream("second"))
+
+    assert len(answer.split()) == 3
+    assert scheduler.stats()["retries"] == 1
+    assert scheduler._active == 0
+
+
+def test_astream_holds_its_slot_until_closed():
+    scheduler = RequestScheduler(max_concurrency=2)
+    runnable = ScheduledRunnable(FakeChatModel(answer_words=5), scheduler)
+
+    async def consume():
+        stream = runnable.astream("question")
+        await stream.__anext__()
+        active = scheduler._active
+        await stream.aclose()
+        return active
+
+    assert asyncio.run(consume()) == 1
+    assert scheduler._active == 0
+
+
+def test_provider_limits_match_rate_limiter_defaults():
+    for provider, requests_per_second in DEFAULT_REQUESTS_PER_SECOND.items():
+        expected = requests_per_second * 60 if requests_per_second else None
+        assert DEFAULT_PROVIDER_LIMITS[provider]["requests_per_minute"] == expected